@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for einops_impl.
+
+python -m benchmarks runs the suite in benchmarks/suite.py against the
+installed einops package; the bench_* modules are focused experiments used to
+tune individual thresholds.
+"""
@@ -0,0 +1,63 @@
+"""
+Per-call overhead of rearrange on small arrays.
+
+Columns: rearrange is einops_impl.rearrange.rearrange (plan cache hit),
+recipe a compiled recipe with the default backend, codegen a recipe with
+backend='codegen' and einops the reference einops package, if installed.
+Arrays are small, so the times are dominated by Python overhead rather than
+by copying data.
+
+Run with:
+    python -m benchmarks.bench_codegen
+"""
+import timeit
+import numpy as np
+from einops_impl.rearrange import rearrange
+from einops_impl.recipe import compile_rearrange
+
+try:
+    import einops
+except ImportError:
+    einops = None
+
+CASES = [
+    ('b h w c -> b c h w', (2, 4, 4, 3), {}),
+    ('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', (2, 8, 8, 3), {'p1': 2, 'p2': 2}),
+    ('b n (k d) -> b k n d', (2, 16, 32), {'k': 4}),
+    ('b h w c -> b (h w c)', (2, 4, 4, 3), {}),
+    ('... c -> c ...', (3, 5, 7), {}),
+]
+
+
+def best_of(fn, number=2000, repeat=5):
+    fn()
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def run_case(pattern, shape, axis_lengths):
+    x = np.random.rand(*shape)
+    recipe = compile_rearrange(pattern, **axis_lengths)
+    generated = compile_rearrange(pattern, backend='codegen', **axis_lengths)
+    result = {
+        'pattern': pattern,
+        'rearrange_us': best_of(lambda: rearrange(x, pattern, **axis_lengths)) * 1e6,
+        'recipe_us': best_of(lambda: recipe(x)) * 1e6,
+        'codegen_us': best_of(lambda: generated(x)) * 1e6,
+        'einops_us': None,
+    }
+    if einops is not None:
+        result['einops_us'] = best_of(lambda: einops.rearrange(x, pattern, **axis_lengths)) * 1e6
+    return result
+
+
+def main():
+    print(f"{'pattern':42} {'rearrange':>10} {'recipe':>9} {'codegen':>9} {'einops':>9}")
+    for pattern, shape, axis_lengths in CASES:
+        r = run_case(pattern, shape, axis_lengths)
+        reference = f"{r['einops_us']:7.2f}us" if r['einops_us'] is not None else f"{'-':>9}"
+        print(f"{r['pattern']:42} {r['rearrange_us']:8.2f}us {r['recipe_us']:7.2f}us "
+              f"{r['codegen_us']:7.2f}us {reference}")
+
+
+if __name__ == '__main__':
+    main()
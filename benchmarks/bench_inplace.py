@@ -0,0 +1,68 @@
+"""
+In-place permutation versus a copying rearrange.
+
+Columns: copy is rearrange(x, pattern, copy=True), inplace is
+rearrange(x, pattern, inplace=True) on a fresh copy of x, and scratch the
+peak memory traced while permuting in place, next to the size of the array.
+In-place trades time for memory: it is meant for arrays too large for a
+second copy, and INPLACE_BATCH_BYTES in einops_impl/inplace.py bounds its
+scratch memory.
+
+Run with:
+    python -m benchmarks.bench_inplace
+"""
+import timeit
+import tracemalloc
+import numpy as np
+from einops_impl.rearrange import rearrange
+
+CASES = [
+    ('h w -> w h', (1000, 600)),
+    ('h w -> w h', (3000, 2000)),
+    ('h w -> w h', (4096, 4096)),
+    ('b h w c -> b c h w', (8, 224, 224, 3)),
+    ('b c h w -> b h w c', (8, 3, 224, 224)),
+    ('a b c -> c a b', (96, 70, 50)),
+]
+
+
+def time_inplace(x, pattern, repeat=3):
+    """Best time of an in-place rearrange; every run permutes a fresh copy of x"""
+    times = []
+    for _ in range(repeat):
+        buffer = x.copy()
+        times.append(timeit.timeit(lambda: rearrange(buffer, pattern, inplace=True), number=1))
+    return min(times)
+
+
+def run_case(pattern, shape):
+    x = np.random.rand(*shape).astype(np.float32)
+    copy = min(timeit.repeat(lambda: rearrange(x, pattern, copy=True), number=1, repeat=3))
+    inplace = time_inplace(x, pattern)
+    buffer = x.copy()
+    tracemalloc.start()
+    try:
+        rearrange(buffer, pattern, inplace=True)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'pattern': pattern,
+        'shape': shape,
+        'copy_ms': copy * 1e3,
+        'inplace_ms': inplace * 1e3,
+        'scratch_mib': peak / 2**20,
+        'array_mib': x.nbytes / 2**20,
+    }
+
+
+def main():
+    print(f"{'pattern':20} {'shape':19} {'copy':>9} {'inplace':>10} {'slowdown':>9} {'scratch':>10} {'array':>10}")
+    for pattern, shape in CASES:
+        r = run_case(pattern, shape)
+        print(f"{r['pattern']:20} {str(r['shape']):19} {r['copy_ms']:7.2f}ms {r['inplace_ms']:8.2f}ms "
+              f"{r['inplace_ms'] / r['copy_ms']:8.1f}x {r['scratch_mib']:6.1f}MiB {r['array_mib']:6.1f}MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Parse time of Parser for deeply nested and for long patterns.
+
+The parser tokenizes each side in one pass and keeps open groups on a stack,
+so the time per character should stay flat as nesting depth and pattern
+length grow. Columns: chars is the pattern length, parse the best time of
+Parser(pattern).parse() and per_char that time divided by the length.
+
+Run with:
+    python -m benchmarks.bench_parser
+"""
+import timeit
+from einops_impl.parser import Parser
+
+
+def nested_pattern(depth):
+    """'((((a0 a1) a2) a3) ...) -> a0 a1 ... a{depth}'"""
+    left = 'a0'
+    for i in range(1, depth + 1):
+        left = f'({left} a{i})'
+    return f"{left} -> {' '.join(f'a{i}' for i in range(depth + 1))}"
+
+
+def long_pattern(length):
+    """'b (a0 a1) (a2 a3) ... -> b a0 a1 a2 ...'"""
+    names = [f'a{i}' for i in range(length)]
+    groups = ' '.join(f'({names[i]} {names[i + 1]})' for i in range(0, length - 1, 2))
+    return f"b {groups} -> b {' '.join(names)}"
+
+
+CASES = ([('nested', depth, nested_pattern(depth)) for depth in (4, 16, 64, 256)]
+         + [('long', length, long_pattern(length)) for length in (16, 64, 256, 1024)])
+
+
+def best_of(fn, number=100, repeat=5):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main():
+    print(f"{'kind':8} {'size':>6} {'chars':>7} {'parse':>11} {'per_char':>10}")
+    for kind, size, pattern in CASES:
+        seconds = best_of(lambda: Parser(pattern).parse())
+        print(f"{kind:8} {size:6} {len(pattern):7} {seconds * 1e6:9.1f}us {seconds * 1e9 / len(pattern):8.1f}ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Tiled transpose versus plain np.transpose(...).reshape(...).
+
+Columns: plain is np.transpose(...).reshape(..., copy=True) on the full split
+shape, untiled is one np.copyto of the plan's coalesced view and tiled is
+Operations.tiled_copyto of the same view. selected says whether rearrange
+picks the tiled kernel for that case.
+
+The thresholds in einops_impl/operations.py (TILED_THRESHOLD_BYTES,
+MIN_TILED_AXIS, Operations.tile_size) are chosen from this table: tiling wins
+when both swapped axes are long and loses on small arrays or when one of the
+swapped axes is short.
+
+Run with:
+    python -m benchmarks.bench_transpose
+"""
+import timeit
+import numpy as np
+from einops_impl.operations import Operations
+from einops_impl.plan import build_rearrange_plan
+
+CASES = [
+    ('h w -> w h', (4096, 4096)),
+    ('h w -> w h', (1024, 1024)),
+    ('h w -> w h', (512, 512)),
+    ('b h w c -> b c h w', (16, 128, 128, 64)),
+    ('b h w c -> b c h w', (8, 64, 64, 256)),
+    ('b h w c -> b c h w', (64, 224, 224, 3)),
+    ('b c h w -> b h w c', (64, 3, 224, 224)),
+    ('b t d -> b d t', (32, 196, 768)),
+]
+DTYPES = [np.uint8, np.float32, np.float64]
+
+
+def best_of(fn, repeat=5):
+    fn()
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def run_case(pattern, shape, dtype):
+    x = (np.random.rand(*shape) * 100).astype(dtype)
+    plan = build_rearrange_plan(pattern, shape, {})
+    full_perm = plan.perm
+    src = plan.transposed(x)  # coalesced view, as used by rearrange
+    dst = np.empty(src.shape, dtype=dtype)
+    plain = best_of(lambda: np.transpose(x, full_perm).reshape(plan.final_shape, copy=True))
+    untiled = best_of(lambda: np.copyto(dst, src))
+    tiled = best_of(lambda: Operations.tiled_copyto(dst, src))
+    return {
+        'pattern': pattern,
+        'shape': shape,
+        'dtype': np.dtype(dtype).name,
+        'plain_ms': plain * 1e3,
+        'untiled_ms': untiled * 1e3,
+        'tiled_ms': tiled * 1e3,
+        'tiled_selected': Operations.should_tile(dst, src),
+    }
+
+
+def main():
+    print(f"{'pattern':20} {'shape':19} {'dtype':8} {'plain':>9} {'untiled':>9} {'tiled':>9} {'speedup':>8} selected")
+    for dtype in DTYPES:
+        for pattern, shape in CASES:
+            r = run_case(pattern, shape, dtype)
+            print(f"{r['pattern']:20} {str(r['shape']):19} {r['dtype']:8} {r['plain_ms']:7.2f}ms "
+                  f"{r['untiled_ms']:7.2f}ms {r['tiled_ms']:7.2f}ms {r['untiled_ms'] / r['tiled_ms']:7.2f}x "
+                  f"{r['tiled_selected']}")
+
+
+if __name__ == '__main__':
+    main()
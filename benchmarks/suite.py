@@ -0,0 +1,235 @@
+"""
+Benchmark suite comparing einops_impl with the installed einops package.
+
+Suites, each measured separately:
+    overhead   per-call time of rearrange on small arrays (plan cache hit)
+    parse      first-call time of a new pattern, caches cleared, flat and nested
+    transpose  throughput of large copying rearranges across dtypes and ranks
+    memory     peak memory allocated by expansion patterns (tracemalloc)
+
+Every result is one metric with its value for einops_impl and, where einops
+supports the case, for einops. Results are printed as a table and can be
+written as JSON. Given a baseline JSON from an earlier run, metrics that got
+worse by more than the threshold are reported and the exit code is 1.
+
+Run with:
+    python -m benchmarks --json results.json
+    python -m benchmarks --suite overhead parse --baseline results.json --threshold 0.25
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from einops_impl.cache import plan_cache, symbolic_cache
+from einops_impl.rearrange import rearrange
+from einops_impl.repeat import repeat
+
+try:
+    import einops
+except ImportError:
+    einops = None
+
+OVERHEAD_CASES = [
+    ('b h w c -> b c h w', (2, 4, 4, 3), {}),
+    ('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', (2, 8, 8, 3), {'p1': 2, 'p2': 2}),
+    ('b n (k d) -> b k n d', (2, 16, 32), {'k': 4}),
+    ('... c -> c ...', (3, 5, 7), {}),
+]
+
+# Nested patterns are not supported by einops, only measured for einops_impl
+PARSE_CASES = [
+    ('flat-4', 'b (h p1) (w p2) c -> b (h w) (p1 p2 c)', (2, 8, 8, 3), {'p1': 2, 'p2': 2}),
+    ('flat-16', ' '.join(f'a{i}' for i in range(16)) + ' -> ' + ' '.join(f'a{i}' for i in reversed(range(16))),
+     (1,) * 16, {}),
+    ('nested-3', '((a b) c) d -> a (b (c d))', (24, 5), {'a': 2, 'b': 3}),
+    ('nested-8', '((((((((a0 a1) a2) a3) a4) a5) a6) a7) a8) -> ' + ' '.join(f'a{i}' for i in range(9)),
+     (2 ** 9,), {f'a{i}': 2 for i in range(8)}),
+]
+
+TRANSPOSE_CASES = [
+    ('h w -> w h', (2048, 2048), {}),
+    ('b h w c -> b c h w', (16, 128, 128, 32), {}),
+    ('b c h w -> b h w c', (16, 32, 128, 128), {}),
+    ('b t (k d) -> b k t d', (32, 256, 512), {'k': 8}),
+    ('a b c d e -> e d c b a', (8, 8, 16, 16, 32), {}),
+]
+TRANSPOSE_DTYPES = [np.uint8, np.float32, np.float64]
+
+MEMORY_CASES = [
+    ('rearrange', 'a 1 c -> a b c', (256, 1, 256), {'b': 512}),
+    ('rearrange', 'a 1 c -> a (b c)', (256, 1, 256), {'b': 512}),
+    ('repeat', 'h w -> h w c', (512, 512), {'c': 64}),
+    ('repeat', 'h w -> (h 2) (w 2)', (512, 512), {}),
+]
+
+SUITES = ('overhead', 'parse', 'transpose', 'memory')
+
+
+def best_of(fn: Callable[[], object], number: int, repeat_count: int = 5) -> float:
+    fn()
+    return min(timeit.repeat(fn, number=number, repeat=repeat_count)) / number
+
+
+def peak_bytes(fn: Callable[[], object]) -> int:
+    """Peak memory traced while fn runs and its result is alive; NumPy reports its buffers to tracemalloc"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def clear_caches():
+    plan_cache.clear()
+    symbolic_cache.clear()
+    if einops is not None:
+        einops.einops._prepare_transformation_recipe.cache_clear()
+
+
+def result(suite: str, case: str, metric: str, unit: str, value: float,
+           reference: Optional[float], higher_is_better: bool = False) -> Dict:
+    return {'suite': suite, 'case': case, 'metric': metric, 'unit': unit, 'value': value,
+            'einops': reference, 'higher_is_better': higher_is_better}
+
+
+def run_overhead(quick: bool) -> List[Dict]:
+    results = []
+    for pattern, shape, axis_lengths in OVERHEAD_CASES:
+        x = np.random.rand(*shape)
+        number = 200 if quick else 2000
+        ours = best_of(lambda: rearrange(x, pattern, **axis_lengths), number)
+        reference = None
+        if einops is not None:
+            reference = best_of(lambda: einops.rearrange(x, pattern, **axis_lengths), number) * 1e6
+        results.append(result('overhead', pattern, 'time', 'us', ours * 1e6, reference))
+    return results
+
+
+def run_parse(quick: bool) -> List[Dict]:
+    results = []
+    for name, pattern, shape, axis_lengths in PARSE_CASES:
+        x = np.zeros(shape)
+        number = 20 if quick else 200
+
+        def cold(function):
+            def call():
+                clear_caches()
+                function(x, pattern, **axis_lengths)
+            return best_of(call, number) * 1e6
+
+        reference = None
+        if einops is not None and not name.startswith('nested'):
+            reference = cold(einops.rearrange)
+        results.append(result('parse', name, 'first_call', 'us', cold(rearrange), reference))
+    clear_caches()
+    return results
+
+
+def run_transpose(quick: bool) -> List[Dict]:
+    results = []
+    for dtype in TRANSPOSE_DTYPES:
+        for pattern, shape, axis_lengths in TRANSPOSE_CASES:
+            if quick:
+                shape = (shape[0] // 4,) + shape[1:]
+            x = (np.random.rand(*shape) * 100).astype(dtype)
+            gigabytes = x.nbytes / 1e9
+            ours = best_of(lambda: rearrange(x, pattern, copy=True, **axis_lengths), 1, 3)
+            reference = None
+            if einops is not None:
+                reference = gigabytes / best_of(
+                    lambda: np.ascontiguousarray(einops.rearrange(x, pattern, **axis_lengths)), 1, 3)
+            case = f"{pattern} {np.dtype(dtype).name} {x.ndim}d"
+            results.append(result('transpose', case, 'throughput', 'GB/s', gigabytes / ours, reference,
+                                  higher_is_better=True))
+    return results
+
+
+def run_memory(quick: bool) -> List[Dict]:
+    results = []
+    for operation, pattern, shape, axis_lengths in MEMORY_CASES:
+        x = np.random.rand(*shape)
+        ours = rearrange if operation == 'rearrange' else repeat
+        value = peak_bytes(lambda: ours(x, pattern, **axis_lengths)) / 2**20
+        reference = None
+        if einops is not None:
+            # einops only expands axes in repeat, which accepts the same patterns
+            reference = peak_bytes(lambda: einops.repeat(x, pattern, **axis_lengths)) / 2**20
+        results.append(result('memory', f"{operation} {pattern}", 'peak', 'MiB', value, reference))
+    return results
+
+
+RUNNERS = {'overhead': run_overhead, 'parse': run_parse, 'transpose': run_transpose, 'memory': run_memory}
+
+
+def regressions(results: List[Dict], baseline: List[Dict], threshold: float) -> List[str]:
+    """
+    Metrics worse than in baseline by more than threshold (0.2 = 20%),
+    matched by suite, case and metric. Cases missing from baseline are skipped.
+    """
+    previous = {(r['suite'], r['case'], r['metric']): r for r in baseline}
+    messages = []
+    for r in results:
+        old = previous.get((r['suite'], r['case'], r['metric']))
+        if old is None or not old['value']:
+            continue
+        change = (r['value'] - old['value']) / old['value']
+        if r['higher_is_better']:
+            change = -change
+        if change > threshold:
+            messages.append(f"{r['suite']} {r['case']} {r['metric']}: {old['value']:.4g} -> "
+                            f"{r['value']:.4g} {r['unit']} ({change:+.0%} worse)")
+    return messages
+
+
+def environment() -> Dict:
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np.__version__, 'einops': getattr(einops, '__version__', None)}
+
+
+def print_table(results: List[Dict]):
+    print(f"{'suite':10} {'case':48} {'metric':11} {'einops_impl':>12} {'einops':>12} {'ratio':>7}")
+    for r in results:
+        reference = f"{r['einops']:12.4g}" if r['einops'] is not None else f"{'-':>12}"
+        ratio = '-'
+        if r['einops']:
+            ratio = f"{(r['value'] / r['einops'] if r['higher_is_better'] else r['einops'] / r['value']):.2f}x"
+        print(f"{r['suite']:10} {r['case'][:48]:48} {r['metric'] + ' ' + r['unit']:11} "
+              f"{r['value']:12.4g} {reference} {ratio:>7}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--suite', nargs='+', choices=SUITES, default=list(SUITES),
+                        help='suites to run (default: all)')
+    parser.add_argument('--json', metavar='PATH', help='write the results as JSON to PATH')
+    parser.add_argument('--baseline', metavar='PATH', help='JSON from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative regression that fails the run, default 0.2 (20%%)')
+    parser.add_argument('--quick', action='store_true', help='fewer repetitions and smaller arrays')
+    args = parser.parse_args(argv)
+
+    results = []
+    for suite in args.suite:
+        results.extend(RUNNERS[suite](args.quick))
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        failed = regressions(results, baseline, args.threshold)
+        for message in failed:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if failed:
+            return 1
+    return 0
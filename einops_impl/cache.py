@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Hashable, Optional
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class PlanCache:
+    """
+    Bounded LRU cache of compiled plans.
+
+    Example:
+        cache = PlanCache(maxsize=2)
+        cache.get_or_build('key', lambda: 42)  -> 42 (miss)
+        cache.get_or_build('key', lambda: 42)  -> 42 (hit)
+        cache.info()
+        -> CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+    """
+    def __init__(self, maxsize: Optional[int] = 256):
+        self._check_maxsize(maxsize)
+        self._maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _check_maxsize(maxsize: Optional[int]):
+        if maxsize is not None and (not isinstance(maxsize, int) or maxsize < 0):
+            raise ValueError(f"Cache size must be a non-negative integer or None, got {maxsize!r}")
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Return the cached plan for key, building and storing it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # Build outside the lock: planning may raise, and failures are never cached
+        plan = build()
+
+        with self._lock:
+            if self._maxsize != 0:
+                self._entries[key] = plan
+                self._entries.move_to_end(key)
+                self._evict()
+        return plan
+
+    def _evict(self):
+        if self._maxsize is None:
+            return
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        """Return hit/miss counters together with the current and maximum size"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self._maxsize, len(self._entries))
+
+    def resize(self, maxsize: Optional[int]):
+        """Change the maximum number of plans, evicting the least recently used ones"""
+        self._check_maxsize(maxsize)
+        with self._lock:
+            self._maxsize = maxsize
+            if maxsize == 0:
+                self._entries.clear()
+            self._evict()
+
+    def clear(self):
+        """Drop all cached plans and reset the hit/miss counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by all operations; inspect with plan_cache.info(), tune with
+# plan_cache.resize(n) and reset with plan_cache.clear()
+plan_cache = PlanCache()
+
+# Shape-independent plans, one per pattern, input rank and set of axis lengths.
+# A miss in plan_cache for a new shape only specializes one of these.
+symbolic_cache = PlanCache(maxsize=128)
@@ -0,0 +1,101 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from .plan import SymbolicRearrangePlan
+
+
+def _size_expr(size: Tuple[Optional[int], int]) -> str:
+    dim, value = size
+    if dim is None:
+        return str(value)
+    return f"d{dim}" if value == 1 else f"d{dim} // {value}"
+
+
+def _product_expr(factors: List[str]) -> str:
+    """Product of size expressions with the constant factors folded into one"""
+    constant = 1
+    symbols = []
+    for factor in factors:
+        if factor.isdigit():
+            constant *= int(factor)
+        else:
+            symbols.append(f"({factor})" if '//' in factor and len(factors) > 1 else factor)
+    if constant != 1 or not symbols:
+        symbols.append(str(constant))
+    return ' * '.join(symbols)
+
+
+def _tuple_expr(items: List[str]) -> str:
+    return f"({items[0]},)" if len(items) == 1 else f"({', '.join(items)})"
+
+
+def generate_source(symbolic: SymbolicRearrangePlan, pattern: str, name: str = 'rearrange_generated') -> str:
+    """
+    Python source of a straight-line function applying symbolic to an array.
+
+    The function unpacks the shape once, checks the constraints inline and
+    then does one reshape, the broadcasts for expanded axes, one transpose and
+    one reshape; steps that would be no-ops are left out.
+
+    Example:
+        generate_source(get_symbolic_plan('b (h w) c -> b c h w', 3, {'h': 4}), 'b (h w) c -> b c h w')
+        ->
+        def rearrange_generated(tensor):
+            if type(tensor) is not ndarray and not isinstance(tensor, ndarray):
+                raise ValueError(...)
+            if tensor.ndim != 3:
+                raise ValueError(...)
+            d0, d1, d2 = tensor.shape
+            if d1 % 4:
+                raise ValueError(...)
+            return tensor.reshape((d0, 4, d1 // 4, d2)).transpose((0, 3, 1, 2))
+    """
+    ndim = symbolic.ndim
+    lines = [
+        f"def {name}(tensor):",
+        "    if type(tensor) is not ndarray and not isinstance(tensor, ndarray):",
+        "        raise ValueError(f\"Expected numpy array, got {type(tensor).__name__}\")",
+    ]
+    lines += [
+        f"    if tensor.ndim != {ndim}:",
+        f"        raise ValueError(f\"Pattern {pattern!r} expects {ndim} dimensions, got {{tensor.ndim}}\")",
+    ]
+    if ndim:
+        lines.append(f"    {', '.join(f'd{dim}' for dim in range(ndim))}{',' if ndim == 1 else ''} = tensor.shape")
+    for dim, value, exact in symbolic.constraints:
+        if exact:
+            lines += [f"    if d{dim} != {value}:",
+                      f"        raise ValueError(f\"Dimension {dim} of input shape {{tensor.shape}} has size {{d{dim}}}, expected {value}\")"]
+        else:
+            lines += [f"    if d{dim} % {value}:",
+                      f"        raise ValueError(f\"Cannot evenly divide group size {{d{dim}}} by known product {value}\")"]
+
+    init = [_size_expr(size) for size in symbolic.init_sizes]
+    expanded = list(init)
+    for axis, size in symbolic.expansions:
+        expanded[axis] = str(size)
+
+    expr = "tensor"
+    if symbolic.init_sizes != tuple((dim, 1) for dim in range(ndim)):
+        expr += f".reshape({_tuple_expr(init) if init else '()'})"
+    if symbolic.expansions:
+        expr = f"broadcast_to({expr}, {_tuple_expr(expanded)})"
+    if symbolic.perm != tuple(range(len(symbolic.perm))):
+        expr += f".transpose({_tuple_expr([str(axis) for axis in symbolic.perm])})"
+    if any(len(group) != 1 for group in symbolic.output_groups):
+        final = [_product_expr([expanded[axis] for axis in group]) for group in symbolic.output_groups]
+        expr += f".reshape({_tuple_expr(final) if final else '()'})"
+    lines.append(f"    return {expr}")
+    return '\n'.join(lines) + '\n'
+
+
+def compile_symbolic_plan(symbolic: SymbolicRearrangePlan, pattern: str) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    exec the generated source and return the function. Its source is kept
+    in the function's __source__ attribute for inspection.
+    """
+    source = generate_source(symbolic, pattern)
+    namespace: Dict[str, object] = {'ndarray': np.ndarray, 'broadcast_to': np.broadcast_to}
+    exec(compile(source, f"<rearrange {pattern!r}>", 'exec'), namespace)
+    function = namespace['rearrange_generated']
+    function.__source__ = source
+    return function
@@ -0,0 +1,167 @@
+import string
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from .cache import plan_cache
+from .plan import expand_group, parse_rearrange_pattern, split_input_axes
+from .shape_analzer import ShapeAnalyzer
+from .utils import prod
+
+# np.einsum subscripts are single letters
+LETTERS = string.ascii_letters
+
+
+class EinsumPlan:
+    """
+    Compiled form of an einsum for one pattern, set of operand shapes and axis lengths.
+
+    Applying a plan splits every operand into its elementary axes (a reshape,
+    a view for contiguous operands), runs np.einsum with the precomputed
+    contraction path and merges the output groups with a final reshape.
+
+    Example:
+        plan = build_einsum_plan('b (h d) i, b (h d) j -> b h i j', [(2, 32, 5), (2, 32, 7)], {'h': 4})
+        plan.subscripts   -> 'abcd,abce->abde'
+        plan.split_shapes -> ((2, 4, 8, 5), (2, 4, 8, 7))
+        plan.final_shape  -> (2, 4, 5, 7)
+    """
+    def __init__(self, input_shapes: Tuple[Tuple[int, ...], ...], split_shapes: Tuple[Tuple[int, ...], ...],
+                 subscripts: str, output_shape: Tuple[int, ...], final_shape: Tuple[int, ...]):
+        self.input_shapes = input_shapes
+        self.split_shapes = split_shapes
+        self.subscripts = subscripts
+        self.output_shape = output_shape
+        self.final_shape = final_shape
+        # Contraction path, computed by np.einsum_path on the first apply and reused after
+        self.path = None
+
+    def apply(self, tensors: Sequence[np.ndarray]) -> np.ndarray:
+        views = [tensor.reshape(shape) for tensor, shape in zip(tensors, self.split_shapes)]
+        if self.path is None:
+            self.path = np.einsum_path(self.subscripts, *views, optimize='greedy')[0]
+        result = np.einsum(self.subscripts, *views, optimize=self.path)
+        return result.reshape(self.final_shape)
+
+    def __repr__(self):
+        return (f"EinsumPlan(subscripts={self.subscripts!r}, split_shapes={self.split_shapes}, "
+                f"final_shape={self.final_shape}, path={self.path})")
+
+
+def parse_einsum_pattern(pattern: str) -> Tuple[List[Tuple[List[str], Dict[str, List[str]]]],
+                                                Tuple[List[str], Dict[str, List[str]]]]:
+    """
+    Parse 'in1, in2, ... -> out' into the axes and groups of every operand and
+    of the output. Each side goes through Parser, so groups may be nested.
+
+    Raises:
+        ValueError: If the pattern is invalid or uses '...'
+    """
+    if '->' not in pattern:
+        raise ValueError("Invalid pattern: missing arrow '->'. Pattern must be in format 'in1, in2 -> output'")
+    left, output = pattern.split('->', 1)
+    operands = []
+    for side in left.split(','):
+        if not side.strip():
+            raise ValueError(f"Empty operand in einsum pattern '{pattern}'")
+        input_axes, _, grouped_axes = parse_rearrange_pattern(f"{side}->")
+        operands.append((input_axes, grouped_axes))
+    _, output_axes, grouped_axes = parse_rearrange_pattern(f"->{output}")
+    for axes, groups in operands + [(output_axes, grouped_axes)]:
+        if '...' in axes or any('...' in leaves for leaves in groups.values()):
+            raise ValueError("Ellipsis is not supported by einsum, name the axes instead")
+    return operands, (output_axes, grouped_axes)
+
+
+def build_einsum_plan(pattern: str, shapes: Sequence[Tuple[int, ...]], axis_lengths: Dict[str, int]) -> EinsumPlan:
+    """
+    Resolve every axis size for the given operand shapes.
+
+    Sizes found in one operand are known when analyzing the next, so an axis
+    only needs to be inferable from one of them.
+
+    Raises:
+        ValueError: If the pattern does not fit the shapes or the axis sizes disagree
+    """
+    operands, (output_axes, output_groups) = parse_einsum_pattern(pattern)
+    if len(operands) != len(shapes):
+        raise ValueError(f"Pattern '{pattern}' has {len(operands)} operands, got {len(shapes)} arrays")
+
+    known = dict(axis_lengths)
+    compositions = []
+    split_shapes = []
+    for (input_axes, grouped_axes), shape in zip(operands, shapes):
+        if len(shape) != len(input_axes):
+            raise ValueError(f"Operand '{' '.join(input_axes)}' expects {len(input_axes)} dimensions, got {len(shape)}")
+        for axis, size in zip(input_axes, shape):
+            if axis not in grouped_axes and axis not in axis_lengths and known.get(axis, size) != size:
+                raise ValueError(f"Axis '{axis}' has size {size} in one operand and {known[axis]} in another")
+        axis_sizes = ShapeAnalyzer.get_axis_size_from_shape(shape, input_axes, grouped_axes, known)
+        composition, split_shape, _ = split_input_axes(input_axes, grouped_axes, axis_sizes, shape)
+        for axis, size in zip(composition, split_shape):
+            if known.setdefault(axis, size) != size:
+                raise ValueError(f"Axis '{axis}' has size {size} in one operand and {known[axis]} in another")
+        compositions.append(composition)
+        split_shapes.append(tuple(split_shape))
+
+    output_composition = []
+    final_shape = []
+    for axis in output_axes:
+        group = expand_group(axis, output_groups) if axis in output_groups else [axis]
+        for name in group:
+            if name not in known or not any(name in composition for composition in compositions):
+                raise ValueError(f"Output axis '{name}' does not appear in any operand")
+        output_composition.extend(group)
+        final_shape.append(prod(known[name] for name in group))
+    if len(set(output_composition)) != len(output_composition):
+        raise ValueError(f"Output axes must be unique in '{pattern}'")
+
+    letters: Dict[str, str] = {}
+    for axis in [axis for composition in compositions for axis in composition]:
+        if axis not in letters:
+            if len(letters) == len(LETTERS):
+                raise ValueError(f"einsum supports at most {len(LETTERS)} distinct axes")
+            letters[axis] = LETTERS[len(letters)]
+    subscripts = (','.join(''.join(letters[axis] for axis in composition) for composition in compositions)
+                  + '->' + ''.join(letters[axis] for axis in output_composition))
+    return EinsumPlan(tuple(tuple(shape) for shape in shapes), tuple(split_shapes), subscripts,
+                      tuple(known[axis] for axis in output_composition), tuple(final_shape))
+
+
+def get_einsum_plan(pattern: str, shapes: Tuple[Tuple[int, ...], ...], axis_lengths: Dict[str, int]) -> EinsumPlan:
+    """Look up the compiled plan, and with it the contraction path, in the shared plan cache"""
+    key = ('einsum', pattern, shapes, tuple(sorted(axis_lengths.items())))
+    return plan_cache.get_or_build(key, lambda: build_einsum_plan(pattern, shapes, axis_lengths))
+
+
+def einsum(*tensors_and_pattern, **axis_lengths) -> np.ndarray:
+    """
+    Einstein summation with named axes, composite and nested groups.
+
+    Grouped input axes are split with reshape views before contracting, and
+    grouped output axes are merged afterwards, so a rearrange-then-contract
+    sequence becomes a single np.einsum call. The contraction path is computed
+    once per pattern and shapes and cached with the plan.
+
+    Args:
+        *tensors_and_pattern: The operands, followed by the pattern
+            'in1, in2, ... -> out'
+        **axis_lengths: Known axis lengths
+
+    Returns:
+        The contraction, with the output axes as in the pattern
+
+    Example:
+        >>> q, k = np.random.rand(2, 64, 5), np.random.rand(2, 64, 7)
+        >>> einsum(q, k, 'b (h d) i, b (h d) j -> b h i j', h=8).shape
+        (2, 8, 5, 7)
+
+    Raises:
+        ValueError: If the arguments, the pattern or the axis sizes are invalid
+    """
+    if len(tensors_and_pattern) < 2 or not isinstance(tensors_and_pattern[-1], str):
+        raise ValueError("einsum expects one or more arrays followed by a pattern string")
+    *tensors, pattern = tensors_and_pattern
+    for i, tensor in enumerate(tensors):
+        if not isinstance(tensor, np.ndarray):
+            raise ValueError(f"Expected numpy array for operand {i}, got {type(tensor).__name__}")
+    plan = get_einsum_plan(pattern, tuple(tensor.shape for tensor in tensors), axis_lengths)
+    return plan.apply(tensors)
@@ -0,0 +1,179 @@
+from math import gcd
+from typing import Iterator, List, Tuple
+import numpy as np
+from .utils import prod
+
+# Scratch memory of an in-place permutation: the block being moved plus its
+# index arrays. A single row or column of the transposed matrix is the
+# smallest block, so that is used instead when it is larger.
+INPLACE_BATCH_BYTES = 16 * 2**20
+MIN_BATCH_BYTES = 64 * 2**10
+# Square transposes swap mirrored tiles instead when tiles at least this large fit the budget
+SQUARE_MIN_TILE = 16
+# Scratch bytes per moved unit for computing and holding its indices
+INDEX_BYTES = 48
+
+
+def _blocks(outer: int, inner: int, itemsize: int, budget: int) -> Iterator[Tuple[slice, slice]]:
+    """Blocks of the (outer, inner) slab plane, each at most budget bytes unless a single element is larger"""
+    inner_step = min(inner, max(1, budget // itemsize))
+    outer_step = min(outer, max(1, budget // (inner_step * itemsize)))
+    for o in range(0, outer, outer_step):
+        for i in range(0, inner, inner_step):
+            yield slice(o, o + outer_step), slice(i, i + inner_step)
+
+
+def _swap_square_tiles(slabs: np.ndarray, budget: int) -> bool:
+    """
+    Transpose the two middle axes of slabs (outer, n, n, inner) in place by
+    swapping mirrored tiles. Returns False, leaving slabs untouched, if the
+    budget only allows tiles too small to pay off.
+    """
+    outer, n, _, inner = slabs.shape
+    tile = int((budget // (outer * inner * slabs.itemsize)) ** 0.5)
+    tile = min(n, tile)
+    if tile < SQUARE_MIN_TILE and tile < n:
+        return False
+    for i in range(0, n, tile):
+        rows = slice(i, i + tile)
+        diagonal = slabs[:, rows, rows, :]
+        diagonal[...] = diagonal.transpose(0, 2, 1, 3).copy()
+        for j in range(i + tile, n, tile):
+            columns = slice(j, j + tile)
+            upper = slabs[:, rows, columns, :].copy()
+            slabs[:, rows, columns, :] = slabs[:, columns, rows, :].transpose(0, 2, 1, 3)
+            slabs[:, columns, rows, :] = upper.transpose(0, 2, 1, 3)
+    return True
+
+
+def _move_lines(slabs: np.ndarray, lines: int, along_rows: bool, indices, budget: int):
+    """
+    Permute every row (along_rows) or every column of the (m, n) plane of
+    slabs (outer, m, n, inner), a block of rows or columns at a time.
+
+    indices(block) returns (target, source) for a slice of rows or columns:
+    (row, column) index arrays into that block, or None for the block itself
+    in order. The block is then updated with block[target] = block[source].
+    """
+    outer, m, n, inner = slabs.shape
+    length = n if along_rows else m
+    unit_bytes = outer * inner * slabs.itemsize
+    # Lines per block: the moved units and their index arithmetic fit the budget, at least one line
+    step = max(1, budget // (length * (unit_bytes + INDEX_BYTES)))
+    for first in range(0, lines, step):
+        block = slice(first, min(first + step, lines))
+        target, source = indices(block)
+        view = slabs[:, block, :, :] if along_rows else slabs[:, :, block, :]
+        plane_budget = max(1, budget // (2 * length * (block.stop - block.start)))
+        for o, i in _blocks(outer, inner, slabs.itemsize, plane_budget):
+            part = view[o, :, :, i]
+            values = part.copy() if source is None else part[:, source[0], source[1], :]
+            if target is None:
+                part[...] = values
+            else:
+                part[:, target[0], target[1], :] = values
+
+
+def transpose_inplace(slabs: np.ndarray, budget: int = INPLACE_BATCH_BYTES):
+    """
+    Transpose the two middle axes of slabs (outer, m, n, inner), a view of a
+    C-contiguous buffer, so that the buffer then holds (outer, n, m, inner).
+
+    Square planes swap mirrored tiles. Other shapes use the decomposition of
+    Catanzaro et al. (PPoPP 2014) into a column rotation, a permutation of
+    every row and a permutation of every column of the (m, n) plane. Each
+    stage moves whole rows or columns at a time with fancy indexing, so the
+    work is three vectorized passes over the data whatever the cycle
+    structure of the transpose, and scratch memory is bounded by budget.
+
+    Example:
+        x = np.arange(6.0)
+        transpose_inplace(x.reshape(1, 2, 3, 1))
+        x  -> [0, 3, 1, 4, 2, 5]
+    """
+    outer, m, n, inner = slabs.shape
+    if m == 1 or n == 1 or slabs.size == 0:
+        return
+    if m == n and _swap_square_tiles(slabs, budget // 2):
+        return
+    # Element (i, j) moves to flat position j * m + i of the plane. First every
+    # column j is rotated down by j // b, after which every row holds elements
+    # bound for distinct columns; rows, then columns, are permuted from there.
+    b = n // gcd(m, n)
+    index_type = np.int32 if m * n < 2**31 else np.int64
+
+    def rotate(columns: slice):
+        j = np.arange(columns.start, columns.stop, dtype=index_type)
+        return None, ((np.arange(m, dtype=index_type)[:, None] - j // b) % m, j[None, :] - columns.start)
+
+    def shuffle_rows(rows: slice):
+        r = np.arange(rows.start, rows.stop, dtype=index_type)[:, None]
+        j = np.arange(n, dtype=index_type)
+        i = (r - j // b) % m
+        return (r - rows.start, (j * m + i) % n), None
+
+    def shuffle_columns(columns: slice):
+        c = np.arange(columns.start, columns.stop, dtype=index_type)
+        d = np.arange(m, dtype=index_type)[:, None] * n + c
+        i, j = d % m, d // m
+        return None, ((i + j // b) % m, c[None, :] - columns.start)
+
+    if b != n:
+        _move_lines(slabs, n, False, rotate, budget)
+    _move_lines(slabs, m, True, shuffle_rows, budget)
+    _move_lines(slabs, n, False, shuffle_columns, budget)
+
+
+def _transpose_steps(shape: Tuple[int, ...], perm: Tuple[int, ...]) -> List[Tuple[int, int, int, int]]:
+    """
+    Swaps of two adjacent groups of axes that together apply perm, as
+    (outer, m, n, inner) shapes: each moves the next run of output axes,
+    already adjacent and in order, in front of the axes before it.
+
+    Example:
+        _transpose_steps((2, 3, 4, 5), (2, 3, 0, 1))  -> [(1, 6, 20, 1)]
+    """
+    order = list(range(len(perm)))
+    steps = []
+    k = 0
+    while k < len(perm):
+        p = order.index(perm[k])
+        length = 1
+        while k + length < len(perm) and p + length < len(perm) and order[p + length] == perm[k + length]:
+            length += 1
+        if p != k:
+            sizes = [shape[axis] for axis in order]
+            steps.append((prod(sizes[:k]), prod(sizes[k:p]), prod(sizes[p:p + length]), prod(sizes[p + length:])))
+            order = order[:k] + order[p:p + length] + order[k:p] + order[p + length:]
+        k += length
+    return steps
+
+
+def permute_inplace(tensor: np.ndarray, shape: Tuple[int, ...], perm: Tuple[int, ...],
+                    batch_bytes: int = INPLACE_BATCH_BYTES) -> np.ndarray:
+    """
+    Transpose the data of a writable C-contiguous array in its own buffer.
+
+    Afterwards the buffer holds np.transpose(tensor.reshape(shape), perm) in C
+    order; that array is returned as a view of tensor.
+
+    The permutation is split into swaps of two adjacent groups of axes (see
+    _transpose_steps), each done by transpose_inplace with whole slabs of the
+    axes around the groups as units. Extra memory is the smaller of
+    batch_bytes and a quarter of the array (at least MIN_BATCH_BYTES), or one
+    row or column of a swapped pair of groups if that is larger.
+
+    Example:
+        x = np.arange(6.0)
+        permute_inplace(x, (2, 3), (1, 0))  -> view of x, [[0, 3], [1, 4], [2, 5]]
+    """
+    if not (tensor.flags.c_contiguous and tensor.flags.writeable):
+        raise ValueError("In-place rearrange needs a writable C-contiguous array")
+    result_shape = tuple(shape[axis] for axis in perm)
+    if tensor.size == 0:
+        return tensor.reshape(result_shape)
+    # Small arrays get a proportionally smaller budget, so the scratch stays well below a copy
+    budget = min(batch_bytes, max(tensor.nbytes // 4, MIN_BATCH_BYTES))
+    for step in _transpose_steps(shape, perm):
+        transpose_inplace(tensor.reshape(step), budget)
+    return tensor.reshape(result_shape)
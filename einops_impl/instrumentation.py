@@ -0,0 +1,161 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import numpy as np
+from .cache import plan_cache, symbolic_cache
+
+# Stages timed by the hooks in parser, plan, rearrange, recipe and lazy:
+#   parse       Parser.parse of a pattern (plan-cache misses only)
+#   analyze     ShapeAnalyzer axis sizes, concrete or symbolic
+#   specialize  concrete plan from a symbolic plan
+#   views       split/expand/transpose views (Operations.split_axis, expand_axis, transpose_axes)
+#   copy        the final reshape and any data copy
+#   total       whole calls of rearrange, rearrange_many, recipes and LazyRearrange.evaluate
+STAGES = ('parse', 'analyze', 'specialize', 'views', 'copy', 'total')
+
+
+class Stats:
+    """
+    Counters collected while instrumentation is enabled.
+
+    Example:
+        with instrument() as stats:
+            rearrange(x, 'b h w c -> b c h w')
+        stats.snapshot()['patterns']  -> {'b h w c -> b c h w': 1}
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero all counters and restart counting cache lookups from now"""
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.patterns: Dict[str, int] = {}
+        self.views = 0
+        self.copies = 0
+        self.bytes_viewed = 0
+        self.bytes_copied = 0
+        # [hits, misses] of cache kinds counted per lookup, such as the caches of compiled recipes
+        self.lookups: Dict[str, list] = {}
+        self._cache_start = {'plan': plan_cache.info(), 'symbolic': symbolic_cache.info()}
+        self._cache_end = None
+
+    def finish(self):
+        """Freeze the cache counters at the end of the collection"""
+        self._cache_end = {'plan': plan_cache.info(), 'symbolic': symbolic_cache.info()}
+
+    def add_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+
+    def add_lookup(self, cache: str, hit: bool):
+        """Count a lookup in a cache that is not shared, e.g. cache='recipe' for a recipe's plans"""
+        with self._lock:
+            counts = self.lookups.setdefault(cache, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def add_result(self, pattern: Optional[str], tensor: Optional[np.ndarray], result: np.ndarray,
+                   copied: Optional[bool] = None):
+        """
+        Count a call of pattern and whether its result is a view of tensor or a
+        copy. copied overrides the check, e.g. for results written in place.
+        """
+        is_view = not copied if copied is not None else np.may_share_memory(result, tensor)
+        with self._lock:
+            self.patterns[pattern] = self.patterns.get(pattern, 0) + 1
+            if is_view:
+                self.views += 1
+                self.bytes_viewed += result.nbytes
+            else:
+                self.copies += 1
+                self.bytes_copied += result.nbytes
+
+    def snapshot(self) -> Dict:
+        """
+        Plain-dict copy of the counters. Cache hits and misses are counted over
+        the collection; hit_rate is None before the first lookup. 'recipe' and
+        'recipe_symbolic' add up the caches of all compiled recipes.
+        """
+        caches = {}
+        for name, cache in (('plan', plan_cache), ('symbolic', symbolic_cache)):
+            start = self._cache_start[name]
+            now = self._cache_end[name] if self._cache_end is not None else cache.info()
+            # A cleared cache restarts its counters
+            hits = now.hits - start.hits if now.hits >= start.hits else now.hits
+            misses = now.misses - start.misses if now.misses >= start.misses else now.misses
+            caches[name] = {'hits': hits, 'misses': misses,
+                            'hit_rate': hits / (hits + misses) if hits + misses else None}
+        with self._lock:
+            for name in ('recipe', 'recipe_symbolic'):
+                hits, misses = self.lookups.get(name, (0, 0))
+                caches[name] = {'hits': hits, 'misses': misses,
+                                'hit_rate': hits / (hits + misses) if hits + misses else None}
+            return {
+                'stages': {stage: {'calls': self.stage_calls[stage], 'seconds': self.stage_seconds[stage]}
+                           for stage in STAGES if stage in self.stage_calls},
+                'patterns': dict(self.patterns),
+                'views': self.views,
+                'copies': self.copies,
+                'bytes_viewed': self.bytes_viewed,
+                'bytes_copied': self.bytes_copied,
+                'caches': caches,
+            }
+
+
+# The active Stats, or None when instrumentation is disabled. Hooks only test
+# this for None, so disabled instrumentation costs one global lookup per hook.
+collector: Optional[Stats] = None
+clock = time.perf_counter
+
+
+def enable() -> Stats:
+    """Start collecting into a fresh Stats, replacing any active one"""
+    global collector
+    collector = Stats()
+    return collector
+
+
+def disable():
+    """Stop collecting; the last Stats stays readable through the object returned by enable"""
+    global collector
+    if collector is not None:
+        collector.finish()
+    collector = None
+
+
+def get_stats() -> Optional[Dict]:
+    """Snapshot of the active Stats, or None if instrumentation is disabled"""
+    active = collector
+    return None if active is None else active.snapshot()
+
+
+def reset_stats():
+    """Restart the active collection from zero"""
+    if collector is not None:
+        collector.reset()
+
+
+@contextmanager
+def instrument() -> Iterator[Stats]:
+    """
+    Collect statistics for the calls made inside the block. The Stats object
+    stays readable afterwards; an enclosing collection is paused meanwhile and
+    resumed on exit.
+
+    Example:
+        with instrument() as stats:
+            for batch in loader:
+                rearrange(batch, 'b h w c -> b c h w')
+        stats.snapshot()['caches']['plan']['hit_rate']
+    """
+    global collector
+    previous = collector
+    stats = collector = Stats()
+    try:
+        yield stats
+    finally:
+        stats.finish()
+        collector = previous
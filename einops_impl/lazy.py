@@ -0,0 +1,221 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from . import instrumentation
+from .cache import plan_cache
+from .plan import RearrangePlan, get_rearrange_plan
+from .utils import prod
+
+
+def _refine(a: List[int], b: List[int]) -> Optional[Tuple[List[List[int]], List[List[int]]]]:
+    """
+    Common refinement of two factorizations of the same number, with no
+    factor equal to 0 or 1. Returns the pieces every factor of a and of b is
+    cut into, or None if a factor of one straddles a boundary of the other.
+
+    Example:
+        _refine([2, 6], [4, 3]) -> ([[2], [2, 3]], [[2, 2], [3]])
+        _refine([6, 4], [4, 6]) -> None
+    """
+    pieces_a: List[List[int]] = [[] for _ in a]
+    pieces_b: List[List[int]] = [[] for _ in b]
+    i = j = 0
+    rest_a = a[0] if a else 1
+    rest_b = b[0] if b else 1
+    while i < len(a) and j < len(b):
+        if rest_a % rest_b == 0:
+            piece = rest_b
+        elif rest_b % rest_a == 0:
+            piece = rest_a
+        else:
+            return None
+        pieces_a[i].append(piece)
+        pieces_b[j].append(piece)
+        rest_a //= piece
+        rest_b //= piece
+        if rest_a == 1:
+            i += 1
+            rest_a = a[i] if i < len(a) else 1
+        if rest_b == 1:
+            j += 1
+            rest_b = b[j] if j < len(b) else 1
+    return pieces_a, pieces_b
+
+
+class LazyRearrange:
+    """
+    A chain of rearranges of one array that has not been evaluated yet.
+
+    The chain is kept as a single reshape -> transpose -> reshape of the base
+    array: split_shape is a factorization of the base in memory order, order
+    the permutation of those factors and shape the current result shape, each
+    of its axes merging spans[k] consecutive permuted factors. Every further
+    rearrange refines the factorization and composes the permutations, so the
+    whole chain moves the data at most once, in evaluate().
+
+    Steps that cannot be composed end the current segment: its plan and the
+    step's plan are appended to pending, and a new segment starts on the
+    step's result. pending plans are applied to base in order, and only
+    when the chain is evaluated. patterns are those composed into the current
+    segment; instrumentation counts its result under them, joined by ' | '.
+
+    Example:
+        >>> y = lazy(x).rearrange('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', p1=2, p2=2)
+        >>> y = y.rearrange('b n (k d) -> b k n d', k=4)
+        >>> y.evaluate()  # one transpose instead of two
+    """
+    def __init__(self, base: np.ndarray, split_shape: Tuple[int, ...], order: Tuple[int, ...],
+                 shape: Tuple[int, ...], spans: Tuple[int, ...], pending: Tuple[RearrangePlan, ...] = (),
+                 patterns: Tuple[str, ...] = ()):
+        self.base = base
+        self.split_shape = split_shape
+        self.order = order
+        self.shape = shape
+        self.spans = spans
+        self.pending = pending
+        self.patterns = patterns
+
+    @classmethod
+    def from_array(cls, tensor: np.ndarray, shape: Optional[Tuple[int, ...]] = None,
+                   pending: Tuple[RearrangePlan, ...] = ()) -> 'LazyRearrange':
+        """Identity chain on tensor, or on the result of pending, which has the given shape"""
+        shape = tensor.shape if shape is None else shape
+        # Size-1 axes carry no data and are left out of the factorization
+        split_shape = tuple(size for size in shape if size != 1)
+        return cls(tensor, split_shape, tuple(range(len(split_shape))), shape,
+                   tuple(int(size != 1) for size in shape), pending)
+
+    @property
+    def input_shape(self) -> Tuple[int, ...]:
+        """Shape of the array the current segment starts from"""
+        return self.pending[-1].final_shape if self.pending else self.base.shape
+
+    def rearrange(self, pattern: str, **axis_lengths) -> 'LazyRearrange':
+        """
+        Append a rearrange to the chain. The pattern is checked against the
+        current shape right away, but no data is touched.
+
+        Raises:
+            ValueError: If the pattern does not fit the current shape
+        """
+        plan = get_rearrange_plan(pattern, self.shape, axis_lengths)
+        composed = None
+        if not plan.expansions and prod(self.shape):
+            composed = self._compose(plan)
+        if composed is None:
+            # Expansions and empty arrays are not composed: the step starts a
+            # new segment, run after the current one in evaluate()
+            pending = self.pending if self.is_identity() else self.pending + (self.plan,)
+            return LazyRearrange.from_array(self.base, plan.final_shape, pending + (plan,))
+        return composed
+
+    def _compose(self, plan: RearrangePlan) -> Optional['LazyRearrange']:
+        pieces: List[List[int]] = [[] for _ in self.split_shape]
+        # Factors of every non-1 init axis of plan, as (factor, piece) pairs
+        init_refs: Dict[int, List[Tuple[int, int]]] = {}
+        start = 0
+        init_start = 0
+        for span, init_span in zip(self.spans, plan.input_spans):
+            factors = self.order[start:start + span]
+            init_axes = [axis for axis in range(init_start, init_start + init_span)
+                         if plan.init_shape[axis] != 1]
+            start += span
+            init_start += init_span
+            refined = _refine([self.split_shape[factor] for factor in factors],
+                              [plan.init_shape[axis] for axis in init_axes])
+            if refined is None:
+                return None
+            factor_pieces, init_pieces = refined
+            refs = []
+            for factor, sizes in zip(factors, factor_pieces):
+                pieces[factor] = sizes
+                refs.extend((factor, k) for k in range(len(sizes)))
+            for axis, sizes in zip(init_axes, init_pieces):
+                init_refs[axis], refs = refs[:len(sizes)], refs[len(sizes):]
+
+        split_shape = []
+        ids = {}
+        for factor, sizes in enumerate(pieces):
+            for k, size in enumerate(sizes):
+                ids[factor, k] = len(split_shape)
+                split_shape.append(size)
+
+        order = []
+        spans = []
+        transposed = iter(plan.perm)
+        for out_span in plan.output_spans:
+            count = 0
+            for _ in range(out_span):
+                axis = next(transposed)
+                for ref in init_refs.get(axis, ()):
+                    order.append(ids[ref])
+                    count += 1
+            spans.append(count)
+        return LazyRearrange(self.base, tuple(split_shape), tuple(order), plan.final_shape, tuple(spans),
+                             self.pending, self.patterns + (plan.pattern,))
+
+    @property
+    def plan(self) -> RearrangePlan:
+        """The combined plan of the current segment, taking its input (see input_shape) to the result"""
+        input_shape = self.input_shape
+        pattern = ' | '.join(self.patterns)
+        key = ('lazy', pattern, input_shape, self.split_shape, self.order, self.shape)
+        return plan_cache.get_or_build(key, lambda: RearrangePlan(
+            input_shape, self.split_shape, (), self.order, self.shape, pattern=pattern))
+
+    def is_identity(self) -> bool:
+        """Whether the current segment gives back its input unchanged"""
+        return self.shape == self.input_shape and self.order == tuple(range(len(self.order)))
+
+    def evaluate(self, materialize: bool = False, copy: Optional[bool] = None,
+                 out: Optional[np.ndarray] = None, threads: Optional[int] = None,
+                 chunk_bytes: Optional[int] = None) -> np.ndarray:
+        """
+        Run the pending plans and the combined plan on the base array. Takes
+        the same options as rearrange(); they apply to the last step, except
+        that copy=False also applies to the pending plans. An identity chain
+        returns the base array itself.
+        """
+        collector = instrumentation.collector
+        if collector is not None:
+            start = instrumentation.clock()
+        tensor = self.base
+        # The plans count their results, see RearrangePlan.apply
+        for plan in self.pending:
+            tensor = plan.apply(tensor, copy=False if copy is False else None, threads=threads)
+        if self.is_identity() and not materialize and not copy and out is None and chunk_bytes is None:
+            result = tensor
+            if collector is not None and self.patterns:
+                collector.add_result(' | '.join(self.patterns), self.base, result)
+        else:
+            result = self.plan.apply(tensor, materialize=materialize, copy=copy, out=out,
+                                     threads=threads, chunk_bytes=chunk_bytes)
+        if collector is not None:
+            collector.add_stage('total', instrumentation.clock() - start)
+        return result
+
+    def __array__(self, dtype=None, copy=None):
+        result = self.evaluate(copy=copy)
+        return result if dtype is None else result.astype(dtype, copy=False)
+
+    def __repr__(self):
+        pending = f", pending={len(self.pending)}" if self.pending else ''
+        return (f"LazyRearrange(base_shape={self.base.shape}, split_shape={self.split_shape}, "
+                f"order={self.order}, shape={self.shape}{pending})")
+
+
+def lazy(tensor: np.ndarray) -> LazyRearrange:
+    """
+    Start a lazy chain of rearranges on tensor.
+
+    Example:
+        >>> x = np.random.rand(2, 3, 4)
+        >>> y = lazy(x).rearrange('a b c -> c (a b)').rearrange('c (a b) -> a b c', a=2)
+        >>> y.evaluate() is x
+        True
+
+    Raises:
+        ValueError: If tensor is not a numpy array
+    """
+    if not isinstance(tensor, np.ndarray):
+        raise ValueError(f"Expected numpy array, got {type(tensor).__name__}")
+    return LazyRearrange.from_array(tensor)
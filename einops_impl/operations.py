@@ -1,5 +1,15 @@
+import mmap
 import numpy as np
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
+
+# Thresholds for the tiled transpose, measured with benchmarks/bench_transpose.py:
+# below a few MB, or when one of the swapped axes is short (e.g. 3 channels),
+# the Python loop over tiles costs more than the better cache use saves.
+# Byte-sized elements copy fast enough that only long axes pay off.
+TILED_THRESHOLD_BYTES = 4 * 2**20
+MIN_TILED_AXIS = 64
+MIN_TILED_AXIS_SINGLE_BYTE = 512
+
 
 class Operations:
     @staticmethod
@@ -54,8 +64,138 @@ class Operations:
     
     @staticmethod
     def expand_axis(tensor: np.ndarray, axis: int, size: int) -> np.ndarray:
-        """Expand a size-1 dimension to target size"""
+        """
+        Expand a size-1 dimension to target size.
+
+        The result is a read-only broadcast view with stride 0 along the
+        expanded axis; no data is copied.
+
+        Example:
+            tensor.shape = (2, 1, 3)
+            expand_axis(tensor, axis=1, size=4)
+            -> result.shape = (2, 4, 3), result.strides[1] == 0
+        """
         if tensor.shape[axis] != 1:
             raise ValueError(f"Can only expand axes of size 1, got {tensor.shape[axis]}")
-        return np.repeat(tensor, size, axis=axis)
-    
+        shape = list(tensor.shape)
+        shape[axis] = size
+        return np.broadcast_to(tensor, shape)
+
+    @staticmethod
+    def materialize(tensor: np.ndarray) -> np.ndarray:
+        """Return a writable C-contiguous array, copying only if tensor is not one already"""
+        if tensor.flags.writeable and tensor.flags.c_contiguous:
+            return tensor
+        return np.array(tensor, order='C', copy=True)
+
+    @staticmethod
+    def tile_size(itemsize: int) -> int:
+        """Edge of a square tile, so a source and a destination tile share L2 cache"""
+        return 128 if itemsize <= 4 else 64
+
+    @staticmethod
+    def fastest_axis(tensor: np.ndarray) -> int:
+        """Axis with the smallest non-zero stride, or -1 if there is none"""
+        candidates = [axis for axis in range(tensor.ndim)
+                      if tensor.shape[axis] > 1 and tensor.strides[axis] != 0]
+        if not candidates:
+            return -1
+        return min(candidates, key=lambda axis: abs(tensor.strides[axis]))
+
+    @staticmethod
+    def should_tile(dst: np.ndarray, src: np.ndarray) -> bool:
+        """
+        Whether copying src into dst should use tiled_copyto: the copy is large
+        and moves src's contiguous axis away from dst's contiguous last axis.
+        """
+        if src.ndim < 2 or src.size * src.itemsize < TILED_THRESHOLD_BYTES:
+            return False
+        if abs(dst.strides[-1]) != dst.itemsize:
+            return False
+        src_axis = Operations.fastest_axis(src)
+        if src_axis < 0 or src_axis == src.ndim - 1:
+            return False
+        min_axis = MIN_TILED_AXIS_SINGLE_BYTE if src.itemsize == 1 else MIN_TILED_AXIS
+        return src.shape[src_axis] >= min_axis and src.shape[-1] >= min_axis
+
+    @staticmethod
+    def tiled_copyto(dst: np.ndarray, src: np.ndarray, tile: int = 0):
+        """
+        Copy src into dst in square tiles spanning src's contiguous axis and dst's
+        last axis, so both reads and writes stay within cache for each tile.
+
+        Example:
+            src = x.T                  # x.shape = (4096, 4096)
+            tiled_copyto(dst, src)     # same result as np.copyto(dst, src)
+        """
+        src_axis = Operations.fastest_axis(src)
+        last = dst.ndim - 1
+        if dst.ndim < 2 or src_axis < 0 or src_axis == last:
+            np.copyto(dst, src)
+            return
+        tile = tile or Operations.tile_size(dst.itemsize)
+        index = [slice(None)] * dst.ndim
+        for i in range(0, src.shape[src_axis], tile):
+            index[src_axis] = slice(i, i + tile)
+            for j in range(0, src.shape[last], tile):
+                index[last] = slice(j, j + tile)
+                block = tuple(index)
+                np.copyto(dst[block], src[block])
+
+    @staticmethod
+    def chunk_indices(tensor: np.ndarray, chunk_bytes: int) -> Iterator[Tuple[slice, ...]]:
+        """
+        Split tensor into blocks of at most chunk_bytes, walking its axes in
+        memory order so consecutive blocks read consecutive memory.
+
+        Every index keeps all axes (integers become length-1 slices), so the same
+        index can be applied to any other array of the same shape.
+
+        Example:
+            tensor.shape = (4, 6), C-contiguous float64, chunk_bytes = 96
+            -> (slice(0, 2), slice(None)), (slice(2, 4), slice(None))
+        """
+        if chunk_bytes <= 0:
+            raise ValueError(f"chunk_bytes must be positive, got {chunk_bytes}")
+        shape = tensor.shape
+        # Outermost (largest stride) first; broadcast axes cost nothing to read
+        order = sorted(range(tensor.ndim), key=lambda axis: -abs(tensor.strides[axis]))
+
+        inner_bytes = tensor.size * tensor.itemsize
+        if inner_bytes <= chunk_bytes or tensor.size == 0 or tensor.ndim == 0:
+            yield tuple(slice(None) for _ in shape)
+            return
+        # Cut the outermost axis whose inner block fits; single elements always "fit"
+        for split, axis in enumerate(order):
+            inner_bytes //= shape[axis]
+            if inner_bytes <= chunk_bytes:
+                break
+
+        block_axis = order[split]
+        step = max(1, chunk_bytes // max(inner_bytes, 1))
+        outer_axes = order[:split]
+        index = [slice(None)] * tensor.ndim
+        for outer in np.ndindex(*[shape[axis] for axis in outer_axes]):
+            for axis, position in zip(outer_axes, outer):
+                index[axis] = slice(position, position + 1)
+            for start in range(0, shape[block_axis], step):
+                index[block_axis] = slice(start, start + step)
+                yield tuple(index)
+
+    @staticmethod
+    def release_pages(tensor: np.ndarray):
+        """
+        Drop the resident pages behind a np.memmap block once it has been processed.
+
+        Pages of shared mappings stay in the file (flush writable ones first), so
+        this only bounds resident memory. Copy-on-write mappings ('c') are left
+        alone since dropping their pages would discard changes.
+        """
+        mapping = getattr(tensor, '_mmap', None)
+        advice = getattr(mmap, 'MADV_DONTNEED', None)
+        if mapping is None or advice is None or getattr(tensor, 'mode', 'c') == 'c' or tensor.size == 0:
+            return
+        mapping_start = np.frombuffer(mapping, dtype=np.uint8).__array_interface__['data'][0]
+        low, high = np.lib.array_utils.byte_bounds(tensor)
+        start = (low - mapping_start) // mmap.PAGESIZE * mmap.PAGESIZE
+        mapping.madvise(advice, start, high - mapping_start - start)
@@ -0,0 +1,151 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+from .cache import plan_cache
+from .parser import Parser
+from .shape_analzer import ShapeAnalyzer
+from .utils import prod
+
+
+def parse_pack_pattern(pattern: str) -> Tuple[List[str], int, int]:
+    """
+    Parse a pack pattern such as 'b * c': plain axis names and exactly one '*'.
+
+    The '*' is parsed as '...', so ShapeAnalyzer's ellipsis handling finds
+    the dimensions it covers. Returns the axes (with '...' for '*') and the
+    number of axes before and after it.
+
+    Example:
+        parse_pack_pattern('b * c')  -> (['b', '...', 'c'], 1, 1)
+    """
+    if not isinstance(pattern, str):
+        raise ValueError(f"Pattern must be a string, got {type(pattern).__name__}")
+    if pattern.count('*') != 1:
+        raise ValueError(f"Pattern '{pattern}' must contain exactly one '*'")
+    if '...' in pattern or '->' in pattern:
+        raise ValueError(f"Pattern '{pattern}' must only contain axis names and one '*'")
+    parser = Parser(f"{pattern.replace('*', ' ... ')} ->")
+    axes, _ = parser.parse()
+    if parser.grouped_axes:
+        raise ValueError(f"Pattern '{pattern}' cannot contain groups")
+    if len(set(axes)) != len(axes):
+        raise ValueError(f"Axis names must be unique in '{pattern}'")
+    star = axes.index('...')
+    return axes, star, len(axes) - star - 1
+
+
+def _get_pack_pattern(pattern: str) -> Tuple[List[str], int, int]:
+    return plan_cache.get_or_build(('pack', pattern), lambda: parse_pack_pattern(pattern))
+
+
+def pack(tensors: Sequence[np.ndarray], pattern: str) -> Tuple[np.ndarray, List[Tuple[int, ...]]]:
+    """
+    Pack tensors into one array, flattening the axes covered by '*' and
+    concatenating the tensors along that axis.
+
+    The output is allocated once and every tensor is copied straight into its
+    slice, viewed with the tensor's own shape, so there are no intermediate
+    reshaped copies.
+
+    Args:
+        tensors: Arrays that agree on the named axes
+        pattern: Axis names with one '*', e.g. 'b * c'
+
+    Returns:
+        The packed array and the shapes of the '*' part of each tensor, for unpack
+
+    Example:
+        >>> tokens, cls = np.zeros((2, 16, 8)), np.zeros((2, 8))
+        >>> packed, shapes = pack([cls, tokens], 'b * c')
+        >>> packed.shape, shapes
+        ((2, 17, 8), [(), (16,)])
+
+    Raises:
+        ValueError: If the pattern is invalid or the tensors do not agree on the named axes
+    """
+    if not tensors:
+        raise ValueError("Cannot pack an empty list of arrays")
+    axes, before, after = _get_pack_pattern(pattern)
+    sizes = None
+    packed_shapes = []
+    for i, tensor in enumerate(tensors):
+        if not isinstance(tensor, np.ndarray):
+            raise ValueError(f"Expected numpy array at index {i}, got {type(tensor).__name__}")
+        if tensor.ndim < len(axes) - 1:
+            raise ValueError(f"Array {i} of shape {tensor.shape} has fewer dimensions than pattern '{pattern}' needs")
+        axis_sizes = ShapeAnalyzer.get_axis_size_from_shape(tensor.shape, axes, {}, {})
+        named = tensor.shape[:before] + tensor.shape[tensor.ndim - after:]
+        if sizes is None:
+            sizes = named
+        elif named != sizes:
+            raise ValueError(f"Array {i} of shape {tensor.shape} does not match the other arrays on the "
+                             f"axes {[axis for axis in axes if axis != '...']} of '{pattern}'")
+        packed_shapes.append(tuple(axis_sizes['...']))
+
+    lengths = [prod(shape) for shape in packed_shapes]
+    out = np.empty(sizes[:before] + (sum(lengths),) + sizes[before:],
+                   dtype=np.result_type(*tensors))
+    offset = 0
+    for tensor, shape, length in zip(tensors, packed_shapes, lengths):
+        index = (slice(None),) * before + (slice(offset, offset + length),)
+        # Splitting one axis of the slice is always a view
+        np.copyto(out[index].reshape(tensor.shape, copy=False), tensor)
+        offset += length
+    return out, packed_shapes
+
+
+def unpack(tensor: np.ndarray, packed_shapes: Sequence[Sequence[int]], pattern: str) -> List[np.ndarray]:
+    """
+    Split a packed array back into its parts, as views of tensor.
+
+    One entry of packed_shapes may contain a single -1, which is inferred from
+    the length of the packed axis.
+
+    Example:
+        >>> parts = unpack(packed, [(), (16,)], 'b * c')
+        >>> [part.shape for part in parts]
+        [(2, 8), (2, 16, 8)]
+
+    Raises:
+        ValueError: If the pattern is invalid or the shapes do not add up to the packed axis
+    """
+    if not isinstance(tensor, np.ndarray):
+        raise ValueError(f"Expected numpy array, got {type(tensor).__name__}")
+    axes, before, after = _get_pack_pattern(pattern)
+    if tensor.ndim != len(axes):
+        raise ValueError(f"Pattern '{pattern}' expects {len(axes)} dimensions, got {tensor.ndim}")
+    total = tensor.shape[before]
+
+    shapes = []
+    lengths = []
+    unknown = None
+    for i, shape in enumerate(packed_shapes):
+        shape = tuple(shape)
+        if -1 in shape:
+            if unknown is not None or shape.count(-1) > 1:
+                raise ValueError("Only one -1 is allowed in packed_shapes")
+            unknown = i
+            lengths.append(0)
+        else:
+            lengths.append(prod(shape))
+        shapes.append(shape)
+    known = sum(lengths)
+    if unknown is not None:
+        shape = shapes[unknown]
+        rest = prod(size for size in shape if size != -1)
+        if rest == 0 or (total - known) % rest or total < known:
+            raise ValueError(f"Cannot infer -1 in {shape} from packed axis of length {total}")
+        shapes[unknown] = tuple((total - known) // rest if size == -1 else size for size in shape)
+        lengths[unknown] = total - known
+        known = total
+    if known != total:
+        raise ValueError(f"packed_shapes {shapes} have {known} elements in total, "
+                         f"but the packed axis has length {total}")
+
+    named_before, named_after = tensor.shape[:before], tensor.shape[before + 1:]
+    parts = []
+    offset = 0
+    for shape, length in zip(shapes, lengths):
+        index = (slice(None),) * before + (slice(offset, offset + length),)
+        parts.append(tensor[index].reshape(named_before + shape + named_after, copy=False))
+        offset += length
+    return parts
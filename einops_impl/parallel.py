@@ -0,0 +1,112 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from .utils import prod
+
+# Copies smaller than this run serially; thread hand-off costs more than it saves
+PARALLEL_THRESHOLD_BYTES = 8 * 2**20
+# Each thread gets at least this much of the output to write
+MIN_BYTES_PER_THREAD = 2**20
+
+_num_threads = 1
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def set_num_threads(threads: int):
+    """Set the default number of threads used to materialize rearrange results"""
+    _check_threads(threads)
+    global _num_threads
+    _num_threads = threads
+
+
+def get_num_threads() -> int:
+    """Default number of threads used to materialize rearrange results"""
+    return _num_threads
+
+
+def _check_threads(threads):
+    if not isinstance(threads, int) or threads < 1:
+        raise ValueError(f"Number of threads must be a positive integer, got {threads!r}")
+
+
+def resolve_threads(threads: Optional[int]) -> int:
+    """Explicit thread count, or the global default when threads is None"""
+    if threads is None:
+        return _num_threads
+    _check_threads(threads)
+    return threads
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                           thread_name_prefix='einops_impl')
+        return _executor
+
+
+def partition(shape: Tuple[int, ...], parts: int) -> List[Tuple]:
+    """
+    Split the leading axes of shape into roughly equal index blocks.
+
+    Example:
+        partition((2, 10, 5), 4)
+        -> [(0, slice(0, 5)), (0, slice(5, 10)), (1, slice(0, 5)), (1, slice(5, 10))]
+    """
+    for axis, size in enumerate(shape):
+        outer = prod(shape[:axis])
+        if outer * size >= parts:
+            blocks = -(-parts // outer)
+            step = -(-size // blocks)
+            return [index + (slice(start, min(start + step, size)),)
+                    for index in np.ndindex(*shape[:axis])
+                    for start in range(0, size, step)]
+    return [()]
+
+
+def parallel_copyto(dst: np.ndarray, src: np.ndarray, threads: int,
+                    kernel: Callable[[np.ndarray, np.ndarray], None] = np.copyto):
+    """
+    kernel(dst, src) split over a thread pool along the leading axes of dst.
+
+    NumPy releases the GIL while copying, so the blocks are copied concurrently.
+    Small copies fall back to a single kernel call.
+    """
+    nbytes = dst.size * dst.itemsize
+    parts = min(threads, nbytes // MIN_BYTES_PER_THREAD)
+    if parts < 2 or nbytes < PARALLEL_THRESHOLD_BYTES:
+        kernel(dst, src)
+        return
+
+    def copy_block(index):
+        kernel(dst[index], src[index])
+
+    # list() re-raises the first exception from a worker
+    list(_get_executor().map(copy_block, partition(dst.shape, parts)))
+
+
+def use_parallel(shape: Tuple[int, ...], itemsize: int, threads: int) -> bool:
+    """Whether a copy producing an array of this shape is worth spreading over threads"""
+    return threads > 1 and prod(shape) * itemsize >= PARALLEL_THRESHOLD_BYTES
+
+
+def parallel_for_each(function: Callable[[int], None], count: int, threads: int):
+    """
+    Call function(i) for i in range(count), spread over threads in contiguous
+    runs of indices. Runs serially with a single thread or a single item.
+    """
+    parts = min(threads, count)
+    if parts < 2:
+        for i in range(count):
+            function(i)
+        return
+
+    def run(part):
+        for i in range(part * count // parts, (part + 1) * count // parts):
+            function(i)
+
+    list(_get_executor().map(run, range(parts)))
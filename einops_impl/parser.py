@@ -1,6 +1,42 @@
-from typing import List, Dict, Tuple, Set, Optional
+from typing import List, Dict, Tuple, Set, Optional, Union
 import re
 
+# One token per match: ellipsis, axis name or number, parenthesis, or any other
+# non-space character (reported as invalid). Whitespace is skipped.
+_TOKEN = re.compile(r'\.\.\.|[^\W_]\w*|\S')
+
+
+class AxisNode:
+    """A named or numeric axis, or '...'"""
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"AxisNode({self.name!r})"
+
+
+class GroupNode:
+    """
+    A parenthesized group. Its leaves are the leaves[start:end] of the side it
+    belongs to, so nested groups are flattened without copying leaf lists.
+    """
+    __slots__ = ('name', 'children', 'start', 'end')
+
+    def __init__(self, name: str, children: List['Node'], start: int, end: int):
+        self.name = name
+        self.children = children
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"GroupNode({self.name!r}, {self.children!r})"
+
+
+Node = Union[AxisNode, GroupNode]
+
+
 class Parser:
     def __init__(self, pattern: str):
         if pattern is None:
@@ -12,6 +48,13 @@ class Parser:
         self.output_pattern = ''
         self.axes_names: Set[str] = set()
         self.grouped_axes: Dict[str, List[str]] = {}
+        # Compact form filled by parse(): the trees of both sides and the
+        # flattened leaves of every top-level group
+        self.input_tree: List[Node] = []
+        self.output_tree: List[Node] = []
+        self.group_leaves: Dict[str, List[str]] = {}
+        # Windowed groups '{n k}' of the input side: [window count axis, window size axis]
+        self.windows: Dict[str, List[str]] = {}
 
     def _validate_single_ellipsis(self, pattern: str):
         """Validate that pattern contains at most one ellipsis"""
@@ -19,83 +62,127 @@ class Parser:
         if ellipsis_count > 1:
             raise ValueError(f"Multiple ellipsis found in '{pattern}'. Only one '...' is allowed.")
 
-    def parse(self):
+    def parse(self, allow_windows: bool = False):
         if '->' not in self.pattern:
             raise ValueError("Invalid pattern: missing arrow '->'. Pattern must be in format 'input -> output'")
-        
+
         parts = self.pattern.split('->')
         if len(parts) > 2:
             raise ValueError("Invalid pattern: multiple arrows '->' found. Pattern must contain exactly one arrow.")
-            
+
         self.input_pattern, self.output_pattern = parts
 
         self._validate_single_ellipsis(self.input_pattern.strip())
         self._validate_single_ellipsis(self.output_pattern.strip())
 
-        input_axes = self._parse_expression(self.input_pattern.strip())
-        output_axes = self._parse_expression(self.output_pattern.strip())
-
-        return input_axes, output_axes
-    
-    def _find_matching_parenthesis(self, expression: str, start: int) -> int:
-        """Find the matching closing parenthesis from start position"""
-        count = 1
-        i = start + 1
-        while i < len(expression) and count > 0:
-            if expression[i] == '(':
-                count += 1
-            elif expression[i] == ')':
-                count -= 1
-            i += 1
-            
-        if count != 0:
-            context = expression[max(0, start-10):min(len(expression), start+11)]
-            raise ValueError(f"Unmatched parentheses in expression near: '{context}'")
-            
-        return i
-    
-    def _parse_expression(self, expression: str, start: int = 0, end: Optional[int] = None) -> List[str]:        
-        result = []
-        i = start
-
-        if end is None:
-            end = len(expression)
-
-        while i < end:
-            char = expression[i]
-
-            if char == '.' and expression[i:i+3] == '...':
-                result.append('...')
-                i += 3
-                continue
-            elif char == '(':
-                j = self._find_matching_parenthesis(expression, i)
-                group_content = self._parse_expression(expression, i+1, j-1)
-                
-                if not group_content:
-                    group_expr = expression[i:j]
-                    raise ValueError(f"Empty group found: '{group_expr}'")
+        self.input_tree = self._parse_tree(self.input_pattern.strip(), allow_windows)
+        self.output_tree = self._parse_tree(self.output_pattern.strip())
+
+        return [node.name for node in self.input_tree], [node.name for node in self.output_tree]
+
+    def with_output(self, output_pattern: str) -> 'Parser':
+        """
+        A parser for '<this input side> -> output_pattern' that reuses the
+        already parsed input side, so patterns sharing a left-hand side are
+        only tokenized once on that side. self should be parsed from a pattern
+        with an empty output side.
+
+        Example:
+            base = Parser('b (h w) c ->'); base.parse()
+            base.with_output('b c h w').output_tree
+            -> [AxisNode('b'), AxisNode('c'), AxisNode('h'), AxisNode('w')]
+        """
+        if '->' in output_pattern:
+            raise ValueError("Invalid pattern: multiple arrows '->' found. Pattern must contain exactly one arrow.")
+        parser = Parser(f"{self.input_pattern}->{output_pattern}")
+        parser.input_pattern, parser.output_pattern = self.input_pattern, output_pattern
+        parser.axes_names = set(self.axes_names)
+        parser.grouped_axes = dict(self.grouped_axes)
+        parser.group_leaves = dict(self.group_leaves)
+        parser.input_tree = self.input_tree
+        parser._validate_single_ellipsis(output_pattern.strip())
+        parser.output_tree = parser._parse_tree(output_pattern.strip())
+        return parser
 
+    @staticmethod
+    def _context(expression: str, token_index: int) -> str:
+        """Text around the token_index-th token, for error messages"""
+        for k, match in enumerate(_TOKEN.finditer(expression)):
+            if k == token_index:
+                i = match.start()
+                return expression[max(0, i-10):min(len(expression), i+11)]
+        return expression
+
+    def _parse_tree(self, expression: str, allow_windows: bool = False) -> List[Node]:
+        """
+        Tokenize and parse one side of a pattern in a single left-to-right pass
+        over the tokens of a compiled regex. Open groups are kept on a stack,
+        so nesting costs nothing extra.
+        Groups are named group_N in the order they are closed.
+
+        With allow_windows, top-level windowed groups '{n k}' (n sliding windows
+        of size k along one input dimension, see einops_impl/unfold.py) are
+        accepted and named window_N.
+        """
+        axes_names = self.axes_names
+        leaves: List[str] = []
+        # (index of the '(' token, nodes of the enclosing level, index of its first leaf)
+        stack: List[Tuple[int, List[Node], int]] = []
+        nodes: List[Node] = []
+        # (index of the '{' token, index of its first node, index of its first leaf)
+        window: Optional[Tuple[int, int, int]] = None
+
+        for k, token in enumerate(_TOKEN.findall(expression)):
+            if token[0].isalnum():
+                axes_names.add(token)
+                nodes.append(AxisNode(token))
+                leaves.append(token)
+            elif token == '(':
+                stack.append((k, nodes, len(leaves)))
+                nodes = []
+            elif token == ')':
+                if not stack:
+                    raise ValueError(f"Unmatched parentheses in expression near: '{self._context(expression, k)}'")
+                start, parent, first_leaf = stack.pop()
+                if not nodes:
+                    raise ValueError(f"Empty group found: '{self._context(expression, start)}'")
                 group_name = f"group_{len(self.grouped_axes)}"
-                self.grouped_axes[group_name] = group_content
-                result.append(group_name)
-                i = j
-            elif char.isalpha() or char.isdigit():
-                j = i
-                while(j < end and (expression[j].isalnum() or expression[j] == '_' or expression[j].isdigit())):
-                    j += 1
-                
-                axis_name = expression[i:j]
-                self.axes_names.add(axis_name)
-                result.append(axis_name)
-                i = j
-            elif char.isspace():
-                i += 1
+                self.grouped_axes[group_name] = [node.name for node in nodes]
+                parent.append(GroupNode(group_name, nodes, first_leaf, len(leaves)))
+                nodes = parent
+            elif token == '...':
+                nodes.append(AxisNode(token))
+                leaves.append(token)
+            elif token == '{' and allow_windows:
+                if stack or window is not None:
+                    raise ValueError(f"Windowed groups cannot be nested: '{self._context(expression, k)}'")
+                window = (k, len(nodes), len(leaves))
+            elif token == '}' and window is not None:
+                start, first_node, first_leaf = window
+                children = nodes[first_node:]
+                if stack or len(children) != 2 or not all(
+                        isinstance(node, AxisNode) and node.name != '...' for node in children):
+                    raise ValueError(f"A windowed group needs exactly two axes, '{{count size}}': "
+                                     f"'{self._context(expression, start)}'")
+                window_name = f"window_{len(self.windows)}"
+                self.windows[window_name] = [node.name for node in children]
+                nodes[first_node:] = [GroupNode(window_name, children, first_leaf, len(leaves))]
+                window = None
+            elif token in '{}':
+                if allow_windows:
+                    raise ValueError(f"Unmatched braces in expression near: '{self._context(expression, k)}'")
+                raise ValueError(f"Windowed groups '{{count size}}' are only supported on the input side of unfold: "
+                                 f"'{self._context(expression, k)}'")
             else:
-                context = expression[max(0, i-10):min(len(expression), i+11)]
-                raise ValueError(f"Invalid character '{char}' found near: '{context}'")
-            
-        return result
-    
+                raise ValueError(f"Invalid character '{token}' found near: '{self._context(expression, k)}'")
+
+        if stack:
+            raise ValueError(f"Unmatched parentheses in expression near: '{self._context(expression, stack[-1][0])}'")
+        if window is not None:
+            raise ValueError(f"Unmatched braces in expression near: '{self._context(expression, window[0])}'")
+
+        for node in nodes:
+            if isinstance(node, GroupNode) and node.name in self.grouped_axes:
+                self.group_leaves[node.name] = leaves[node.start:node.end]
+        return nodes
 
-                
\ No newline at end of file
@@ -0,0 +1,901 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .parser import Parser
+from .shape_analzer import ShapeAnalyzer
+from .operations import Operations, TILED_THRESHOLD_BYTES
+from .cache import plan_cache, symbolic_cache
+from . import instrumentation
+from .inplace import permute_inplace
+from .parallel import parallel_copyto, parallel_for_each, resolve_threads, use_parallel
+from .utils import c_strides, is_contiguous, prod, reshape_strides
+
+# Block size of a shared pass over one input (copy_into_many): small enough
+# for the block to stay in L2 while it is copied into every output
+SHARED_PASS_CHUNK_BYTES = 256 * 2**10
+
+# Result layouts for apply(order=...):
+#   C    C-contiguous
+#   F    Fortran-contiguous
+#   K    a view when possible (any strides), copies follow the input's memory order
+#   any  C- or F-contiguous, whichever is a view or the cheaper copy
+ORDERS = ('C', 'F', 'K', 'any')
+
+
+def expand_group(group_name, grouped_axes):
+    if group_name not in grouped_axes:
+        raise ValueError(f"Group '{group_name}' not found in the pattern. Available groups: {list(grouped_axes.keys())}")
+    expansion = []
+    for item in grouped_axes[group_name]:
+        if item in grouped_axes:
+            expansion.extend(expand_group(item, grouped_axes))
+        else:
+            expansion.append(item)
+    return expansion
+
+
+def coalesce_axes(init_shape: Tuple[int, ...], expansions: Tuple[Tuple[int, int], ...],
+                  perm: Tuple[int, ...]) -> Tuple[Tuple[int, ...], Tuple[Tuple[int, int], ...], Tuple[int, ...]]:
+    """
+    Optimizer pass: merge axes that stay adjacent and in order through the
+    permutation and drop size-1 axes, so the transpose runs at the lowest rank.
+
+    Example:
+        'b (h p1) (w p2) c -> b h w (p1 p2 c)' splits into 6 axes, but
+        coalesce_axes((8, 4, 4, 4, 4, 3), (), (0, 1, 3, 2, 4, 5))
+        -> ((32, 4, 4, 12), (), (0, 2, 1, 3))
+    """
+    expanded = dict(expansions)
+    sizes = [expanded.get(axis, size) for axis, size in enumerate(init_shape)]
+    kept = [axis for axis in range(len(sizes)) if sizes[axis] != 1]
+    rank = {axis: k for k, axis in enumerate(kept)}
+
+    # Runs of input axes that move together, in output order
+    runs: List[List[int]] = []
+    for axis in perm:
+        if sizes[axis] == 1:
+            continue
+        if (runs and rank[axis] == rank[runs[-1][-1]] + 1
+                and (axis in expanded) == (runs[-1][-1] in expanded)):
+            runs[-1].append(axis)
+        else:
+            runs.append([axis])
+
+    runs_in_input_order = sorted(runs, key=lambda run: rank[run[0]])
+    shape = []
+    new_expansions = []
+    for k, run in enumerate(runs_in_input_order):
+        size = 1
+        for axis in run:
+            size *= init_shape[axis]
+        shape.append(size)
+        if run[0] in expanded:
+            expanded_size = 1
+            for axis in run:
+                expanded_size *= expanded[axis]
+            new_expansions.append((k, expanded_size))
+    new_perm = tuple(runs_in_input_order.index(run) for run in runs)
+    return tuple(shape), tuple(new_expansions), new_perm
+
+
+class RearrangePlan:
+    """
+    Compiled form of a rearrange for one pattern, input shape and set of axis lengths.
+
+    Applying a plan is a fixed sequence of array operations:
+        reshape(init_shape) -> expand axes -> transpose(perm) -> reshape(final_shape)
+
+    For C-contiguous inputs the coalesced_* variant of the first three steps is
+    used instead (see coalesce_axes); identity transposes are skipped, and a plan
+    that only regroups axes is a single reshape.
+
+    Example:
+        plan = build_rearrange_plan('(h w) c -> c h w', (30, 3), {'h': 5})
+        plan.init_shape       -> (5, 6, 3)
+        plan.perm             -> (2, 0, 1)
+        plan.coalesced_shape  -> (30, 3)
+        plan.coalesced_perm   -> (1, 0)
+        plan.final_shape      -> (3, 5, 6)
+    """
+    def __init__(self, input_shape: Tuple[int, ...], init_shape: Tuple[int, ...],
+                 expansions: Tuple[Tuple[int, int], ...], perm: Tuple[int, ...],
+                 final_shape: Tuple[int, ...], input_spans: Optional[Tuple[int, ...]] = None,
+                 output_spans: Optional[Tuple[int, ...]] = None, pattern: Optional[str] = None):
+        self.input_shape = input_shape
+        self.init_shape = init_shape
+        self.expansions = expansions
+        self.perm = perm
+        self.final_shape = final_shape
+        # Number of init_shape axes each input axis splits into, and number of
+        # transposed axes each output axis is merged from
+        self.input_spans = input_spans
+        self.output_spans = output_spans
+        # Pattern the plan was built from, under which instrumentation counts its results
+        self.pattern = pattern
+        self.coalesced_shape, self.coalesced_expansions, self.coalesced_perm = coalesce_axes(
+            init_shape, expansions, perm
+        )
+        self.reshape_only = (not self.coalesced_expansions
+                             and self.coalesced_perm == tuple(range(len(self.coalesced_perm))))
+        # Such transposes read and write memory in different orders and benefit from tiling
+        self.moves_innermost = bool(self.coalesced_perm) and self.coalesced_perm[-1] != len(self.coalesced_perm) - 1
+        # Decided once here rather than on every cached call
+        self.size = prod(final_shape)
+        self.is_identity = perm == tuple(range(len(perm)))
+        self.coalesced_is_identity = self.coalesced_perm == tuple(range(len(self.coalesced_perm)))
+
+    def transposed(self, tensor: np.ndarray, coalesce: bool = True) -> np.ndarray:
+        """tensor with its axes split, expanded and permuted: everything but the final reshape"""
+        collector = instrumentation.collector
+        if collector is not None:
+            start = instrumentation.clock()
+        if coalesce and tensor.flags.c_contiguous:
+            shape, expansions, perm = self.coalesced_shape, self.coalesced_expansions, self.coalesced_perm
+            identity = self.coalesced_is_identity
+        else:
+            # Merging axes of a strided input could force a copy, keep the axes split
+            shape, expansions, perm = self.init_shape, self.expansions, self.perm
+            identity = self.is_identity
+        current = tensor.reshape(shape)
+        for axis, size in expansions:
+            # Broadcast view; data is only duplicated if the final reshape forces it
+            current = Operations.expand_axis(current, axis, size)
+        if not identity:
+            current = current.transpose(perm)
+        if collector is not None:
+            collector.add_stage('views', instrumentation.clock() - start)
+        return current
+
+    def apply(self, tensor: np.ndarray, materialize: bool = False,
+              copy: Optional[bool] = None, out: Optional[np.ndarray] = None,
+              threads: Optional[int] = None, chunk_bytes: Optional[int] = None,
+              inplace: bool = False, order: Optional[str] = None) -> np.ndarray:
+        """
+        Run the plan on tensor.
+
+        copy=None returns a view when possible and copies otherwise, copy=False
+        raises instead of copying and copy=True always returns a new C-contiguous array.
+        With out, the result is written into that array instead, chunk_bytes at
+        a time if given. Large copies are spread over threads (default:
+        parallel.get_num_threads()). inplace=True permutes the data inside
+        tensor's own buffer, see apply_inplace. order (one of ORDERS) asks for
+        a result layout, see apply_ordered.
+
+        With instrumentation enabled, the result is counted under self.pattern
+        as a view or a copy; in-place results count as copies, since all of
+        their data is moved.
+        """
+        self.check_options(materialize, copy, out, chunk_bytes, inplace, order)
+        collector = instrumentation.collector
+        if inplace:
+            result = self.apply_inplace(tensor)
+        elif out is not None:
+            result = self.copy_into(tensor, out, threads=resolve_threads(threads), chunk_bytes=chunk_bytes)
+        elif order is not None:
+            result = self.apply_ordered(tensor, order, materialize=materialize, copy=copy,
+                                        threads=resolve_threads(threads))
+        else:
+            if copy is False and self.output_strides(tensor.strides, tensor.itemsize) is None:
+                raise ValueError(f"Rearranging an array of shape {self.input_shape} with strides {tensor.strides} "
+                                 f"into {self.final_shape} requires a copy, but copy=False was given")
+            if self.reshape_only and tensor.flags.c_contiguous:
+                current = tensor
+            else:
+                current = self.transposed(tensor)
+            if collector is None:
+                return self._reshape_result(current, tensor, materialize, copy, resolve_threads(threads))
+            start = instrumentation.clock()
+            result = self._reshape_result(current, tensor, materialize, copy, resolve_threads(threads))
+            collector.add_stage('copy', instrumentation.clock() - start)
+        if collector is not None:
+            collector.add_result(self.pattern, tensor, result, copied=True if inplace else None)
+        return result
+
+    @staticmethod
+    def check_options(materialize: bool = False, copy: Optional[bool] = None, out: Optional[np.ndarray] = None,
+                      chunk_bytes: Optional[int] = None, inplace: bool = False, order: Optional[str] = None):
+        """
+        Raise for combinations of apply options that contradict each other.
+        Shared by every input kind of rearrange, so they are rejected alike.
+        """
+        if order is not None:
+            if order not in ORDERS:
+                raise ValueError(f"Unknown order {order!r}. Available orders: {list(ORDERS)}")
+            if out is not None or (order != 'C' and (inplace or materialize)):
+                raise ValueError(f"order={order!r} cannot be combined with out=, and only order='C' "
+                                 f"with inplace=True or materialize=True")
+        if inplace:
+            if out is not None or copy or chunk_bytes is not None:
+                raise ValueError("inplace=True cannot be combined with out=, copy=True or chunk_bytes")
+        elif out is not None:
+            if copy is False:
+                raise ValueError("Writing into out= always copies, but copy=False was given")
+        elif chunk_bytes is not None:
+            raise ValueError("chunk_bytes needs an output array to write the chunks into, pass out=")
+
+    def _reshape_result(self, current: np.ndarray, tensor: np.ndarray, materialize: bool,
+                        copy: Optional[bool], threads: int) -> np.ndarray:
+        """Final reshape of the transposed view, copying with our own engine when that pays off"""
+        if copy is not False and (use_parallel(self.final_shape, tensor.itemsize, threads)
+                                  or self._may_tile(tensor.itemsize)):
+            # Copies are done by our own engine rather than inside reshape
+            try:
+                result = current.reshape(self.final_shape, copy=False)
+            except ValueError:
+                result = None
+            if result is not None and not copy and not (
+                    materialize and not (result.flags.writeable and result.flags.c_contiguous)):
+                return result
+            return self._copy_transposed(current, tensor, np.empty(self.final_shape, dtype=tensor.dtype), threads)
+
+        result = current.reshape(self.final_shape, copy=copy)
+        if materialize:
+            if copy is False and not (result.flags.writeable and result.flags.c_contiguous):
+                raise ValueError("materialize=True needs a copy of this result, but copy=False was given")
+            result = Operations.materialize(result)
+        return result
+
+    def apply_ordered(self, tensor: np.ndarray, order: str, materialize: bool = False,
+                      copy: Optional[bool] = None, threads: Optional[int] = None) -> np.ndarray:
+        """
+        Run the plan and return a result with the requested layout (see ORDERS).
+
+        The view is returned if its layout qualifies; otherwise the data is
+        copied into an array laid out as memory_order(order, tensor.strides).
+        With order='any' a transpose that comes out Fortran-contiguous stays a
+        view, and a copy is written in whichever of C and F order keeps the
+        input's innermost axis innermost.
+        """
+        result = None if copy else self.view(tensor)
+        if result is not None and self._accepts(result.shape, result.strides, result.itemsize, order) and (
+                not materialize or result.flags.writeable):
+            return result
+        if copy is False:
+            raise ValueError(f"Rearranging an array of shape {self.input_shape} with strides {tensor.strides} "
+                             f"into a result with order={order!r} requires a copy, but copy=False was given")
+        out = self.empty_result(tensor.dtype, order, tensor.strides)
+        return self.copy_into(tensor, out, threads=threads)
+
+    @staticmethod
+    def _accepts(shape: Tuple[int, ...], strides: Tuple[int, ...], itemsize: int, order: Optional[str]) -> bool:
+        """Whether a view with these strides has the layout order asks for"""
+        if order is None or order == 'K':
+            return True
+        if order == 'any':
+            return is_contiguous(shape, strides, itemsize, 'C') or is_contiguous(shape, strides, itemsize, 'F')
+        return is_contiguous(shape, strides, itemsize, order)
+
+    def memory_order(self, order: str, input_strides: Optional[Sequence[int]] = None) -> Tuple[int, ...]:
+        """
+        Output axes from outermost to innermost in memory for a copy made with
+        the given order; input_strides defaults to a C-contiguous input.
+
+        'K' sorts the output axes by the input stride of their innermost
+        element, so the copy reads and writes memory in nearly the same order.
+        'any' is F if that order puts the input's innermost axis first, C otherwise.
+
+        Example:
+            plan = build_rearrange_plan('h w c -> c (h w)', (4, 5, 3), {})
+            plan.memory_order('C')  -> (0, 1)
+            plan.memory_order('K')  -> (1, 0)
+            plan.memory_order('any')  -> (1, 0)
+        """
+        count = len(self.final_shape)
+        if order == 'F':
+            return tuple(reversed(range(count)))
+        if order == 'C' or self.output_spans is None:
+            return tuple(range(count))
+        if input_strides is None:
+            input_strides = c_strides(self.input_shape)
+        strides = reshape_strides(self.input_shape, input_strides, self.init_shape)
+        if strides is None:
+            return tuple(range(count))
+        expanded = {axis for axis, _ in self.expansions}
+        keys = []
+        position = 0
+        for span in self.output_spans:
+            leaves = [axis for axis in self.perm[position:position + span]
+                      if axis not in expanded and self.init_shape[axis] != 1]
+            # Broadcast and size-1 output axes go innermost, where they cost nothing
+            keys.append(abs(strides[leaves[-1]]) if leaves else 0)
+            position += span
+        by_stride = tuple(sorted(range(count), key=lambda axis: -keys[axis]))
+        if order == 'K':
+            return by_stride
+        if count > 1 and by_stride[-1] == 0:
+            return tuple(reversed(range(count)))
+        return tuple(range(count))
+
+    def empty_result(self, dtype, order: Optional[str] = None,
+                     input_strides: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Uninitialized array of the final shape, laid out as memory_order(order, input_strides)"""
+        memory_order = self.memory_order(order or 'C', input_strides)
+        if memory_order == tuple(range(len(memory_order))):
+            return np.empty(self.final_shape, dtype=dtype)
+        buffer = np.empty(tuple(self.final_shape[axis] for axis in memory_order), dtype=dtype)
+        return buffer.transpose(np.argsort(memory_order))
+
+    def view(self, tensor: np.ndarray) -> Optional[np.ndarray]:
+        """The result as a view of tensor, or None if the plan has to copy"""
+        if tensor.flags.c_contiguous:
+            # Splitting a contiguous array is always a view, only the last reshape can fail
+            try:
+                if self.reshape_only:
+                    return tensor.reshape(self.final_shape, copy=False)
+                return self.transposed(tensor).reshape(self.final_shape, copy=False)
+            except ValueError:
+                return None
+        if self.output_strides(tensor.strides, tensor.itemsize) is None:
+            return None
+        return self.transposed(tensor, coalesce=False).reshape(self.final_shape, copy=False)
+
+    def apply_inplace(self, tensor: np.ndarray) -> np.ndarray:
+        """
+        Run the plan by permuting the data inside tensor's buffer and return the
+        result as a C-contiguous view of that buffer. The contents of tensor are
+        overwritten. Extra memory is at most inplace.INPLACE_BATCH_BYTES (16 MiB)
+        and a quarter of the array, or one row or column of a transposed pair
+        of axis groups if that is larger. It takes a few passes over the data,
+        so it is several times slower than a copy.
+
+        Needs a writable C-contiguous tensor, and a plan that keeps the number
+        of elements (no expanded axes).
+        """
+        if self.coalesced_expansions:
+            raise ValueError("inplace=True needs a rearrange that keeps the number of elements, "
+                             "but this pattern expands axes")
+        if not (tensor.flags.c_contiguous and tensor.flags.writeable):
+            raise ValueError("inplace=True needs a writable C-contiguous array")
+        if self.reshape_only:
+            return tensor.reshape(self.final_shape)
+        permuted = permute_inplace(tensor, self.coalesced_shape, self.coalesced_perm)
+        return permuted.reshape(self.final_shape)
+
+    def copy_into(self, tensor: np.ndarray, out: np.ndarray, threads: Optional[int] = None,
+                  chunk_bytes: Optional[int] = None) -> np.ndarray:
+        """
+        Write the rearranged tensor into a preallocated array of the final shape.
+
+        out is viewed with the transposed, not yet merged shape, so the data
+        moves in a single np.copyto without an intermediate array.
+
+        With chunk_bytes the copy is done in blocks of at most that size, taken
+        in the input's memory order so reads stay sequential. This keeps memory
+        bounded for np.memmap inputs and outputs larger than RAM; a memmap out
+        is flushed after every block.
+        """
+        if not isinstance(out, np.ndarray):
+            raise ValueError(f"Expected numpy array for out, got {type(out).__name__}")
+        if out.shape != self.final_shape:
+            raise ValueError(f"Output array has shape {out.shape}, expected {self.final_shape}")
+        source = self.transposed(tensor)
+        collector = instrumentation.collector
+        if collector is None:
+            return self._copy_transposed(source, tensor, out, resolve_threads(threads), chunk_bytes)
+        start = instrumentation.clock()
+        self._copy_transposed(source, tensor, out, resolve_threads(threads), chunk_bytes)
+        collector.add_stage('copy', instrumentation.clock() - start)
+        return out
+
+    def stack_into(self, elements: Sequence[np.ndarray], out: np.ndarray, threads: Optional[int] = None) -> np.ndarray:
+        """
+        Write the result for the stack of elements along a new leading axis into
+        out, without building the stack: each element is split, permuted and
+        copied straight into its place in out. Large outputs are spread over
+        threads one element per task.
+        """
+        if not isinstance(out, np.ndarray):
+            raise ValueError(f"Expected numpy array for out, got {type(out).__name__}")
+        if out.shape != self.final_shape:
+            raise ValueError(f"Output array has shape {out.shape}, expected {self.final_shape}")
+        threads = resolve_threads(threads)
+        leading = self.input_spans[0]
+        expanded = dict(self.expansions)
+        element_shape = (1,) * leading + self.init_shape[leading:]
+        transposed_shape = tuple(expanded.get(axis, self.init_shape[axis]) for axis in self.perm)
+        # The fully split shape only splits output axes, a view for any layout of out
+        target = out.reshape(transposed_shape, copy=False)
+        positions = [self.perm.index(axis) for axis in range(leading)]
+
+        def copy_element(i: int):
+            source = elements[i].reshape(element_shape)
+            for axis, size in expanded.items():
+                if axis >= leading:
+                    source = Operations.expand_axis(source, axis, size)
+            source = source.transpose(self.perm)
+            index = [slice(None)] * len(transposed_shape)
+            coordinates = np.unravel_index(i, self.init_shape[:leading])
+            for axis, coordinate in enumerate(coordinates):
+                # Expanded leading axes are filled by broadcasting the element
+                if axis not in expanded:
+                    index[positions[axis]] = slice(int(coordinate), int(coordinate) + 1)
+            block = target[tuple(index)]
+            kernel = Operations.tiled_copyto if Operations.should_tile(block, source) else np.copyto
+            kernel(block, source)
+
+        parallel_for_each(copy_element, len(elements),
+                          threads if use_parallel(self.final_shape, out.itemsize, threads) else 1)
+        collector = instrumentation.collector
+        if collector is not None:
+            collector.add_result(self.pattern, None, out, copied=True)
+        return out
+
+    def _copy_transposed(self, source: np.ndarray, tensor: np.ndarray, out: np.ndarray, threads: int,
+                         chunk_bytes: Optional[int] = None) -> np.ndarray:
+        try:
+            target = out.reshape(source.shape, copy=False)
+        except ValueError:
+            # Coalesced axes can straddle output groups; the fully split shape
+            # only ever splits output axes, which is a view for any layout of out
+            source = self.transposed(tensor, coalesce=False)
+            target = out.reshape(source.shape, copy=False)
+        if chunk_bytes is None:
+            self._copy_block(target, source, threads)
+            return out
+        flush = out.flush if isinstance(out, np.memmap) else None
+        for index in Operations.chunk_indices(source, chunk_bytes):
+            self._copy_block(target[index], source[index], threads)
+            if flush is not None:
+                flush()
+            Operations.release_pages(source[index])
+            Operations.release_pages(target[index])
+        return out
+
+    @staticmethod
+    def _copy_block(target: np.ndarray, source: np.ndarray, threads: int):
+        kernel = Operations.tiled_copyto if Operations.should_tile(target, source) else np.copyto
+        if threads > 1:
+            parallel_copyto(target, source, threads, kernel)
+        else:
+            kernel(target, source)
+
+    def _may_tile(self, itemsize: int) -> bool:
+        """Cheap pre-check for the tiled transpose: the innermost axis moves and the copy is large"""
+        return self.moves_innermost and self.size * itemsize >= TILED_THRESHOLD_BYTES
+
+    def output_strides(self, input_strides: Optional[Sequence[int]] = None,
+                       itemsize: int = 1) -> Optional[Tuple[int, ...]]:
+        """
+        Strides of the result if it is a view of the input, or None if applying
+        the plan copies. input_strides defaults to a C-contiguous input.
+        """
+        if input_strides is None:
+            input_strides = c_strides(self.input_shape, itemsize)
+        strides = reshape_strides(self.input_shape, input_strides, self.init_shape, itemsize)
+        if strides is None:
+            return None
+        if self.expansions:
+            strides = list(strides)
+            for axis, _ in self.expansions:
+                strides[axis] = 0
+        expanded_shape = list(self.init_shape)
+        for axis, size in self.expansions:
+            expanded_shape[axis] = size
+        transposed_shape = tuple(expanded_shape[axis] for axis in self.perm)
+        transposed_strides = tuple(strides[axis] for axis in self.perm)
+        return reshape_strides(transposed_shape, transposed_strides, self.final_shape, itemsize)
+
+    def result_strides(self, input_strides: Optional[Sequence[int]] = None, itemsize: int = 1,
+                       order: Optional[str] = None) -> Tuple[int, ...]:
+        """
+        Strides of the array that apply(tensor, order=order) returns, for an
+        input with the given strides (default C-contiguous): those of the view
+        when the result is a view, otherwise those of the copy. This lets a
+        caller compare the layouts of the orders before touching any data.
+
+        Example:
+            plan = build_rearrange_plan('h w -> w h', (3, 4), {})
+            plan.result_strides(itemsize=8)               -> (8, 32)  (a view)
+            plan.result_strides(itemsize=8, order='C')    -> (24, 8)  (a copy)
+            plan.result_strides(itemsize=8, order='any')  -> (8, 32)  (F-contiguous view)
+        """
+        if order is not None and order not in ORDERS:
+            raise ValueError(f"Unknown order {order!r}. Available orders: {list(ORDERS)}")
+        strides = self.output_strides(input_strides, itemsize)
+        if strides is not None and self._accepts(self.final_shape, strides, itemsize, order):
+            return strides
+        memory_order = self.memory_order(order or 'C', input_strides)
+        copy_strides = c_strides(tuple(self.final_shape[axis] for axis in memory_order), itemsize)
+        result = [0] * len(memory_order)
+        for position, axis in enumerate(memory_order):
+            result[axis] = copy_strides[position]
+        return tuple(result)
+
+    def is_view(self, input_strides: Optional[Sequence[int]] = None, order: Optional[str] = None,
+                itemsize: int = 1) -> bool:
+        """
+        Whether applying the plan returns a view instead of copying the data.
+        Only shapes and strides are inspected, so this is safe to call ahead of time.
+        With an order other than 'K', itemsize must match the units of input_strides.
+        """
+        strides = self.output_strides(input_strides, itemsize)
+        return strides is not None and self._accepts(self.final_shape, strides, itemsize, order)
+
+    def __repr__(self):
+        return (f"RearrangePlan(input_shape={self.input_shape}, init_shape={self.init_shape}, "
+                f"expansions={self.expansions}, perm={self.perm}, final_shape={self.final_shape})")
+
+
+def copy_into_many(tensor: np.ndarray, plans: Sequence[RearrangePlan], outs: Sequence[np.ndarray],
+                   threads: Optional[int] = None, chunk_bytes: int = SHARED_PASS_CHUNK_BYTES):
+    """
+    Write the results of several plans for the same input into preallocated
+    arrays in a single pass over the input.
+
+    The input is split once and walked in blocks of chunk_bytes in its memory
+    order; each block is copied into every output while it is still in cache,
+    instead of streaming the whole input once per output.
+    """
+    threads = resolve_threads(threads)
+    if len(plans) == 1:
+        plans[0].copy_into(tensor, outs[0], threads=threads)
+    else:
+        split = tensor.reshape(plans[0].init_shape)
+        pairs = []
+        for plan, out in zip(plans, outs):
+            source = plan.transposed(split, coalesce=False)
+            # The fully split shape only splits output axes, a view for any layout of out
+            expanded = {axis for axis, _ in plan.expansions}
+            pairs.append((out.reshape(source.shape, copy=False), source, plan.perm, expanded))
+        for index in Operations.chunk_indices(split, chunk_bytes):
+            for target, source, perm, expanded in pairs:
+                block = tuple(slice(None) if axis in expanded else index[axis] for axis in perm)
+                RearrangePlan._copy_block(target[block], source[block], threads)
+    collector = instrumentation.collector
+    if collector is not None:
+        for plan, out in zip(plans, outs):
+            collector.add_result(plan.pattern, tensor, out, copied=True)
+
+
+def parse_rearrange_pattern(pattern: str) -> Tuple[List[str], List[str], Dict[str, List[str]]]:
+    """
+    Parse a pattern into its input axes, output axes and grouped axes.
+    Groups map to their flattened leaves, so expand_group never recurses.
+    """
+    collector = instrumentation.collector
+    if collector is not None:
+        start = instrumentation.clock()
+    parser = Parser(pattern)
+    input_axes, output_axes = parser.parse()
+    if collector is not None:
+        collector.add_stage('parse', instrumentation.clock() - start)
+    return input_axes, output_axes, parser.group_leaves
+
+
+def build_rearrange_plan(pattern: str, shape: Tuple[int, ...], axis_lengths: Dict[str, int]) -> RearrangePlan:
+    """
+    Parse the pattern and resolve every axis size for the given input shape.
+
+    Raises:
+        ValueError: If the pattern is invalid or does not fit the shape
+    """
+    input_axes, output_axes, grouped_axes = parse_rearrange_pattern(pattern)
+    return plan_rearrange(pattern, input_axes, output_axes, grouped_axes, shape, axis_lengths)
+
+
+def split_axes(axes: List[str], grouped_axes: Dict[str, List[str]], ellipsis_ndim: int) -> List[List[str]]:
+    """
+    Elementary axes that each dimension of one side of a pattern consists of.
+    The dimensions of '...' are named '...0', '...1', ...
+
+    Example:
+        split_axes(['b', 'group_0', '...'], {'group_0': ['h', 'w']}, 2)
+        -> [['b'], ['h', 'w'], ['...0'], ['...1']]
+    """
+    dims: List[List[str]] = []
+    for axis in axes:
+        if axis == '...':
+            dims.extend([f'...{i}'] for i in range(ellipsis_ndim))
+        elif axis in grouped_axes:
+            dims.append(expand_group(axis, grouped_axes))
+        else:
+            dims.append([axis])
+    return dims
+
+
+def match_axes(input_composition: List[str], output_composition: List[str],
+               axis_lengths: Dict[str, int]) -> Tuple[List[Tuple[int, int]], List[int]]:
+    """
+    Match the elementary axes of both sides of a pattern: the '1' input axes
+    expanded into output axes, as (axis, size) pairs, and the permutation
+    taking the input axes to the output order. This is the pattern-level part
+    of planning shared by the concrete and the symbolic planner.
+
+    Example:
+        match_axes(['b', '1', 'c'], ['c', 'k', 'b'], {'k': 4})  -> ([(1, 4)], [2, 1, 0])
+
+    Raises:
+        ValueError: If the sides have different numbers of axes, an expansion
+            has no valid size, or an output axis is not on the input side
+    """
+    if len(input_composition) != len(output_composition):
+        raise ValueError(f"Inconsistent number of dimensions: expected {len(output_composition)}, got {len(input_composition)}")
+
+    expansions = []
+    position: Dict[str, int] = {}
+    for i, (in_axis, out_axis) in enumerate(zip(input_composition, output_composition)):
+        if in_axis == '1':
+            if out_axis not in axis_lengths:
+                raise ValueError(f"Missing size for expansion axis '{out_axis}'. Please provide it in axis_lengths.")
+            out_size = axis_lengths[out_axis]
+            if out_size <= 0:
+                raise ValueError(f"Expansion size for axis '{out_axis}' must be positive, got {out_size}")
+            expansions.append((i, int(out_size)))
+            # The expanded axis takes the name used on the output side, so it is permuted like any other
+            in_axis = out_axis
+        position.setdefault(in_axis, i)
+    try:
+        perm = [position[ax] for ax in output_composition]
+    except KeyError as e:
+        raise ValueError("Invalid axis in output pattern. This might be due to mismatched axes "
+                         "between input and output patterns.") from e
+    return expansions, perm
+
+
+def split_input_axes(input_axes: List[str], grouped_axes: Dict[str, List[str]],
+                     axis_sizes: Dict[str, int], shape: Tuple[int, ...]) -> Tuple[List[str], List[int], List[int]]:
+    """
+    Split the input side of a pattern into its elementary axes.
+
+    Returns the axis names in memory order (ellipsis dims as '...0', '...1', ...),
+    their sizes, and how many of them each input dimension splits into.
+
+    Example:
+        split_input_axes(['b', 'group_0'], {'group_0': ['h', 'w']}, {'h': 2, 'w': 3}, (4, 6))
+        -> (['b', 'h', 'w'], [4, 2, 3], [1, 2])
+    """
+    composition: List[str] = []
+    init_shape: List[int] = []
+    spans: List[int] = []
+    for dim, leaves in enumerate(split_axes(input_axes, grouped_axes, len(axis_sizes.get('...', ())))):
+        composition.extend(leaves)
+        # A dimension that is not split keeps its size
+        init_shape.extend([int(shape[dim])] if len(leaves) == 1 else (int(axis_sizes[ax]) for ax in leaves))
+        spans.append(len(leaves))
+    return composition, init_shape, spans
+
+
+def plan_rearrange(pattern: str, input_axes: List[str], output_axes: List[str],
+                   grouped_axes: Dict[str, List[str]], shape: Tuple[int, ...],
+                   axis_lengths: Dict[str, int]) -> RearrangePlan:
+    """Resolve an already parsed pattern against an input shape"""
+    if '...' not in input_axes and len(shape) != len(input_axes):
+        raise ValueError(f"Pattern '{pattern}' expects {len(input_axes)} dimensions, got {len(shape)}")
+
+    # 1. Analyze shapes
+    collector = instrumentation.collector
+    if collector is not None:
+        start = instrumentation.clock()
+    axis_sizes = ShapeAnalyzer.get_axis_size_from_shape(
+        shape, input_axes, grouped_axes, axis_lengths
+    )
+    if collector is not None:
+        collector.add_stage('analyze', instrumentation.clock() - start)
+
+    # 2. Process input grouping
+    input_composition, init_shape, input_spans = split_input_axes(input_axes, grouped_axes, axis_sizes, shape)
+
+    return plan_output(output_axes, grouped_axes, shape, axis_lengths, axis_sizes,
+                       input_composition, init_shape, input_spans, pattern)
+
+
+def plan_output(output_axes: List[str], grouped_axes: Dict[str, List[str]], shape: Tuple[int, ...],
+                axis_lengths: Dict[str, int], axis_sizes: Dict[str, int], input_composition: List[str],
+                init_shape: List[int], input_spans: List[int], pattern: Optional[str] = None) -> RearrangePlan:
+    """
+    Second half of plan_rearrange: match the output side against an input side
+    that is already analyzed and split, so that result can be shared by
+    several output sides (see build_rearrange_plans).
+    """
+    # 3. Plan output composition
+    output_dims = split_axes(output_axes, grouped_axes, len(axis_sizes.get('...', ())))
+    output_composition = [ax for leaves in output_dims for ax in leaves]
+
+    # 4. Expansions and permutation for transpose
+    expansions, perm = match_axes(input_composition, output_composition, axis_lengths)
+    expanded_shape = list(init_shape)
+    for axis, size in expansions:
+        expanded_shape[axis] = size
+
+    # 5. Process output grouping
+    final_shape = []
+    output_spans: List[int] = []
+    position = 0
+    for leaves in output_dims:
+        final_shape.append(prod(expanded_shape[axis] for axis in perm[position:position + len(leaves)]))
+        output_spans.append(len(leaves))
+        position += len(leaves)
+
+    total_elements_before = prod(expanded_shape)
+    total_elements_after = prod(final_shape)
+    if total_elements_before != total_elements_after:
+        raise ValueError(f"Cannot reshape tensor of size {total_elements_before} into shape {tuple(final_shape)} "
+                         f"(which has size {total_elements_after}). This might be due to incorrect axis sizes.")
+
+    return RearrangePlan(tuple(int(size) for size in shape), tuple(init_shape),
+                         tuple(expansions), tuple(perm), tuple(final_shape),
+                         tuple(input_spans), tuple(output_spans), pattern)
+
+
+def build_rearrange_plans(patterns: Sequence[str], shape: Tuple[int, ...],
+                          axis_lengths: Dict[str, int]) -> List[RearrangePlan]:
+    """
+    Plans for several patterns with the same left-hand side. That side is
+    parsed, analyzed against the shape and split only once.
+
+    Example:
+        build_rearrange_plans(['b h w c -> b c h w', 'b h w c -> (b h w) c'], (2, 4, 4, 3), {})
+        -> [RearrangePlan(... final_shape=(2, 3, 4, 4)), RearrangePlan(... final_shape=(32, 3))]
+
+    Raises:
+        ValueError: If the patterns do not share their left-hand side
+    """
+    if not patterns:
+        raise ValueError("Expected at least one pattern")
+    sides = []
+    for pattern in patterns:
+        if not pattern:
+            raise ValueError("Pattern string cannot be empty")
+        if not isinstance(pattern, str) or '->' not in pattern:
+            raise ValueError(f"Invalid pattern: missing arrow '->' in {pattern!r}. Pattern must be in format 'input -> output'")
+        sides.append(pattern.split('->', 1))
+    input_pattern = sides[0][0]
+    for pattern, (other, _) in zip(patterns, sides):
+        if other.split() != input_pattern.split():
+            raise ValueError(f"Patterns must share their input side: {patterns[0]!r} and {pattern!r} differ")
+
+    base = Parser(f"{input_pattern}->")
+    input_axes, _ = base.parse()
+    if '...' not in input_axes and len(shape) != len(input_axes):
+        raise ValueError(f"Pattern '{patterns[0]}' expects {len(input_axes)} dimensions, got {len(shape)}")
+    axis_sizes = ShapeAnalyzer.get_axis_size_from_shape(shape, input_axes, base.group_leaves, axis_lengths)
+    input_composition, init_shape, input_spans = split_input_axes(input_axes, base.group_leaves, axis_sizes, shape)
+
+    plans = []
+    for pattern, (_, output_pattern) in zip(patterns, sides):
+        parser = base.with_output(output_pattern)
+        output_axes = [node.name for node in parser.output_tree]
+        plans.append(plan_output(output_axes, parser.group_leaves, shape, axis_lengths, axis_sizes,
+                                 input_composition, init_shape, input_spans, pattern))
+    return plans
+
+
+class SymbolicRearrangePlan:
+    """
+    Shape-independent part of a rearrange for one pattern, input rank and set
+    of axis lengths: parsing, group flattening and the permutation are done
+    once. Axis sizes are kept as expressions of the input shape (see
+    ShapeAnalyzer.get_symbolic_axis_sizes), so specialize(shape) only checks
+    the constraints and does a few integer operations to build the RearrangePlan.
+
+    Example:
+        symbolic = build_symbolic_plan('b (h w) c -> b c h w', ['b', 'group_0', 'c'],
+                                       ['b', 'c', 'h', 'w'], {'group_0': ['h', 'w']}, 3, {'h': 4})
+        symbolic.specialize((8, 64, 3)).final_shape   -> (8, 3, 4, 16)
+        symbolic.specialize((2, 32, 3)).final_shape   -> (2, 3, 4, 8)
+    """
+    def __init__(self, ndim: int, init_sizes: Tuple[Tuple[Optional[int], int], ...],
+                 constraints: Tuple[Tuple[int, int, bool], ...], expansions: Tuple[Tuple[int, int], ...],
+                 perm: Tuple[int, ...], output_groups: Tuple[Tuple[int, ...], ...],
+                 input_spans: Tuple[int, ...], output_spans: Tuple[int, ...], pattern: Optional[str] = None):
+        self.ndim = ndim
+        self.init_sizes = init_sizes
+        self.constraints = constraints
+        self.expansions = expansions
+        self.perm = perm
+        # Axes of the expanded init shape each output axis is merged from
+        self.output_groups = output_groups
+        self.input_spans = input_spans
+        self.output_spans = output_spans
+        self.pattern = pattern
+
+    def specialize(self, shape: Tuple[int, ...]) -> RearrangePlan:
+        """
+        Concrete plan for an input of the given shape.
+
+        Raises:
+            ValueError: If the shape does not fit the pattern
+        """
+        if len(shape) != self.ndim:
+            raise ValueError(f"Expected an input with {self.ndim} dimensions, got shape {shape}")
+        for dim, value, exact in self.constraints:
+            if exact and shape[dim] != value:
+                raise ValueError(f"Dimension {dim} of input shape {shape} has size {shape[dim]}, expected {value}")
+            if not exact and shape[dim] % value:
+                raise ValueError(f"Cannot evenly divide group size {shape[dim]} by known product {value}")
+        init_shape = tuple(value if dim is None else shape[dim] // value for dim, value in self.init_sizes)
+        expanded_shape = list(init_shape)
+        for axis, size in self.expansions:
+            expanded_shape[axis] = size
+        final_shape = tuple(prod(expanded_shape[axis] for axis in group) for group in self.output_groups)
+        return RearrangePlan(tuple(shape), init_shape, self.expansions, self.perm, final_shape,
+                             self.input_spans, self.output_spans, self.pattern)
+
+    def __repr__(self):
+        return (f"SymbolicRearrangePlan(ndim={self.ndim}, init_sizes={self.init_sizes}, "
+                f"perm={self.perm}, output_groups={self.output_groups})")
+
+
+def build_symbolic_plan(pattern: str, input_axes: List[str], output_axes: List[str],
+                        grouped_axes: Dict[str, List[str]], ndim: int,
+                        axis_lengths: Dict[str, int]) -> Optional[SymbolicRearrangePlan]:
+    """
+    Resolve an already parsed pattern for every input shape of rank ndim.
+    Returns None for patterns only plan_rearrange handles, such as ones
+    repeating an axis.
+
+    Raises:
+        ValueError: If the pattern is invalid for inputs of rank ndim
+    """
+    if '...' not in input_axes and ndim != len(input_axes):
+        raise ValueError(f"Pattern '{pattern}' expects {len(input_axes)} dimensions, got {ndim}")
+
+    collector = instrumentation.collector
+    if collector is not None:
+        start = instrumentation.clock()
+    analysis = ShapeAnalyzer.get_symbolic_axis_sizes(ndim, input_axes, grouped_axes, axis_lengths)
+    if collector is not None:
+        collector.add_stage('analyze', instrumentation.clock() - start)
+    if analysis is None:
+        return None
+    axis_sizes, constraints = analysis
+
+    input_composition: List[str] = []
+    init_sizes = []
+    input_spans: List[int] = []
+    for dim, leaves in enumerate(split_axes(input_axes, grouped_axes, len(axis_sizes.get('...', ())))):
+        input_composition.extend(leaves)
+        init_sizes.extend([(dim, 1)] if len(leaves) == 1 else (axis_sizes[ax] for ax in leaves))
+        input_spans.append(len(leaves))
+
+    output_dims = split_axes(output_axes, grouped_axes, len(axis_sizes.get('...', ())))
+    output_spans = [len(leaves) for leaves in output_dims]
+    expansions, perm = match_axes(input_composition, [ax for leaves in output_dims for ax in leaves], axis_lengths)
+    # Repeated axes are left to plan_rearrange
+    if sorted(perm) != list(range(len(perm))):
+        return None
+
+    output_groups = []
+    start = 0
+    for span in output_spans:
+        output_groups.append(tuple(perm[start:start + span]))
+        start += span
+
+    return SymbolicRearrangePlan(ndim, tuple(init_sizes), tuple(constraints), tuple(expansions), tuple(perm),
+                                 tuple(output_groups), tuple(input_spans), tuple(output_spans), pattern)
+
+
+def get_symbolic_plan(pattern: str, ndim: int, axis_lengths: Dict[str, int]) -> Optional[SymbolicRearrangePlan]:
+    """Look up the shape-independent plan in the symbolic cache, building it on a miss"""
+    key = ('rearrange', pattern, ndim, tuple(sorted(axis_lengths.items())))
+    return symbolic_cache.get_or_build(key, lambda: build_symbolic_plan(
+        pattern, *parse_rearrange_pattern(pattern), ndim, axis_lengths))
+
+
+def specialize_rearrange_plan(pattern: str, shape: Tuple[int, ...], axis_lengths: Dict[str, int]) -> RearrangePlan:
+    """Concrete plan from the cached symbolic plan, or from scratch if there is none"""
+    symbolic = get_symbolic_plan(pattern, len(shape), axis_lengths)
+    if symbolic is None:
+        return build_rearrange_plan(pattern, shape, axis_lengths)
+    collector = instrumentation.collector
+    if collector is None:
+        return symbolic.specialize(shape)
+    start = instrumentation.clock()
+    plan = symbolic.specialize(shape)
+    collector.add_stage('specialize', instrumentation.clock() - start)
+    return plan
+
+
+def get_rearrange_plan(pattern: str, shape: Tuple[int, ...], axis_lengths: Dict[str, int]) -> RearrangePlan:
+    """
+    Look up the compiled plan in the shared plan cache. On a miss, e.g. for a
+    new batch size, it is specialized from the pattern's symbolic plan.
+    """
+    key = ('rearrange', pattern, shape, tuple(sorted(axis_lengths.items())))
+    return plan_cache.get_or_build(key, lambda: specialize_rearrange_plan(pattern, shape, axis_lengths))
+
+
+def get_rearrange_plans(patterns: Sequence[str], shape: Tuple[int, ...],
+                        axis_lengths: Dict[str, int]) -> Tuple[RearrangePlan, ...]:
+    """Cached build_rearrange_plans, keyed by the whole list of patterns"""
+    key = ('many', tuple(patterns), shape, tuple(sorted(axis_lengths.items())))
+    return plan_cache.get_or_build(key, lambda: tuple(build_rearrange_plans(patterns, shape, axis_lengths)))
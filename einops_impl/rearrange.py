@@ -1,29 +1,70 @@
-from typing import Dict, Any
+import re
+from typing import Dict, Any, List, Optional, Sequence
 import numpy as np
-from .parser import Parser
-from .shape_analzer import ShapeAnalyzer
-from .operations import Operations
-
-
-def expand_group(group_name, grouped_axes):
-    if group_name not in grouped_axes:
-        raise ValueError(f"Group '{group_name}' not found in the pattern. Available groups: {list(grouped_axes.keys())}")
-    expansion = []
-    for item in grouped_axes[group_name]:
-        if item in grouped_axes:
-            expansion.extend(expand_group(item, grouped_axes))
-        else:
-            expansion.append(item)
-    return expansion
-
-def rearrange(tensor: np.ndarray, pattern: str, **axis_lengths) -> np.ndarray:
+from . import instrumentation
+from .plan import SHARED_PASS_CHUNK_BYTES, RearrangePlan, copy_into_many, expand_group, get_rearrange_plan, get_rearrange_plans
+
+# Keyword options of rearrange. They share the keyword namespace with the axis
+# lengths, so a pattern axis with one of these names cannot be given a length.
+OPTION_NAMES = ('materialize', 'copy', 'out', 'threads', 'chunk_bytes', 'inplace', 'order')
+_AXIS_NAME = re.compile(r'[^\W_]\w*')
+
+
+def check_option_names(pattern: str, options: Dict[str, Any]):
+    """
+    Raise if an option that was passed has the name of an axis of the pattern:
+    rearrange cannot tell whether the value is meant as the option or as that
+    axis' length.
+
+    Example:
+        check_option_names('(out c) -> out c', {'out': 2})  -> ValueError
+    """
+    names = set(_AXIS_NAME.findall(pattern))
+    for name, value in options.items():
+        if name in names and value is not None and value is not False:
+            raise ValueError(f"Axis '{name}' of pattern {pattern!r} has the name of the rearrange option "
+                             f"{name}=, which cannot also give its length. Rename the axis; "
+                             f"reserved names are {list(OPTION_NAMES)}")
+
+
+def rearrange(tensor: np.ndarray, pattern: str, materialize: bool = False,
+              copy: Optional[bool] = None, out: Optional[np.ndarray] = None,
+              threads: Optional[int] = None, chunk_bytes: Optional[int] = None,
+              inplace: bool = False, order: Optional[str] = None, **axis_lengths) -> np.ndarray:
     """
     Rearrange a tensor according to the given pattern.
     
     Args:
-        tensor: Input numpy array
+        tensor: Input numpy array, or a list of arrays of the same shape and
+            dtype that is treated as stacked along a new leading axis. A list
+            is copied straight into one new array, without np.stack.
         pattern: Einops-style pattern string
-        **axis_lengths: Known axis lengths
+        materialize: Return a writable, C-contiguous array. By default expanded
+            '1' axes are read-only broadcast views and data is only copied when
+            the final reshape requires it.
+        copy: None (default) returns a view when possible and copies otherwise,
+            False raises ValueError if a copy would be needed, True always
+            returns a fresh C-contiguous array
+        out: Preallocated array of the output shape to write the result into;
+            it is returned instead of a new array
+        threads: Number of threads for copying large results; defaults to
+            einops_impl.parallel.get_num_threads(). Small copies stay serial.
+        chunk_bytes: With out, copy at most this many bytes at a time in the
+            input's memory order; bounds memory for np.memmap inputs/outputs
+        inplace: Permute the data inside tensor's own buffer and return a view
+            of it; tensor must be writable and C-contiguous and is overwritten.
+            Extra memory is bounded by inplace.INPLACE_BATCH_BYTES rather
+            than the array size, for arrays too large to copy; several times
+            slower than a copy.
+        order: Layout of the result for consumers that need one: 'C' or 'F'
+            for C- or Fortran-contiguous, 'any' for either one (a view when
+            either layout comes out of the input, otherwise the cheaper
+            copy), 'K' for any view and copies in the input's memory order.
+            None (default) returns any view and C-ordered copies.
+            plan.result_strides reports the resulting strides ahead of time.
+        **axis_lengths: Known axis lengths. The names of the options above
+            are reserved: passing one of them for an axis of the pattern
+            raises ValueError, so such axes need another name.
     
     Returns:
         Rearranged numpy array
@@ -35,117 +76,129 @@ def rearrange(tensor: np.ndarray, pattern: str, **axis_lengths) -> np.ndarray:
         (5, 6, 3)
     
     Raises:
-        ValueError: If tensor is None or not a numpy array
+        ValueError: If tensor is None, not a numpy array or list of equally shaped arrays
         ValueError: If pattern is empty or None
         ValueError: If axis lengths are missing or invalid
+        ValueError: If copy=False and the result cannot be a view
+        ValueError: If inplace=True and the tensor or pattern does not allow it
+        ValueError: If order is unknown or combined with out=
+        ValueError: If an option is passed that has the name of an axis of the pattern
     """
     # Input validation
+    if tensor is None:
+        raise ValueError("Input tensor cannot be None")
+    collector = instrumentation.collector
+    if collector is not None:
+        start = instrumentation.clock()
+    if isinstance(pattern, str) and (materialize or copy is not None or out is not None or threads is not None
+                                     or chunk_bytes is not None or inplace or order is not None):
+        check_option_names(pattern, {'materialize': materialize, 'copy': copy, 'out': out, 'threads': threads,
+                                     'chunk_bytes': chunk_bytes, 'inplace': inplace, 'order': order})
+    if isinstance(tensor, (list, tuple)):
+        if not pattern:
+            raise ValueError("Pattern string cannot be empty")
+        if copy is False or inplace or chunk_bytes is not None:
+            raise ValueError("A list of arrays is always copied into a new array; "
+                             "copy=False, inplace=True and chunk_bytes are not supported")
+        RearrangePlan.check_options(materialize, copy, out, chunk_bytes, inplace, order)
+        # The result is always a new writable array, which is what materialize asks for
+        result = _rearrange_list(tensor, pattern, out, threads, order, axis_lengths)
+    else:
+        if not isinstance(tensor, np.ndarray):
+            raise ValueError(f"Expected numpy array, got {type(tensor).__name__}")
+        if not pattern:
+            raise ValueError("Pattern string cannot be empty")
+        # Planning is pure shape arithmetic, so repeated calls reuse a cached plan
+        plan = get_rearrange_plan(pattern, tensor.shape, axis_lengths)
+        result = plan.apply(tensor, materialize=materialize, copy=copy, out=out, threads=threads,
+                            chunk_bytes=chunk_bytes, inplace=inplace, order=order)
+    # The plans count the result itself, see RearrangePlan.apply
+    if collector is not None:
+        collector.add_stage('total', instrumentation.clock() - start)
+    return result
+
+
+def _rearrange_list(elements: Sequence[np.ndarray], pattern: str, out: Optional[np.ndarray],
+                    threads: Optional[int], order: Optional[str], axis_lengths: Dict[str, int]) -> np.ndarray:
+    """rearrange of np.stack(elements), written into one output without building the stack"""
+    if not elements:
+        raise ValueError("Cannot rearrange an empty list of arrays")
+    first = elements[0]
+    for i, element in enumerate(elements):
+        if not isinstance(element, np.ndarray):
+            raise ValueError(f"Expected numpy array at index {i}, got {type(element).__name__}")
+        if element.shape != first.shape or element.dtype != first.dtype:
+            raise ValueError(f"All arrays must have the same shape and dtype: element {i} has "
+                             f"{element.shape} {element.dtype}, element 0 has {first.shape} {first.dtype}")
+    plan = get_rearrange_plan(pattern, (len(elements),) + first.shape, axis_lengths)
+    if out is None:
+        # The stack is laid out as a C-contiguous array would be
+        out = plan.empty_result(first.dtype, order)
+    return plan.stack_into(elements, out, threads=threads)
+
+
+def rearrange_many(tensor: np.ndarray, patterns: Sequence[str], materialize: bool = False,
+                   copy: Optional[bool] = None, threads: Optional[int] = None,
+                   chunk_bytes: int = SHARED_PASS_CHUNK_BYTES, **axis_lengths) -> List[np.ndarray]:
+    """
+    Rearrange one tensor into several layouts that share the input side of their patterns.
+
+    The input side is parsed, analyzed and split only once. Results that can be
+    views are views (unless copy=True); all the others are filled in a single
+    pass over the input, chunk_bytes at a time, so a large input is read
+    through the cache once instead of once per pattern.
+
+    Args:
+        tensor: Input numpy array
+        patterns: Einops-style patterns, all with the same left-hand side
+        materialize, copy, threads: As in rearrange, applied to every result
+        chunk_bytes: Size of the input blocks of the shared pass
+        **axis_lengths: Known axis lengths, shared by all patterns
+
+    Returns:
+        List of results in the order of patterns
+
+    Example:
+        >>> x = np.random.rand(2, 4, 4, 3)
+        >>> chw, tokens, pixels = rearrange_many(x, ['b h w c -> b c h w', 'b h w c -> b (h w) c',
+        ...                                          'b h w c -> (b h w) c'])
+        >>> chw.shape, tokens.shape, pixels.shape
+        ((2, 3, 4, 4), (2, 16, 3), (32, 3))
+
+    Raises:
+        ValueError: If the patterns do not share their input side
+        ValueError: As rearrange, for invalid inputs, patterns or axis lengths
+    """
     if tensor is None:
         raise ValueError("Input tensor cannot be None")
     if not isinstance(tensor, np.ndarray):
         raise ValueError(f"Expected numpy array, got {type(tensor).__name__}")
-    if not pattern:
-        raise ValueError("Pattern string cannot be empty")
-    
-    # 1. Parse the pattern
-    parser = Parser(pattern)
-    input_axes, output_axes = parser.parse()
+    if isinstance(patterns, str):
+        raise ValueError("rearrange_many expects a sequence of patterns, got a single string")
 
-    
-    # 2. Analyze shapes
-    shape_analyzer = ShapeAnalyzer()
-    axis_sizes = shape_analyzer.get_axis_size(
-        tensor, input_axes, parser.grouped_axes, axis_lengths
-    )
-    
-    # 3. Initialize operations
-    ops = Operations()
-    current = tensor
-    
-    # 4. Process input grouping
-    input_composition = []  # Track how axes are composed
-    curr_original_idx = 0
-    for i, axis in enumerate(input_axes):
-        if axis == '...':
-            # Handle ellipsis
-            ellipsis_dims = len(axis_sizes['...'])
-            input_composition.extend([f'...{i}' for i in range(ellipsis_dims)])
-            curr_original_idx += ellipsis_dims
-        elif axis in parser.grouped_axes:
-            # Split grouped axes
-            group_axes = expand_group(axis, parser.grouped_axes)
-            sizes = tuple(axis_sizes[ax] for ax in group_axes)
-            current = ops.split_axis(current, curr_original_idx, sizes)
-            input_composition.extend(group_axes)
-            curr_original_idx += len(group_axes) # because we are splitting the axis
-        else:
-            input_composition.append(axis)
-            curr_original_idx += 1
-    
-    # 5. Plan output composition
-    output_composition = []
-    for axis in output_axes:
-        if axis == '...':
-            output_composition.extend([f'...{i}' for i in range(len(axis_sizes['...']))])
-        elif axis in parser.grouped_axes:
-            output_composition.extend(expand_group(axis, parser.grouped_axes))
-        else:
-            output_composition.append(axis)
-
-    if len(input_composition) != len(output_composition):
-        raise ValueError(f"Inconsistent number of dimensions: expected {len(output_composition)}, got {len(input_composition)}")
-        
-    # process them for expansion
-    for i, (in_axis, out_axis) in enumerate(zip(input_composition, output_composition)):
-        # Skip ellipsis markers
-        if in_axis.startswith('...'):
-            continue
-            
-        # Check for dimension changes
-        if in_axis == '1':
-            if out_axis not in axis_lengths:
-                raise ValueError(f"Missing size for expansion axis '{out_axis}'. Please provide it in axis_lengths.")
-            out_size = axis_lengths[out_axis]
-            if out_size <= 0:
-                raise ValueError(f"Expansion size for axis '{out_axis}' must be positive, got {out_size}")
-            current = ops.expand_axis(current, i, out_size)
-            input_composition[i] = out_axis # update the input composition's axis which is 1 to the variable used in the output so that it works for permutation
-    
-    # 6. Create permutation for transpose
-    try:
-        perm = [input_composition.index(ax) for ax in output_composition]
-    except ValueError as e:
-        raise ValueError(f"Invalid axis in output pattern. This might be due to mismatched axes between input and output patterns.") from e
-    current = ops.transpose_axes(current, perm)
-    
-    # 7. Process output grouping
-    final_shape = []
-    i = 0
-    for axis in output_axes:
-        if axis == '...':
-            final_shape.extend(axis_sizes['...'])
-            i += len(axis_sizes['...'])
-        elif axis in parser.grouped_axes:
-            group_axes = expand_group(axis, parser.grouped_axes)
-            try:
-                size = np.prod([axis_sizes[ax] for ax in group_axes])
-            except KeyError as e:
-                missing_axis = str(e).strip("'")
-                raise ValueError(f"Missing size for grouped axis '{missing_axis}' in group {group_axes}") from e
-            final_shape.append(size)
-            i += len(group_axes)
-        else:
-            if axis not in axis_sizes:
-                raise ValueError(f"Missing size for axis '{axis}'. This might be due to an undefined axis in the pattern.")
-            final_shape.append(axis_sizes[axis])
-            i += 1
-    
-    try:
-        return current.reshape(final_shape)
-    except ValueError as e:
-        total_elements_before = np.prod(current.shape)
-        total_elements_after = np.prod(final_shape)
-        if total_elements_before != total_elements_after:
-            raise ValueError(f"Cannot reshape tensor of size {total_elements_before} into shape {tuple(final_shape)} "
-                           f"(which has size {total_elements_after}). This might be due to incorrect axis sizes.") from e
-        raise  
\ No newline at end of file
+    collector = instrumentation.collector
+    if collector is not None:
+        start = instrumentation.clock()
+    plans = get_rearrange_plans(tuple(patterns), tensor.shape, axis_lengths)
+    if copy is False:
+        results = [plan.apply(tensor, materialize=materialize, copy=False, threads=threads) for plan in plans]
+    else:
+        results = []
+        pending = []
+        for plan in plans:
+            result = None if copy else plan.view(tensor)
+            if result is not None:
+                if not materialize or (result.flags.writeable and result.flags.c_contiguous):
+                    results.append(result)
+                    if collector is not None:
+                        collector.add_result(plan.pattern, tensor, result, copied=False)
+                    continue
+            out = np.empty(plan.final_shape, dtype=tensor.dtype)
+            results.append(out)
+            pending.append((plan, out))
+        if pending:
+            copy_into_many(tensor, [plan for plan, _ in pending], [out for _, out in pending],
+                           threads=threads, chunk_bytes=chunk_bytes)
+    if collector is not None:
+        collector.add_stage('total', instrumentation.clock() - start)
+    return results
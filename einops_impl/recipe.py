@@ -0,0 +1,156 @@
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+from . import instrumentation
+from .cache import PlanCache
+from .codegen import compile_symbolic_plan
+from .plan import RearrangePlan, build_symbolic_plan, parse_rearrange_pattern, plan_rearrange
+
+
+class RearrangeRecipe:
+    """
+    A rearrange pattern parsed once and reusable across calls, like re.compile.
+
+    Shape analysis is cached per input shape inside the recipe, so calling it
+    in a loop only pays for reshape/transpose/reshape. Plans for new shapes of
+    an already seen rank are specialized from a symbolic plan.
+
+    Example:
+        >>> to_chw = compile_rearrange('b h w c -> b c h w')
+        >>> to_chw.output_shape((8, 32, 32, 3))
+        (8, 3, 32, 32)
+        >>> to_chw(np.zeros((8, 32, 32, 3))).shape
+        (8, 3, 32, 32)
+
+    With backend='codegen', calls without options run a Python function
+    generated for the pattern and input rank (see einops_impl/codegen.py),
+    which skips the per-call planning machinery. It is meant for latency
+    critical paths on small arrays: copies are left to NumPy's reshape
+    instead of the threaded and tiled engines.
+    """
+    BACKENDS = ('numpy', 'codegen')
+
+    def __init__(self, pattern: str, backend: str = 'numpy', **axis_lengths):
+        if not pattern:
+            raise ValueError("Pattern string cannot be empty")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Available backends: {list(self.BACKENDS)}")
+        self.pattern = pattern
+        self.backend = backend
+        self.axis_lengths = axis_lengths
+        self.input_axes, self.output_axes, self.grouped_axes = parse_rearrange_pattern(pattern)
+        self._plans = PlanCache(maxsize=64)
+        self._symbolic = PlanCache(maxsize=8)
+        # Generated functions by input rank, None if the pattern has no symbolic plan
+        self._generated: Dict[int, Optional[Callable[[np.ndarray], np.ndarray]]] = {}
+
+    def plan(self, shape: Tuple[int, ...]) -> RearrangePlan:
+        """Compiled plan for an input of the given shape"""
+        shape = tuple(shape)
+        return self._lookup(self._plans, 'recipe', shape, lambda: self._specialize(shape))
+
+    def _symbolic_plan(self, ndim: int):
+        return self._lookup(self._symbolic, 'recipe_symbolic', ndim, lambda: build_symbolic_plan(
+            self.pattern, self.input_axes, self.output_axes, self.grouped_axes, ndim, self.axis_lengths
+        ))
+
+    @staticmethod
+    def _lookup(cache: PlanCache, name: str, key, build: Callable):
+        """cache.get_or_build, counted by instrumentation as a lookup in the recipe caches named name"""
+        collector = instrumentation.collector
+        if collector is None:
+            return cache.get_or_build(key, build)
+        built = []
+        plan = cache.get_or_build(key, lambda: built.append(True) or build())
+        collector.add_lookup(name, hit=not built)
+        return plan
+
+    def _specialize(self, shape: Tuple[int, ...]) -> RearrangePlan:
+        symbolic = self._symbolic_plan(len(shape))
+        if symbolic is None:
+            return plan_rearrange(self.pattern, self.input_axes, self.output_axes, self.grouped_axes,
+                                  shape, self.axis_lengths)
+        return symbolic.specialize(shape)
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        """Shape of the result for an input of the given shape"""
+        return self.plan(shape).final_shape
+
+    def is_view(self, shape: Tuple[int, ...], strides: Optional[Tuple[int, ...]] = None,
+                order: Optional[str] = None, itemsize: int = 1) -> bool:
+        """
+        Whether an input of the given shape is rearranged without copying.
+        strides defaults to a C-contiguous input; see RearrangePlan.is_view.
+        """
+        return self.plan(shape).is_view(strides, order=order, itemsize=itemsize)
+
+    def __call__(self, tensor: np.ndarray, materialize: bool = False,
+                 copy: Optional[bool] = None, out: Optional[np.ndarray] = None,
+                 threads: Optional[int] = None, chunk_bytes: Optional[int] = None,
+                 inplace: bool = False, order: Optional[str] = None) -> np.ndarray:
+        if (self._generated and not materialize and copy is None and out is None
+                and threads is None and chunk_bytes is None and not inplace and order is None):
+            function = self._generated.get(getattr(tensor, 'ndim', None))
+            if function is not None:
+                collector = instrumentation.collector
+                if collector is None:
+                    return function(tensor)
+                return self._call_generated(function, tensor, collector)
+        if tensor is None:
+            raise ValueError("Input tensor cannot be None")
+        if not isinstance(tensor, np.ndarray):
+            raise ValueError(f"Expected numpy array, got {type(tensor).__name__}")
+        collector = instrumentation.collector
+        if collector is not None:
+            start = instrumentation.clock()
+        plan = self.plan(tensor.shape)
+        if self.backend == 'codegen' and tensor.ndim not in self._generated:
+            symbolic = self._symbolic_plan(tensor.ndim)
+            self._generated[tensor.ndim] = (None if symbolic is None
+                                            else compile_symbolic_plan(symbolic, self.pattern))
+        # The plan counts the result itself, see RearrangePlan.apply
+        result = plan.apply(tensor, materialize=materialize, copy=copy, out=out,
+                            threads=threads, chunk_bytes=chunk_bytes, inplace=inplace, order=order)
+        if collector is not None:
+            collector.add_stage('total', instrumentation.clock() - start)
+        return result
+
+    def _call_generated(self, function: Callable[[np.ndarray], np.ndarray], tensor: np.ndarray,
+                        collector: 'instrumentation.Stats') -> np.ndarray:
+        """Run a generated function and count the call, which bypasses the plans"""
+        start = instrumentation.clock()
+        result = function(tensor)
+        collector.add_stage('total', instrumentation.clock() - start)
+        collector.add_result(self.pattern, tensor, result)
+        return result
+
+    def __reduce__(self):
+        # Only the pattern travels; workers re-parse once and build their own plans
+        return (_rebuild_recipe, (self.pattern, self.axis_lengths, self.backend))
+
+    def __repr__(self):
+        backend = f", backend={self.backend!r}" if self.backend != 'numpy' else ''
+        lengths = ''.join(f", {name}={size}" for name, size in self.axis_lengths.items())
+        return f"compile_rearrange({self.pattern!r}{backend}{lengths})"
+
+
+def _rebuild_recipe(pattern: str, axis_lengths: dict, backend: str = 'numpy') -> RearrangeRecipe:
+    return RearrangeRecipe(pattern, backend=backend, **axis_lengths)
+
+
+def compile_rearrange(pattern: str, backend: str = 'numpy', **axis_lengths) -> RearrangeRecipe:
+    """
+    Compile a rearrange pattern into a reusable, picklable recipe.
+
+    Args:
+        pattern: Einops-style pattern string
+        backend: 'numpy' (default) or 'codegen' to run a generated function
+            per input rank on calls without options
+        **axis_lengths: Known axis lengths
+
+    Returns:
+        Callable recipe; recipe(tensor) is equivalent to rearrange(tensor, pattern, **axis_lengths)
+
+    Raises:
+        ValueError: If the pattern is empty or invalid, or the backend is unknown
+    """
+    return RearrangeRecipe(pattern, backend=backend, **axis_lengths)
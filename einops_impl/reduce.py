@@ -0,0 +1,239 @@
+from typing import Callable, Dict, List, Tuple, Union
+import numpy as np
+from .shape_analzer import ShapeAnalyzer
+from .cache import plan_cache
+from .plan import expand_group, parse_rearrange_pattern, split_input_axes
+
+REDUCTIONS: Dict[str, Callable] = {
+    'sum': np.sum,
+    'mean': np.mean,
+    'max': np.max,
+    'min': np.min,
+    'prod': np.prod,
+    'any': np.any,
+    'all': np.all,
+}
+
+Reduction = Union[str, np.ufunc, Callable[[np.ndarray, Tuple[int, ...]], np.ndarray]]
+
+
+def coalesce_reduction(init_shape: Tuple[int, ...], reduced_axes: Tuple[int, ...],
+                       perm: Tuple[int, ...]) -> Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Optimizer pass: merge neighbouring reduced axes, and neighbouring kept axes
+    that stay in order in the output, and drop size-1 axes.
+
+    Example:
+        'b c h w -> b c' reduces two axes of a 4-D array, but
+        coalesce_reduction((8, 3, 32, 32), (2, 3), (0, 1)) -> ((24, 1024), (1,), (0,))
+    """
+    reduced = set(reduced_axes)
+    kept = [axis for axis in range(len(init_shape)) if axis not in reduced]
+    # Output position of every kept axis
+    position = {kept[k]: n for n, k in enumerate(perm)}
+
+    runs: List[List[int]] = []
+    for axis, size in enumerate(init_shape):
+        if size == 1:
+            continue
+        if runs:
+            last = runs[-1][-1]
+            if axis in reduced and last in reduced:
+                runs[-1].append(axis)
+                continue
+            if axis not in reduced and last not in reduced and position[axis] == position[last] + 1:
+                runs[-1].append(axis)
+                continue
+        runs.append([axis])
+
+    shape = []
+    new_reduced = []
+    kept_runs = []
+    for k, run in enumerate(runs):
+        size = 1
+        for axis in run:
+            size *= init_shape[axis]
+        shape.append(size)
+        if run[0] in reduced:
+            new_reduced.append(k)
+        else:
+            kept_runs.append(run)
+    order = sorted(range(len(kept_runs)), key=lambda k: position[kept_runs[k][0]])
+    return tuple(shape), tuple(new_reduced), tuple(order)
+
+
+class ReducePlan:
+    """
+    Compiled form of a reduce for one pattern, input shape and set of axis lengths.
+
+    Applying a plan is a fixed sequence of array operations:
+        reshape(init_shape) -> reduce(reduced_axes) -> transpose(perm) -> reshape(final_shape)
+
+    The reshape only splits axes, so it is a view for any input layout and the
+    reduction runs directly on the strided input. For C-contiguous inputs the
+    coalesced_* variant is used (see coalesce_reduction).
+
+    Example:
+        plan = build_reduce_plan('b (h 2) (w 2) c -> b h w c', (8, 32, 32, 3), {})
+        plan.init_shape     -> (8, 16, 2, 16, 2, 3)
+        plan.reduced_axes   -> (2, 4)
+        plan.final_shape    -> (8, 16, 16, 3)
+    """
+    def __init__(self, input_shape: Tuple[int, ...], init_shape: Tuple[int, ...],
+                 reduced_axes: Tuple[int, ...], perm: Tuple[int, ...], final_shape: Tuple[int, ...]):
+        self.input_shape = input_shape
+        self.init_shape = init_shape
+        self.reduced_axes = reduced_axes
+        self.perm = perm
+        self.final_shape = final_shape
+        self.coalesced_shape, self.coalesced_reduced_axes, self.coalesced_perm = coalesce_reduction(
+            init_shape, reduced_axes, perm
+        )
+
+    def apply(self, tensor: np.ndarray, reduction: Reduction) -> np.ndarray:
+        """Run the plan on tensor with the given reduction"""
+        reducer = resolve_reduction(reduction)
+        if tensor.flags.c_contiguous:
+            shape, reduced_axes, perm = self.coalesced_shape, self.coalesced_reduced_axes, self.coalesced_perm
+        else:
+            shape, reduced_axes, perm = self.init_shape, self.reduced_axes, self.perm
+        current = tensor.reshape(shape)
+        if reduced_axes:
+            expected = tuple(size for axis, size in enumerate(shape) if axis not in reduced_axes)
+            current = np.asarray(reducer(current, reduced_axes))
+            if current.shape != expected:
+                raise ValueError(f"Reduction {reduction!r} returned shape {current.shape}, expected {expected}")
+        if perm != tuple(range(len(perm))):
+            current = np.transpose(current, perm)
+        return current.reshape(self.final_shape)
+
+    def __repr__(self):
+        return (f"ReducePlan(input_shape={self.input_shape}, init_shape={self.init_shape}, "
+                f"reduced_axes={self.reduced_axes}, perm={self.perm}, final_shape={self.final_shape})")
+
+
+def resolve_reduction(reduction: Reduction) -> Callable[[np.ndarray, Tuple[int, ...]], np.ndarray]:
+    """
+    Turn a reduction name, ufunc or callable into a function of (tensor, axes).
+
+    Raises:
+        ValueError: If the reduction is unknown
+    """
+    if isinstance(reduction, str):
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"Unknown reduction '{reduction}'. Available reductions: {list(REDUCTIONS)}")
+        function = REDUCTIONS[reduction]
+        return lambda tensor, axes: function(tensor, axis=axes)
+    if isinstance(reduction, np.ufunc):
+        return lambda tensor, axes: reduction.reduce(tensor, axis=axes)
+    if callable(reduction):
+        return reduction
+    raise ValueError(f"Reduction must be a string, a numpy ufunc or a callable, got {type(reduction).__name__}")
+
+
+def build_reduce_plan(pattern: str, shape: Tuple[int, ...], axis_lengths: Dict[str, int]) -> ReducePlan:
+    """
+    Parse the pattern and resolve every axis size for the given input shape.
+    Input axes missing from the output, and numeric input axes such as the 2
+    in '(h 2)', are reduced.
+
+    Raises:
+        ValueError: If the pattern is invalid or does not fit the shape
+    """
+    input_axes, output_axes, grouped_axes = parse_rearrange_pattern(pattern)
+    if '...' not in input_axes and len(shape) != len(input_axes):
+        raise ValueError(f"Pattern '{pattern}' expects {len(input_axes)} dimensions, got {len(shape)}")
+    if '...' in output_axes and '...' not in input_axes:
+        raise ValueError(f"Ellipsis in the output of '{pattern}' but not in its input")
+
+    axis_sizes = ShapeAnalyzer.get_axis_size_from_shape(shape, input_axes, grouped_axes, axis_lengths)
+    composition, init_shape, _ = split_input_axes(input_axes, grouped_axes, axis_sizes, shape)
+
+    output_composition: List[str] = []
+    for axis in output_axes:
+        if axis == '...':
+            output_composition.extend([f'...{i}' for i in range(len(axis_sizes['...']))])
+        elif axis in grouped_axes:
+            output_composition.extend(expand_group(axis, grouped_axes))
+        else:
+            output_composition.append(axis)
+
+    kept_names = []
+    for name in output_composition:
+        if name.isdigit():
+            if name != '1':
+                raise ValueError(f"Only '1' can appear as a number in the output of reduce, got '{name}'")
+            continue
+        if name not in composition:
+            raise ValueError(f"Axis '{name}' in the output of '{pattern}' is not in its input")
+        if name in kept_names:
+            raise ValueError(f"Axis '{name}' appears more than once in the output of '{pattern}'")
+        kept_names.append(name)
+
+    reduced_axes = tuple(i for i, name in enumerate(composition) if name.isdigit() or name not in kept_names)
+    kept_axes = [i for i in range(len(composition)) if i not in reduced_axes]
+    perm = tuple(kept_axes.index(composition.index(name)) for name in kept_names)
+
+    def size_of(name: str) -> int:
+        return int(name) if name.isdigit() else int(axis_sizes[name])
+
+    final_shape = []
+    for axis in output_axes:
+        if axis == '...':
+            final_shape.extend(int(size) for size in axis_sizes['...'])
+        elif axis in grouped_axes:
+            size = 1
+            for leaf in expand_group(axis, grouped_axes):
+                size *= size_of(leaf)
+            final_shape.append(size)
+        else:
+            final_shape.append(size_of(axis))
+
+    return ReducePlan(tuple(int(size) for size in shape), tuple(init_shape), reduced_axes, perm,
+                      tuple(final_shape))
+
+
+def get_reduce_plan(pattern: str, shape: Tuple[int, ...], axis_lengths: Dict[str, int]) -> ReducePlan:
+    """Look up the compiled plan in the shared plan cache, building it on a miss"""
+    key = ('reduce', pattern, shape, tuple(sorted(axis_lengths.items())))
+    return plan_cache.get_or_build(key, lambda: build_reduce_plan(pattern, shape, axis_lengths))
+
+
+def reduce(tensor: np.ndarray, pattern: str, reduction: Reduction, **axis_lengths) -> np.ndarray:
+    """
+    Rearrange a tensor and reduce over the axes that do not appear in the output.
+
+    Args:
+        tensor: Input numpy array
+        pattern: Einops-style pattern string; numeric axes such as the 2 in
+            '(h 2)' are always reduced, and '1' in the output keeps a size-1 axis
+        reduction: One of 'sum', 'mean', 'max', 'min', 'prod', 'any', 'all',
+            a numpy ufunc (its reduce method is used), or a callable taking the
+            tensor and a tuple of axes
+        **axis_lengths: Known axis lengths
+
+    Returns:
+        Reduced numpy array
+
+    Example:
+        >>> x = np.random.rand(8, 32, 32, 3)
+        >>> reduce(x, 'b (h 2) (w 2) c -> b h w c', 'mean').shape
+        (8, 16, 16, 3)
+        >>> reduce(x, 'b h w c -> b c', 'max').shape
+        (8, 3)
+
+    Raises:
+        ValueError: If tensor is None or not a numpy array
+        ValueError: If pattern is empty or None
+        ValueError: If the reduction is unknown
+        ValueError: If axis lengths are missing or invalid
+    """
+    if tensor is None:
+        raise ValueError("Input tensor cannot be None")
+    if not isinstance(tensor, np.ndarray):
+        raise ValueError(f"Expected numpy array, got {type(tensor).__name__}")
+    if not pattern:
+        raise ValueError("Pattern string cannot be empty")
+
+    plan = get_reduce_plan(pattern, tensor.shape, axis_lengths)
+    return plan.apply(tensor, reduction)
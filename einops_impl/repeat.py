@@ -0,0 +1,206 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .shape_analzer import ShapeAnalyzer
+from .operations import Operations
+from .cache import plan_cache
+from .plan import expand_group, parse_rearrange_pattern, split_input_axes
+from .utils import c_strides, reshape_strides
+
+
+class RepeatPlan:
+    """
+    Compiled form of a repeat for one pattern, input shape and set of axis lengths.
+
+    Applying a plan is a fixed sequence of array operations:
+        reshape(init_shape) -> transpose(perm) -> reshape(view_shape)
+        -> broadcast_to(repeated_shape) -> reshape(final_shape)
+
+    Everything up to the broadcast is a view, and new axes have stride 0. The
+    final reshape only copies when a new axis is merged with an existing one,
+    as in '(h 2)'; that single reshape then writes the repeated data once.
+
+    Example:
+        plan = build_repeat_plan('h w -> (h 2) w c', (4, 5), {'c': 3})
+        plan.view_shape      -> (4, 1, 5, 1)
+        plan.repeated_shape  -> (4, 2, 5, 3)
+        plan.final_shape     -> (8, 5, 3)
+    """
+    def __init__(self, input_shape: Tuple[int, ...], init_shape: Tuple[int, ...], perm: Tuple[int, ...],
+                 view_shape: Tuple[int, ...], repeated_shape: Tuple[int, ...], final_shape: Tuple[int, ...],
+                 new_axes: Tuple[int, ...]):
+        self.input_shape = input_shape
+        self.init_shape = init_shape
+        self.perm = perm
+        self.view_shape = view_shape
+        self.repeated_shape = repeated_shape
+        self.final_shape = final_shape
+        # Positions of the broadcast axes in repeated_shape
+        self.new_axes = new_axes
+
+    def broadcast(self, tensor: np.ndarray) -> np.ndarray:
+        """Read-only view of tensor with every new axis broadcast, before the final reshape"""
+        current = tensor.reshape(self.init_shape)
+        if self.perm != tuple(range(len(self.perm))):
+            current = Operations.transpose_axes(current, self.perm)
+        return np.broadcast_to(current.reshape(self.view_shape), self.repeated_shape)
+
+    def apply(self, tensor: np.ndarray, materialize: bool = False) -> np.ndarray:
+        """Run the plan on tensor; materialize=True returns a writable C-contiguous array"""
+        result = self.broadcast(tensor).reshape(self.final_shape)
+        if materialize:
+            result = Operations.materialize(result)
+        return result
+
+    def output_strides(self, input_strides: Optional[Sequence[int]] = None,
+                       itemsize: int = 1) -> Optional[Tuple[int, ...]]:
+        """
+        Strides of the result if it is a view of the input, or None if applying
+        the plan copies. input_strides defaults to a C-contiguous input.
+        """
+        if input_strides is None:
+            input_strides = c_strides(self.input_shape, itemsize)
+        strides = reshape_strides(self.input_shape, input_strides, self.init_shape, itemsize)
+        if strides is None:
+            return None
+        transposed = iter(strides[axis] for axis in self.perm)
+        repeated_strides = tuple(0 if axis in self.new_axes else next(transposed)
+                                 for axis in range(len(self.repeated_shape)))
+        return reshape_strides(self.repeated_shape, repeated_strides, self.final_shape, itemsize)
+
+    def is_view(self, input_strides: Optional[Sequence[int]] = None) -> bool:
+        """Whether applying the plan returns a view instead of copying the data"""
+        return self.output_strides(input_strides) is not None
+
+    def __repr__(self):
+        return (f"RepeatPlan(input_shape={self.input_shape}, init_shape={self.init_shape}, perm={self.perm}, "
+                f"view_shape={self.view_shape}, repeated_shape={self.repeated_shape}, "
+                f"final_shape={self.final_shape})")
+
+
+def build_repeat_plan(pattern: str, shape: Tuple[int, ...], axis_lengths: Dict[str, int]) -> RepeatPlan:
+    """
+    Parse the pattern and resolve every axis size for the given input shape.
+    Output axes missing from the input are new: their size is either given in
+    axis_lengths or written as a number, as the 2 in '(h 2)'.
+
+    Raises:
+        ValueError: If the pattern is invalid or does not fit the shape
+    """
+    input_axes, output_axes, grouped_axes = parse_rearrange_pattern(pattern)
+    if '...' not in input_axes and len(shape) != len(input_axes):
+        raise ValueError(f"Pattern '{pattern}' expects {len(input_axes)} dimensions, got {len(shape)}")
+    if '...' in output_axes and '...' not in input_axes:
+        raise ValueError(f"Ellipsis in the output of '{pattern}' but not in its input")
+
+    axis_sizes = ShapeAnalyzer.get_axis_size_from_shape(shape, input_axes, grouped_axes, axis_lengths)
+    composition, init_shape, _ = split_input_axes(input_axes, grouped_axes, axis_sizes, shape)
+    for name in composition:
+        if name.isdigit() and name != '1':
+            raise ValueError(f"Only '1' can appear as a number in the input of repeat, got '{name}'")
+
+    ellipsis = [f'...{i}' for i in range(len(axis_sizes.get('...', ())))]
+
+    def output_leaves(axis: str) -> List[str]:
+        names = expand_group(axis, grouped_axes) if axis in grouped_axes else [axis]
+        return [leaf for name in names for leaf in (ellipsis if name == '...' else [name])]
+
+    # Every output leaf, and whether it is a new axis
+    leaves: List[Tuple[str, bool]] = [(leaf, leaf.isdigit() or leaf not in composition)
+                                      for axis in output_axes for leaf in output_leaves(axis)]
+
+    kept = [name for name, new in leaves if not new]
+    for name in composition:
+        if name != '1' and name not in kept:
+            raise ValueError(f"Axis '{name}' of the input of '{pattern}' is missing from its output; "
+                             f"use reduce to remove axes")
+    if len(set(kept)) != len(kept):
+        raise ValueError(f"An input axis appears more than once in the output of '{pattern}'")
+
+    def size_of(name: str) -> int:
+        if name.isdigit():
+            return int(name)
+        if name not in axis_sizes:
+            raise ValueError(f"Missing size for new axis '{name}'. Please provide it in axis_lengths.")
+        size = int(axis_sizes[name])
+        if size <= 0:
+            raise ValueError(f"Size of new axis '{name}' must be positive, got {size}")
+        return size
+
+    # Input '1' axes are dropped by the split reshape
+    kept_axes = [i for i, name in enumerate(composition) if name != '1']
+    init_shape = [init_shape[i] for i in kept_axes]
+    perm = tuple(kept_axes.index(composition.index(name)) for name in kept)
+    view_shape = []
+    repeated_shape = []
+    for name, new in leaves:
+        if new:
+            view_shape.append(1)
+            repeated_shape.append(size_of(name))
+        else:
+            size = init_shape[kept_axes.index(composition.index(name))]
+            view_shape.append(size)
+            repeated_shape.append(size)
+
+    final_shape = []
+    position = 0
+    for axis in output_axes:
+        count = len(output_leaves(axis))
+        size = 1
+        for leaf_size in repeated_shape[position:position + count]:
+            size *= leaf_size
+        if axis == '...':
+            final_shape.extend(repeated_shape[position:position + count])
+        else:
+            final_shape.append(size)
+        position += count
+
+    return RepeatPlan(tuple(int(size) for size in shape), tuple(init_shape), perm, tuple(view_shape),
+                      tuple(repeated_shape), tuple(final_shape),
+                      tuple(i for i, (_, new) in enumerate(leaves) if new))
+
+
+def get_repeat_plan(pattern: str, shape: Tuple[int, ...], axis_lengths: Dict[str, int]) -> RepeatPlan:
+    """Look up the compiled plan in the shared plan cache, building it on a miss"""
+    key = ('repeat', pattern, shape, tuple(sorted(axis_lengths.items())))
+    return plan_cache.get_or_build(key, lambda: build_repeat_plan(pattern, shape, axis_lengths))
+
+
+def repeat(tensor: np.ndarray, pattern: str, materialize: bool = False, **axis_lengths) -> np.ndarray:
+    """
+    Rearrange a tensor and repeat it along new output axes.
+
+    The result is a read-only stride-0 broadcast view whenever the output
+    layout allows it. Data is only copied, in a single reshape, when a new
+    axis is merged with an existing one, as in '(h 2)'.
+
+    Args:
+        tensor: Input numpy array
+        pattern: Einops-style pattern string; output axes missing from the
+            input are new axes, sized by axis_lengths or by a number
+        materialize: Return a writable, C-contiguous array
+        **axis_lengths: Known axis lengths, including the sizes of new axes
+
+    Returns:
+        Repeated numpy array
+
+    Example:
+        >>> x = np.random.rand(4, 5)
+        >>> repeat(x, 'h w -> h w c', c=3).strides
+        (40, 8, 0)
+        >>> repeat(x, 'h w -> (h 2) (w 2)').shape
+        (8, 10)
+
+    Raises:
+        ValueError: If tensor is None or not a numpy array
+        ValueError: If pattern is empty or None
+        ValueError: If sizes of new axes are missing or invalid
+    """
+    if tensor is None:
+        raise ValueError("Input tensor cannot be None")
+    if not isinstance(tensor, np.ndarray):
+        raise ValueError(f"Expected numpy array, got {type(tensor).__name__}")
+    if not pattern:
+        raise ValueError("Pattern string cannot be empty")
+
+    plan = get_repeat_plan(pattern, tensor.shape, axis_lengths)
+    return plan.apply(tensor, materialize=materialize)
@@ -1,5 +1,8 @@
 import numpy as np
-from typing import Dict,List,Tuple,Union
+from typing import Dict,List,Optional,Tuple,Union
+
+# Size of an axis as a function of the input shape, see get_symbolic_axis_sizes
+SizeExpr = Tuple[Optional[int], int]
 class ShapeAnalyzer:
     @staticmethod
     def get_axis_size(tensor: np.ndarray, axes: List[str],
@@ -8,12 +11,25 @@ class ShapeAnalyzer:
         """
         Get the size of the axes in the tensor
         """
+        return ShapeAnalyzer.get_axis_size_from_shape(tensor.shape, axes, grouped_axes, axis_lengths)
+
+    @staticmethod
+    def get_axis_size_from_shape(current_shape: Tuple[int, ...], axes: List[str],
+                                 grouped_axes: Dict[str,List[str]],
+                                 axis_lengths: Dict[str,int]) -> Dict[str,int]:
+        """
+        Get the size of the axes from a shape alone, so plans can be built without a tensor
+        """
         sizes = {}
-        current_shape = tensor.shape
 
         for axis in axis_lengths:
             sizes[axis] = axis_lengths[axis]
 
+        # Numeric axes such as the 2 in '(h 2)' have a fixed size
+        for axis in axes + [item for group in grouped_axes.values() for item in group]:
+            if axis.isdigit():
+                sizes[axis] = int(axis)
+
         def calculate_group_size(group_axes: List[str]) -> int:
             total_size = 1
             for axis in group_axes:
@@ -69,9 +85,78 @@ class ShapeAnalyzer:
             else:
                 if axis not in sizes:
                     sizes[axis] = current_shape[shape_idx]
+                elif sizes[axis] != current_shape[shape_idx]:
+                    # Numeric axes and lengths given in axis_lengths must match the shape
+                    raise ValueError(f"Axis '{axis}' has size {current_shape[shape_idx]}, expected {sizes[axis]}")
                 shape_idx += 1
 
         return sizes
 
+    @staticmethod
+    def get_symbolic_axis_sizes(ndim: int, axes: List[str],
+                                grouped_axes: Dict[str,List[str]],
+                                axis_lengths: Dict[str,int]
+                                ) -> Optional[Tuple[Dict[str, Union[SizeExpr, Tuple[SizeExpr, ...]]],
+                                                    List[Tuple[int, int, bool]]]]:
+        """
+        Get the size of the axes as expressions of an input shape with ndim
+        dimensions, so the analysis is shared by every shape of that rank.
+
+        Each size is a pair (dim, value):
+            (None, c) -> the constant c, from axis_lengths or a numeric axis
+            (d, 1)    -> shape[d]
+            (d, k)    -> shape[d] // k, the one unknown axis of a group whose known axes multiply to k
+        '...' maps to a tuple of (d, 1) pairs.
+
+        The constraints are (dim, value, exact) triples: shape[dim] must equal
+        value if exact, and be divisible by it otherwise.
+
+        Returns None if an input axis name is repeated; get_axis_size_from_shape
+        handles those patterns for concrete shapes.
+
+        Example:
+            get_symbolic_axis_sizes(3, ['b', 'group_0', 'c'], {'group_0': ['h', 'w']}, {'w': 4})
+            -> ({'w': (None, 4), 'b': (0, 1), 'h': (1, 4), 'c': (2, 1)}, [(1, 4, False)])
+        """
+        sizes = {axis: (None, int(length)) for axis, length in axis_lengths.items()}
+        for axis in axes + [item for group in grouped_axes.values() for item in group]:
+            if axis.isdigit():
+                sizes[axis] = (None, int(axis))
+        constraints = []
+        seen = set()
+
+        dim = 0
+        for axis in axes:
+            if axis == '...':
+                remaining_dims = ndim - (len(axes) - 1)
+                if remaining_dims < 0:
+                    raise ValueError("Not enough dimensions")
+                sizes['...'] = tuple((d, 1) for d in range(dim, dim + remaining_dims))
+                dim += remaining_dims
+                continue
+            group_axes = grouped_axes[axis] if axis in grouped_axes else [axis]
+            known_product = 1
+            unknown_axis = None
+            for group_axis in group_axes:
+                if group_axis in grouped_axes or group_axis in seen:
+                    return None
+                if not group_axis.isdigit():
+                    seen.add(group_axis)
+                if group_axis in sizes:
+                    known_product *= sizes[group_axis][1]
+                elif unknown_axis is not None:
+                    raise ValueError(f"Multiple unknown axes in group: {group_axes}")
+                else:
+                    unknown_axis = group_axis
+            if unknown_axis is None:
+                constraints.append((dim, known_product, True))
+            elif known_product == 0:
+                return None
+            else:
+                sizes[unknown_axis] = (dim, known_product)
+                if known_product != 1:
+                    constraints.append((dim, known_product, False))
+            dim += 1
+
+        return sizes, constraints
 
-        
\ No newline at end of file
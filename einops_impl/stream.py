@@ -0,0 +1,96 @@
+from typing import Iterable, Iterator, Optional
+import numpy as np
+from .plan import expand_group
+from .recipe import compile_rearrange, RearrangeRecipe
+
+
+def _leading_granule(recipe: RearrangeRecipe) -> Optional[int]:
+    """
+    Number of leading rows that make up one step of the outermost axis, if the
+    pattern starts with a group like '(n b ...)' where only n is unknown.
+    Only then does concatenating batches along axis 0 concatenate along n.
+    """
+    if not recipe.input_axes or recipe.input_axes[0] not in recipe.grouped_axes:
+        return None
+    leaves = expand_group(recipe.input_axes[0], recipe.grouped_axes)
+    if leaves[0] in recipe.axis_lengths or not all(leaf in recipe.axis_lengths for leaf in leaves[1:]):
+        return None
+    granule = 1
+    for leaf in leaves[1:]:
+        granule *= recipe.axis_lengths[leaf]
+    return granule
+
+
+def rearrange_stream(batches: Iterable[np.ndarray], pattern: str, drop_remainder: bool = False,
+                     **axis_lengths) -> Iterator[np.ndarray]:
+    """
+    Lazily rearrange every array of an iterable of batches.
+
+    The pattern is compiled once. A new plan is only built when the batch shape
+    changes, e.g. for a short final batch.
+
+    If the pattern starts with a group whose outermost axis is the only unknown
+    one, such as '(n b) ... -> n b ...' with b given, batches are re-chunked
+    along axis 0: rows that do not fill a whole b are carried over in a small
+    buffer and joined with the next batch, so batch sizes need not be multiples of b.
+
+    Args:
+        batches: Iterable of numpy arrays
+        pattern: Einops-style pattern string
+        drop_remainder: Drop rows left in the carry buffer at the end of the
+            stream instead of raising
+        **axis_lengths: Known axis lengths
+
+    Yields:
+        Rearranged numpy arrays
+
+    Example:
+        >>> batches = [np.zeros((10, 3)), np.zeros((6, 3))]
+        >>> [y.shape for y in rearrange_stream(batches, '(n b) c -> n b c', b=4)]
+        [(2, 4, 3), (1, 4, 3), (1, 4, 3)]
+
+    Raises:
+        ValueError: If a batch is not a numpy array or does not fit the pattern
+        ValueError: If rows are left over at the end and drop_remainder is False
+    """
+    recipe = compile_rearrange(pattern, **axis_lengths)
+    granule = _leading_granule(recipe)
+
+    carry: Optional[np.ndarray] = None
+    filled = 0
+    for batch in batches:
+        if not isinstance(batch, np.ndarray):
+            raise ValueError(f"Expected numpy array, got {type(batch).__name__}")
+        if granule is None or batch.ndim == 0:
+            yield recipe(batch)
+            continue
+
+        start = 0
+        if filled:
+            if batch.shape[1:] != carry.shape[1:] or batch.dtype != carry.dtype:
+                raise ValueError(f"Batch of shape {batch.shape} and dtype {batch.dtype} cannot continue the "
+                                 f"{filled} rows of shape {carry.shape[1:]} and dtype {carry.dtype} "
+                                 f"carried over from the previous batch")
+            start = min(granule - filled, len(batch))
+            carry[filled:filled + start] = batch[:start]
+            filled += start
+            if filled < granule:
+                continue
+            # The carry buffer is reused, so its result has to own the data
+            yield recipe(carry, copy=True)
+            filled = 0
+
+        whole = (len(batch) - start) // granule * granule
+        if whole:
+            yield recipe(batch[start:start + whole])
+
+        rest = len(batch) - start - whole
+        if rest:
+            if carry is None or carry.shape[1:] != batch.shape[1:] or carry.dtype != batch.dtype:
+                carry = np.empty((granule,) + batch.shape[1:], dtype=batch.dtype)
+            carry[:rest] = batch[start + whole:]
+            filled = rest
+
+    if filled and not drop_remainder:
+        raise ValueError(f"Stream ended with {filled} rows left over, which do not fill a group of {granule}. "
+                         f"Pass drop_remainder=True to discard them.")
@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+from einops_impl.cache import PlanCache, plan_cache
+from einops_impl.rearrange import rearrange
+
+
+def test_hits_and_misses():
+    """Test that repeated keys are served from the cache"""
+    cache = PlanCache(maxsize=4)
+    builds = []
+    for _ in range(3):
+        cache.get_or_build('a', lambda: builds.append('a') or 'plan-a')
+    assert builds == ['a']
+    info = cache.info()
+    assert (info.hits, info.misses, info.currsize) == (2, 1, 1)
+
+def test_lru_eviction():
+    """Test that the least recently used plan is evicted first"""
+    cache = PlanCache(maxsize=2)
+    cache.get_or_build('a', lambda: 1)
+    cache.get_or_build('b', lambda: 2)
+    cache.get_or_build('a', lambda: 1)  # 'a' is now most recent
+    cache.get_or_build('c', lambda: 3)
+    assert cache.get_or_build('a', lambda: -1) == 1
+    assert cache.get_or_build('b', lambda: -2) == -2
+
+def test_resize_and_clear():
+    """Test resizing and clearing the cache"""
+    cache = PlanCache(maxsize=8)
+    for key in range(8):
+        cache.get_or_build(key, lambda: key)
+    cache.resize(3)
+    assert cache.info().currsize == 3
+    cache.resize(0)
+    cache.get_or_build('x', lambda: 1)
+    assert cache.info().currsize == 0
+    cache.clear()
+    assert cache.info() == (0, 0, 0, 0)
+    with pytest.raises(ValueError):
+        cache.resize(-1)
+
+def test_failed_builds_are_not_cached():
+    cache = PlanCache()
+    def fail():
+        raise ValueError("bad pattern")
+    with pytest.raises(ValueError):
+        cache.get_or_build('k', fail)
+    assert cache.get_or_build('k', lambda: 'ok') == 'ok'
+
+def test_rearrange_uses_shared_cache():
+    """Test that rearrange reuses plans across calls with the same shape"""
+    plan_cache.clear()
+    x = np.arange(30 * 3).reshape(30, 3)
+    first = rearrange(x, '(h w) c -> c h w', h=5)
+    second = rearrange(x + 1, '(h w) c -> c h w', h=5)
+    info = plan_cache.info()
+    assert (info.hits, info.misses) == (1, 1)
+    np.testing.assert_array_equal(second, first + 1)
+
+    # A different shape or different axis lengths need a new plan
+    rearrange(x, '(h w) c -> c h w', h=6)
+    rearrange(np.zeros((20, 3)), '(h w) c -> c h w', h=5)
+    assert plan_cache.info().misses == 3
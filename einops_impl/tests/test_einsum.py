@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+from einops_impl.cache import plan_cache
+from einops_impl.einsum import einsum, build_einsum_plan, get_einsum_plan
+
+
+def test_einsum_composite_axes():
+    q, k = np.random.rand(2, 64, 5), np.random.rand(2, 64, 7)
+    result = einsum(q, k, 'b (h d) i, b (h d) j -> b h i j', h=8)
+    expected = np.einsum('bhdi,bhdj->bhij', q.reshape(2, 8, 8, 5), k.reshape(2, 8, 8, 7))
+    np.testing.assert_allclose(result, expected)
+
+def test_einsum_nested_and_output_groups():
+    a, b = np.random.rand(24, 5), np.random.rand(5, 6)
+    result = einsum(a, b, '((x y) z) k, k n -> (x n) (y z)', x=2, y=3)
+    expected = np.einsum('xyzk,kn->xnyz', a.reshape(2, 3, 4, 5), b).reshape(12, 12)
+    np.testing.assert_allclose(result, expected)
+
+def test_einsum_single_operand_and_chain():
+    np.testing.assert_allclose(einsum(np.arange(9.0).reshape(3, 3), 'i i ->'), 12.0)
+    a, b, c = np.random.rand(3, 4), np.random.rand(4, 5), np.random.rand(5, 2)
+    np.testing.assert_allclose(einsum(a, b, c, 'i j, j k, k l -> i l'), a @ b @ c)
+
+def test_einsum_path_is_cached():
+    plan_cache.clear()
+    a, b, c = np.random.rand(30, 40), np.random.rand(40, 50), np.random.rand(50, 8)
+    einsum(a, b, c, 'i j, j k, k l -> i l')
+    plan = get_einsum_plan('i j, j k, k l -> i l', (a.shape, b.shape, c.shape), {})
+    assert plan.path[0] == 'einsum_path' and len(plan.path) == 3
+    einsum(a, b, c, 'i j, j k, k l -> i l')
+    assert plan_cache.info().hits == 2
+
+def test_einsum_plan():
+    plan = build_einsum_plan('b (h d) i, b (h d) j -> b h i j', [(2, 32, 5), (2, 32, 7)], {'h': 4})
+    assert plan.subscripts == 'abcd,abce->abde'
+    assert plan.split_shapes == ((2, 4, 8, 5), (2, 4, 8, 7))
+    assert plan.final_shape == (2, 4, 5, 7)
+
+def test_einsum_errors():
+    x, y = np.random.rand(2, 6), np.random.rand(3, 6)
+    with pytest.raises(ValueError, match="has size 3 in one operand and 2"):
+        einsum(x, y, 'i j, i j -> i')
+    with pytest.raises(ValueError, match="does not appear in any operand"):
+        einsum(x, 'i j -> k')
+    with pytest.raises(ValueError, match="2 operands, got 1"):
+        einsum(x, 'i j, j k -> i k')
+    with pytest.raises(ValueError, match="followed by a pattern"):
+        einsum(x, y)
+    with pytest.raises(ValueError, match="Ellipsis"):
+        einsum(x, '... j -> ...')
@@ -0,0 +1,78 @@
+import tracemalloc
+import pytest
+import numpy as np
+from einops_impl.rearrange import rearrange
+from einops_impl.inplace import permute_inplace, _transpose_steps
+
+
+@pytest.mark.parametrize("shape,perm", [
+    ((6, 4), (1, 0)),
+    ((7, 7), (1, 0)),
+    ((2, 3, 4, 5), (0, 2, 1, 3)),
+    ((3, 4, 5), (2, 0, 1)),
+    ((2, 3, 2, 3), (3, 1, 0, 2)),
+    ((5,), (0,)),
+])
+def test_permute_inplace_matches_transpose(shape, perm):
+    x = np.random.rand(*shape)
+    buffer = x.copy()
+    result = permute_inplace(buffer, shape, perm)
+    assert np.array_equal(result, np.transpose(x, perm))
+    assert np.shares_memory(result, buffer)
+
+@pytest.mark.parametrize("shape,perm", [((37, 53), (1, 0)), ((40, 40, 3), (1, 0, 2))])
+def test_permute_inplace_small_batches(shape, perm):
+    # Scratch budgets smaller than one row exercise the batching of rows, columns and tiles
+    x = np.arange(np.prod(shape), dtype=np.int32).reshape(shape)
+    buffer = x.copy()
+    result = permute_inplace(buffer, shape, perm, batch_bytes=64)
+    assert np.array_equal(result, np.transpose(x, perm))
+
+@pytest.mark.parametrize("shape,perm", [
+    ((1000, 600), (1, 0)),
+    ((8, 224, 224, 3), (0, 3, 1, 2)),
+    ((96, 70, 50), (2, 0, 1)),
+])
+def test_permute_inplace_realistic_sizes(shape, perm):
+    # Non-square transposes have a few very long cycles; timings are in benchmarks/bench_inplace.py
+    x = np.random.rand(*shape).astype(np.float32)
+    expected = np.transpose(x, perm).copy()
+    buffer = x.copy()
+    tracemalloc.start()
+    try:
+        result = permute_inplace(buffer, shape, perm)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert np.array_equal(result, expected)
+    assert peak < x.nbytes / 2
+
+def test_transpose_steps():
+    assert _transpose_steps((2, 3, 4, 5), (0, 1, 2, 3)) == []
+    assert _transpose_steps((2, 3, 4, 5), (2, 3, 0, 1)) == [(1, 6, 20, 1)]
+    assert _transpose_steps((2, 3, 4, 5), (0, 3, 1, 2)) == [(2, 12, 5, 1)]
+
+def test_rearrange_inplace():
+    x = np.random.rand(2, 6, 4, 3)
+    expected = rearrange(x, 'b (h p) w c -> b w h (p c)', p=2)
+    buffer = x.copy()
+    result = rearrange(buffer, 'b (h p) w c -> b w h (p c)', p=2, inplace=True)
+    assert np.array_equal(result, expected)
+    assert result.flags.c_contiguous and np.shares_memory(result, buffer)
+
+def test_rearrange_inplace_reshape_only():
+    x = np.random.rand(4, 6)
+    result = rearrange(x, 'a (b c) -> (a b) c', c=3, inplace=True)
+    assert result.base is x or result.base is x.base
+
+def test_rearrange_inplace_errors():
+    x = np.random.rand(4, 6)
+    with pytest.raises(ValueError, match="writable C-contiguous"):
+        rearrange(x.T, 'a b -> b a', inplace=True)
+    x.flags.writeable = False
+    with pytest.raises(ValueError, match="writable C-contiguous"):
+        rearrange(x, 'a b -> b a', inplace=True)
+    with pytest.raises(ValueError, match="cannot be combined"):
+        rearrange(np.random.rand(4, 6), 'a b -> b a', inplace=True, copy=True)
+    with pytest.raises(ValueError, match="expands axes"):
+        rearrange(np.random.rand(2, 1, 3), 'a 1 c -> a b c', b=4, inplace=True)
@@ -0,0 +1,96 @@
+import numpy as np
+from einops_impl import instrumentation
+from einops_impl.cache import plan_cache, symbolic_cache
+from einops_impl.instrumentation import instrument
+from einops_impl.lazy import lazy
+from einops_impl.rearrange import rearrange, rearrange_many
+from einops_impl.recipe import compile_rearrange
+from einops_impl.stream import rearrange_stream
+
+
+def test_instrument_collects_stages_and_copies():
+    plan_cache.clear()
+    symbolic_cache.clear()
+    x = np.random.rand(2, 4, 4, 3)
+    with instrument() as stats:
+        for _ in range(3):
+            rearrange(x, 'b h w c -> b c h w')
+        rearrange(x, 'b h w c -> b (c h w)')
+    snapshot = stats.snapshot()
+    assert snapshot['patterns'] == {'b h w c -> b c h w': 3, 'b h w c -> b (c h w)': 1}
+    assert snapshot['views'] == 3 and snapshot['copies'] == 1
+    assert snapshot['bytes_copied'] == x.nbytes and snapshot['bytes_viewed'] == 3 * x.nbytes
+    assert snapshot['caches']['plan'] == {'hits': 2, 'misses': 2, 'hit_rate': 0.5}
+    assert snapshot['stages']['parse']['calls'] == 2
+    assert snapshot['stages']['total']['calls'] == 4
+    assert {'analyze', 'views', 'copy'} <= set(snapshot['stages'])
+
+def test_instrument_is_scoped():
+    x = np.random.rand(2, 3)
+    with instrument() as stats:
+        rearrange(x, 'a b -> b a')
+    rearrange(x, 'a b -> b a')
+    assert stats.snapshot()['patterns'] == {'a b -> b a': 1}
+    assert stats.snapshot()['caches']['plan']['hits'] + stats.snapshot()['caches']['plan']['misses'] == 1
+    assert instrumentation.collector is None
+    assert instrumentation.get_stats() is None
+
+def test_enable_disable_and_reset():
+    x = np.random.rand(2, 3)
+    stats = instrumentation.enable()
+    try:
+        rearrange(x, 'a b -> b a')
+        assert instrumentation.get_stats()['patterns'] == {'a b -> b a': 1}
+        instrumentation.reset_stats()
+        assert instrumentation.get_stats()['patterns'] == {}
+        assert instrumentation.get_stats()['caches']['plan']['hit_rate'] is None
+    finally:
+        instrumentation.disable()
+    rearrange(x, 'a b -> b a')
+    assert stats.snapshot()['patterns'] == {}
+
+def test_every_entry_point_counts_results():
+    x = np.random.rand(2, 4, 6)
+    recipe = compile_rearrange('a b c -> c a b')
+    generated = compile_rearrange('a b c -> (c a) b', backend='codegen')
+    generated(x)
+    with instrument() as stats:
+        recipe(x)
+        generated(x)
+        rearrange([x, x], 'n a b c -> a (n b) c')
+        rearrange_many(x, ['a b c -> a (b c)', 'a b c -> c (a b)'])
+        list(rearrange_stream([x[:1], x[1:]], 'a b c -> a c b'))
+        lazy(x).rearrange('a b c -> a c b').rearrange('a c b -> c (a b)').evaluate()
+    snapshot = stats.snapshot()
+    assert snapshot['patterns'] == {
+        'a b c -> c a b': 1,
+        'a b c -> (c a) b': 1,
+        'n a b c -> a (n b) c': 1,
+        'a b c -> a (b c)': 1,
+        'a b c -> c (a b)': 1,
+        'a b c -> a c b': 2,
+        'a b c -> a c b | a c b -> c (a b)': 1,
+    }
+    # Only the generated '(c a) b' and the stacked list are copies
+    assert snapshot['views'] == 6 and snapshot['copies'] == 2
+    assert snapshot['bytes_copied'] == x.nbytes + 2 * x.nbytes
+    assert snapshot['stages']['total']['calls'] == 7
+    # The stream's recipe finds the plan of its first batch for the second one
+    assert snapshot['caches']['recipe'] == {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3}
+    assert snapshot['caches']['recipe_symbolic']['misses'] == 2
+
+def test_inplace_counts_as_copy():
+    x = np.random.rand(4, 6)
+    with instrument() as stats:
+        rearrange(x, 'a b -> b a', inplace=True)
+    snapshot = stats.snapshot()
+    assert snapshot['copies'] == 1 and snapshot['views'] == 0
+    assert snapshot['bytes_copied'] == x.nbytes
+
+def test_recipe_caches_are_reported():
+    recipe = compile_rearrange('a b -> b a')
+    with instrument() as stats:
+        for shape in [(2, 3), (2, 3), (4, 5)]:
+            recipe(np.zeros(shape))
+    assert stats.snapshot()['caches']['recipe'] == {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3}
+    assert stats.snapshot()['caches']['recipe_symbolic'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
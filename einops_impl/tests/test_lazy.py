@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+from einops_impl.rearrange import rearrange
+from einops_impl.lazy import lazy, _refine
+
+
+def test_refine():
+    assert _refine([2, 6], [4, 3]) == ([[2], [2, 3]], [[2, 2], [3]])
+    assert _refine([6, 4], [4, 6]) is None
+    assert _refine([], []) == ([], [])
+
+def test_lazy_chain_matches_eager():
+    x = np.random.rand(2, 8, 8, 3)
+    steps = [('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', {'p1': 2, 'p2': 2}),
+             ('b n (k d) -> b k n d', {'k': 4}),
+             ('b k n d -> (b n) (k d)', {})]
+    expected = x
+    chain = lazy(x)
+    for pattern, axis_lengths in steps:
+        expected = rearrange(expected, pattern, **axis_lengths)
+        chain = chain.rearrange(pattern, **axis_lengths)
+    assert chain.shape == expected.shape
+    # Composed into a single plan on x
+    assert chain.base is x
+    np.testing.assert_array_equal(chain.evaluate(), expected)
+    np.testing.assert_array_equal(np.asarray(chain), expected)
+
+def test_identity_chain_does_no_work():
+    x = np.random.rand(2, 3, 4)
+    y = lazy(x).rearrange('a b c -> c (a b)').rearrange('c (a b) -> a b c', a=2)
+    assert y.is_identity()
+    assert y.evaluate() is x
+    copied = y.evaluate(copy=True)
+    assert copied is not x and np.array_equal(copied, x)
+
+def test_lazy_fallbacks():
+    """Expansions and incompatible splits start a new segment, still run only in evaluate()"""
+    x = np.random.rand(6, 4)
+    # (b a) = (4 6) cannot be split as (3 8) without first merging the factors
+    y = lazy(x).rearrange('a b -> (b a)').rearrange('(p q) -> p q', p=3)
+    assert y.base is x and len(y.pending) == 2
+    # Nothing was computed yet, so later writes to x are seen
+    x[0, 0] = -1.0
+    np.testing.assert_array_equal(y.evaluate(), x.T.reshape(3, 8))
+    with pytest.raises(ValueError):
+        y.evaluate(copy=False)
+
+    z = lazy(np.random.rand(3, 1)).rearrange('a 1 -> a b', b=4).rearrange('a b -> b a')
+    assert z.shape == (4, 3)
+    assert z.evaluate().shape == (4, 3)
+
+def test_lazy_options_and_errors():
+    x = np.random.rand(4, 5)
+    out = np.empty((5, 4))
+    lazy(x).rearrange('a b -> b a').evaluate(out=out)
+    np.testing.assert_array_equal(out, x.T)
+    with pytest.raises(ValueError):
+        lazy(x).rearrange('a b -> (b a)').evaluate(copy=False)
+    with pytest.raises(ValueError):
+        lazy(x).rearrange('a b c -> a b c')
+    with pytest.raises(ValueError):
+        lazy([1, 2])
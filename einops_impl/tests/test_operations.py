@@ -0,0 +1,50 @@
+import numpy as np
+from einops_impl import operations
+from einops_impl.operations import Operations
+from einops_impl.rearrange import rearrange
+
+
+def test_tiled_copyto_matches_copyto():
+    """Test tiles with ragged edges on 2-D and batched transposes"""
+    for shape, perm in [((37, 53), (1, 0)), ((3, 20, 30, 7), (0, 3, 1, 2)), ((5, 9, 11), (2, 1, 0))]:
+        x = np.random.rand(*shape)
+        src = np.transpose(x, perm)
+        dst = np.empty(src.shape)
+        Operations.tiled_copyto(dst, src, tile=8)
+        np.testing.assert_array_equal(dst, src)
+
+def test_should_tile():
+    x = np.zeros((1024, 1024), dtype=np.float32)
+    assert Operations.should_tile(np.empty((1024, 1024), dtype=np.float32), x.T)
+    # Innermost axis stays in place
+    assert not Operations.should_tile(np.empty((1024, 1024), dtype=np.float32), x)
+    # Too small, or one swapped axis is short
+    assert not Operations.should_tile(np.empty((64, 64)), np.zeros((64, 64)).T)
+    y = np.zeros((200000, 3))
+    assert not Operations.should_tile(np.empty((3, 200000)), y.T)
+
+def test_rearrange_selects_tiled_kernel(monkeypatch):
+    monkeypatch.setattr(operations, 'TILED_THRESHOLD_BYTES', 0)
+    monkeypatch.setattr(operations, 'MIN_TILED_AXIS', 4)
+    calls = []
+    kernel = Operations.tiled_copyto
+    monkeypatch.setattr(Operations, 'tiled_copyto', staticmethod(lambda dst, src: calls.append(1) or kernel(dst, src, 4)))
+    monkeypatch.setattr('einops_impl.plan.TILED_THRESHOLD_BYTES', 0)
+
+    x = np.random.rand(2, 10, 12, 9)
+    result = rearrange(x, 'b h w c -> (b c) (h w)')
+    assert calls
+    np.testing.assert_array_equal(result, np.transpose(x, (0, 3, 1, 2)).reshape(18, 120))
+
+def test_chunk_indices_cover_in_memory_order():
+    """Test that chunks are bounded, disjoint and follow the input's memory layout"""
+    for x in [np.zeros((3, 5, 7)), np.zeros((3, 5, 7)).transpose(2, 0, 1), np.zeros((2, 3))]:
+        seen = np.zeros(x.shape, dtype=int)
+        for index in Operations.chunk_indices(x, 40):
+            assert x[index].nbytes <= 40
+            seen[index] += 1
+        assert (seen == 1).all()
+
+    # For a transposed view the blocks are cut along its largest-stride axis
+    y = np.zeros((4, 6)).T
+    assert list(Operations.chunk_indices(y, 96)) == [(slice(None), slice(0, 2)), (slice(None), slice(2, 4))]
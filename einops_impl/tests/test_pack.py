@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+from einops_impl.pack import pack, unpack, parse_pack_pattern
+
+
+def test_parse_pack_pattern():
+    assert parse_pack_pattern('b * c') == (['b', '...', 'c'], 1, 1)
+    assert parse_pack_pattern('*') == (['...'], 0, 0)
+    for pattern in ['b c', 'b * c *', 'b (h w) *', 'b b *', 'b ... *']:
+        with pytest.raises(ValueError):
+            parse_pack_pattern(pattern)
+
+def test_pack_unpack_roundtrip():
+    cls = np.random.rand(2, 8)
+    tokens = np.random.rand(2, 4, 4, 8)
+    extra = np.random.rand(2, 3, 8).astype(np.float32)
+    packed, shapes = pack([cls, tokens, extra], 'b * c')
+    assert packed.shape == (2, 20, 8) and packed.dtype == np.float64
+    assert shapes == [(), (4, 4), (3,)]
+    np.testing.assert_array_equal(packed[:, 1:17], tokens.reshape(2, 16, 8))
+
+    parts = unpack(packed, shapes, 'b * c')
+    for part, original in zip(parts, [cls, tokens, extra]):
+        np.testing.assert_array_equal(part, original)
+        assert np.shares_memory(part, packed)
+
+def test_pack_trailing_star():
+    packed, shapes = pack([np.zeros((3, 2)), np.ones(3)], 'h *')
+    assert packed.shape == (3, 3) and shapes == [(2,), ()]
+    np.testing.assert_array_equal(packed[:, 2], 1)
+
+def test_unpack_infers_minus_one():
+    packed = np.arange(24.0).reshape(2, 12)
+    parts = unpack(packed, [(2, -1), (4,)], 'b *')
+    assert [part.shape for part in parts] == [(2, 2, 4), (2, 4)]
+
+def test_pack_unpack_errors():
+    with pytest.raises(ValueError, match="does not match"):
+        pack([np.zeros((2, 3, 4)), np.zeros((3, 3, 4))], 'b * c')
+    with pytest.raises(ValueError, match="fewer dimensions"):
+        pack([np.zeros(3)], 'b * c')
+    with pytest.raises(ValueError, match="empty list"):
+        pack([], 'b * c')
+    packed = np.zeros((2, 10, 3))
+    with pytest.raises(ValueError, match="length 10"):
+        unpack(packed, [(4,), (5,)], 'b * c')
+    with pytest.raises(ValueError, match="Only one -1"):
+        unpack(packed, [(-1,), (-1,)], 'b * c')
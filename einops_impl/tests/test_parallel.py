@@ -0,0 +1,54 @@
+import pytest
+import numpy as np
+from einops_impl import parallel
+from einops_impl.parallel import partition, set_num_threads, get_num_threads
+from einops_impl.rearrange import rearrange
+
+
+@pytest.fixture
+def small_threshold(monkeypatch):
+    """Make tiny arrays take the threaded path"""
+    monkeypatch.setattr(parallel, 'PARALLEL_THRESHOLD_BYTES', 0)
+    monkeypatch.setattr(parallel, 'MIN_BYTES_PER_THREAD', 1)
+
+
+def test_partition_covers_every_element():
+    for shape, parts in [((2, 10, 5), 4), ((100, 3), 8), ((1, 1, 7), 3), ((2,), 16)]:
+        seen = np.zeros(shape, dtype=int)
+        for index in partition(shape, parts):
+            seen[index] += 1
+        assert (seen == 1).all(), (shape, parts)
+
+def test_threaded_rearrange_matches_serial(small_threshold):
+    x = np.random.rand(6, 8, 10, 3)
+    pattern = 'b (h p1) (w p2) c -> b h w (p1 p2 c)'
+    expected = rearrange(x, pattern, p1=2, p2=5)
+    np.testing.assert_array_equal(rearrange(x, pattern, p1=2, p2=5, threads=4), expected)
+
+    result = rearrange(x, 'b h w c -> b c h w', threads=4, copy=True)
+    assert result.flags.c_contiguous
+    np.testing.assert_array_equal(result, np.transpose(x, (0, 3, 1, 2)))
+
+    out = np.empty((6, 4, 2, 30))
+    rearrange(x, pattern, p1=2, p2=5, threads=3, out=out)
+    np.testing.assert_array_equal(out, expected)
+
+def test_threaded_views_stay_views(small_threshold):
+    x = np.random.rand(6, 8)
+    assert np.shares_memory(rearrange(x, 'h w -> w h', threads=4), x)
+    materialized = rearrange(x, 'h w -> w h', threads=4, materialize=True)
+    assert materialized.flags.c_contiguous and not np.shares_memory(materialized, x)
+
+def test_global_thread_setting(small_threshold):
+    previous = get_num_threads()
+    try:
+        set_num_threads(4)
+        x = np.random.rand(5, 7, 3)
+        np.testing.assert_array_equal(rearrange(x, 'a b c -> (c a) b'),
+                                      np.transpose(x, (2, 0, 1)).reshape(15, 7))
+    finally:
+        set_num_threads(previous)
+    with pytest.raises(ValueError):
+        set_num_threads(0)
+    with pytest.raises(ValueError):
+        rearrange(np.zeros((2, 3)), 'a b -> b a', threads=-1)
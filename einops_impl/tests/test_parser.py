@@ -86,3 +86,52 @@ def test_complex_patterns():
         input_axes, output_axes = parser.parse()
         assert isinstance(input_axes, list)
         assert isinstance(output_axes, list)
+
+def test_compact_ast():
+    parser = Parser('b ((h w) d) ... -> (b ...) h w d')
+    parser.parse()
+    assert parser.axes_names == {'b', 'h', 'w', 'd'}
+    group = parser.input_tree[1]
+    assert group.name == 'group_1'
+    assert [child.name for child in group.children] == ['group_0', 'd']
+    assert [node.name for node in group.children[0].children] == ['h', 'w']
+    # Top-level groups come pre-flattened
+    assert parser.group_leaves == {'group_1': ['h', 'w', 'd'], 'group_2': ['b', '...']}
+
+def test_deep_nesting():
+    depth = 500
+    pattern = 'a0'
+    for i in range(1, depth + 1):
+        pattern = f'({pattern} a{i})'
+    parser = Parser(f"{pattern} -> {' '.join(f'a{i}' for i in range(depth + 1))}")
+    input_axes, output_axes = parser.parse()
+    assert input_axes == [f'group_{depth - 1}']
+    assert parser.group_leaves[input_axes[0]] == output_axes
+
+def test_invalid_characters():
+    for pattern in ['h-w -> h', '_a -> _a', 'h. w -> h']:
+        with pytest.raises(ValueError, match="Invalid character"):
+            Parser(pattern).parse()
+
+def test_with_output_reuses_input_side():
+    base = Parser('b (h w) c ->')
+    base.parse()
+    parser = base.with_output(' b (c h) w')
+    assert parser.input_tree is base.input_tree
+    assert [node.name for node in parser.output_tree] == ['b', 'group_1', 'w']
+    assert parser.group_leaves == {'group_0': ['h', 'w'], 'group_1': ['c', 'h']}
+    # The base keeps its own state, so it can be forked again
+    assert base.group_leaves == {'group_0': ['h', 'w']}
+    with pytest.raises(ValueError, match="multiple arrows"):
+        base.with_output('b -> c')
+
+def test_windowed_groups():
+    parser = Parser('b {oh kh} {ow kw} -> b (oh ow) (kh kw)')
+    assert parser.parse(allow_windows=True)[0] == ['b', 'window_0', 'window_1']
+    assert parser.windows == {'window_0': ['oh', 'kh'], 'window_1': ['ow', 'kw']}
+    assert 'window_0' not in parser.group_leaves
+    for pattern in ['b {oh} -> b', 'b ({a b}) -> b', 'b {a ...} -> b', 'b {a b -> b', 'a -> {a b}']:
+        with pytest.raises(ValueError):
+            Parser(pattern).parse(allow_windows=True)
+    with pytest.raises(ValueError, match="only supported on the input side of unfold"):
+        Parser('b {a b} -> b a').parse()
@@ -0,0 +1,101 @@
+import pytest
+import numpy as np
+from einops_impl.cache import symbolic_cache
+from einops_impl.plan import (build_rearrange_plan, build_symbolic_plan, coalesce_axes, get_rearrange_plan,
+                              get_symbolic_plan, match_axes, parse_rearrange_pattern)
+from einops_impl.rearrange import rearrange
+from einops_impl.shape_analzer import ShapeAnalyzer
+
+
+def test_coalesce_co_moving_axes():
+    """Test that axes staying adjacent through the permutation are merged"""
+    plan = build_rearrange_plan('b (h p1) (w p2) c -> b h w (p1 p2 c)', (8, 16, 16, 3), {'p1': 4, 'p2': 4})
+    assert plan.init_shape == (8, 4, 4, 4, 4, 3)
+    assert plan.coalesced_shape == (32, 4, 4, 12)
+    assert plan.coalesced_perm == (0, 2, 1, 3)
+
+def test_coalesce_drops_size_one_axes():
+    assert coalesce_axes((5, 1, 6), (), (2, 0, 1)) == ((5, 6), (), (1, 0))
+    assert coalesce_axes((1, 1), (), (1, 0)) == ((), (), ())
+
+def test_coalesce_keeps_expansions_separate():
+    """Test that broadcast axes are not merged with real ones"""
+    assert coalesce_axes((2, 1, 3), ((1, 4),), (0, 1, 2)) == ((2, 1, 3), ((1, 4),), (0, 1, 2))
+    assert coalesce_axes((2, 1, 1), ((1, 4), (2, 5)), (0, 1, 2)) == ((2, 1), ((1, 20),), (0, 1))
+
+def test_regrouping_is_a_single_reshape():
+    plan = build_rearrange_plan('b h w c -> b (h w) c', (2, 3, 4, 5), {})
+    assert plan.reshape_only
+    assert not build_rearrange_plan('b h w c -> b c h w', (2, 3, 4, 5), {}).reshape_only
+
+def test_strided_input_keeps_axes_split():
+    """Test that non-contiguous inputs give the same result and stay views where possible"""
+    x = np.random.rand(4, 6, 8)[:, ::2, :]
+    result = rearrange(x, 'a b c -> c a b')
+    np.testing.assert_array_equal(result, np.transpose(x, (2, 0, 1)))
+    assert np.shares_memory(result, x)
+
+def test_symbolic_plan_specializes_across_shapes():
+    """Test that one symbolic plan serves every batch and ellipsis size"""
+    symbolic_cache.clear()
+    pattern = '... (h p) c -> ... c h p'
+    for shape in [(8, 12, 3), (5, 12, 3), (2, 3, 20, 3)]:
+        plan = get_rearrange_plan(pattern, shape, {'p': 4})
+        expected = build_rearrange_plan(pattern, shape, {'p': 4})
+        assert (plan.init_shape, plan.perm, plan.final_shape) == \
+            (expected.init_shape, expected.perm, expected.final_shape)
+    # Ranks 3 and 4: one symbolic plan each
+    assert symbolic_cache.info().misses == 2
+
+    symbolic = get_symbolic_plan('b (h w) c -> b c h w', 3, {'h': 4})
+    assert symbolic.specialize((8, 64, 3)).final_shape == (8, 3, 4, 16)
+    assert symbolic.specialize((2, 32, 3)).final_shape == (2, 3, 4, 8)
+    with pytest.raises(ValueError, match="evenly divide"):
+        symbolic.specialize((2, 30, 3))
+
+def test_symbolic_plan_checks_known_lengths():
+    with pytest.raises(ValueError, match="expected 3"):
+        rearrange(np.zeros((4, 5)), 'a b -> b a', a=3)
+    with pytest.raises(ValueError):
+        rearrange(np.zeros((4, 5)), '(a b) c -> a b c', a=2, b=3)
+
+@pytest.mark.parametrize("pattern,shape,axis_lengths,message", [
+    ('a b -> a c', (2, 3), {}, "Invalid axis"),
+    ('a b -> (a b) b', (2, 3), {}, "Inconsistent number"),
+    ('a 1 -> a k', (2, 1), {}, "Missing size for expansion"),
+    ('a 1 -> a k', (2, 1), {'k': 0}, "must be positive"),
+])
+def test_planners_validate_patterns_alike(pattern, shape, axis_lengths, message):
+    """The concrete and the symbolic planner share match_axes, so they reject the same patterns"""
+    with pytest.raises(ValueError, match=message):
+        build_rearrange_plan(pattern, shape, axis_lengths)
+    with pytest.raises(ValueError, match=message):
+        build_symbolic_plan(pattern, *parse_rearrange_pattern(pattern), len(shape), axis_lengths)
+
+def test_match_axes():
+    assert match_axes(['b', '1', 'c'], ['c', 'k', 'b'], {'k': 4}) == ([(1, 4)], [2, 1, 0])
+
+def test_concrete_plan_checks_known_lengths():
+    """The per-shape analysis rejects a conflicting axis length like the symbolic one"""
+    with pytest.raises(ValueError, match="Axis 'a' has size 4, expected 3"):
+        build_rearrange_plan('a b -> b a', (4, 5), {'a': 3})
+    with pytest.raises(ValueError, match="expected 3"):
+        ShapeAnalyzer.get_axis_size_from_shape((4, 5), ['a', 'b'], {}, {'a': 3})
+    # Repeated input axes are only analyzed per shape
+    with pytest.raises(ValueError, match="expected 2"):
+        build_rearrange_plan('a b a -> a b', (2, 3, 4), {})
+
+def test_result_strides():
+    """Plans report the strides of the view or copy for each order"""
+    plan = build_rearrange_plan('h w -> w h', (3, 4), {})
+    assert plan.result_strides(itemsize=8) == (8, 32)
+    assert plan.result_strides(itemsize=8, order='C') == (24, 8)
+    assert plan.result_strides(itemsize=8, order='F') == (8, 32)
+    assert plan.is_view(order='any') and not plan.is_view(order='C')
+
+    x = np.asfortranarray(np.random.rand(2, 3, 4, 5))
+    plan = build_rearrange_plan('b h w c -> b c (h w)', x.shape, {})
+    assert plan.memory_order('K', x.strides) == (1, 2, 0)
+    for order in ('C', 'F', 'K', 'any'):
+        assert plan.result_strides(x.strides, x.itemsize, order) == rearrange(
+            x, 'b h w c -> b c (h w)', order=order).strides
@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from einops_impl.rearrange import rearrange
+from einops_impl.rearrange import rearrange, rearrange_many
 
 def assert_shapes_equal(actual, expected):
     assert actual == expected, f"Shape mismatch. Expected {expected}, got {actual}"
@@ -164,4 +164,225 @@ def test_multi_level_nesting():
     # Nested pattern with ellipsis
     x = np.random.rand(2, 3, 24, 5)
     result = rearrange(x, '... ((a b) c) d -> ... a b (c d)', a=2, b=3, c=4)
-    assert_shapes_equal(result.shape, (2, 3, 2, 3, 20))
\ No newline at end of file
+    assert_shapes_equal(result.shape, (2, 3, 2, 3, 20))
+
+
+def test_expansion_is_broadcast_view():
+    """Test that '1' axis expansion does not copy unless the reshape forces it"""
+    x = np.random.rand(2, 1, 3)
+    result = rearrange(x, 'a 1 c -> a b c', b=1000)
+    assert_shapes_equal(result.shape, (2, 1000, 3))
+    assert np.shares_memory(result, x)
+    assert result.strides[1] == 0
+    assert not result.flags.writeable
+    np.testing.assert_array_equal(result, np.repeat(x, 1000, axis=1))
+
+    # Merging the expanded axis with a real one has to copy
+    merged = rearrange(x, 'a 1 c -> a (b c)', b=4)
+    np.testing.assert_array_equal(merged, np.repeat(x, 4, axis=1).reshape(2, 12))
+
+def test_materialize():
+    """Test that materialize=True always gives a writable contiguous result"""
+    x = np.random.rand(2, 1, 3)
+    result = rearrange(x, 'a 1 c -> a b c', b=4, materialize=True)
+    assert result.flags.writeable and result.flags.c_contiguous
+    assert not np.shares_memory(result, x)
+    np.testing.assert_array_equal(result, np.repeat(x, 4, axis=1))
+
+    # A result that already is writable and contiguous is returned as is
+    y = np.random.rand(4, 6)
+    assert np.shares_memory(rearrange(y, 'h (w c) -> h w c', c=2, materialize=True), y)
+
+    transposed = rearrange(y, 'h w -> w h', materialize=True)
+    assert transposed.flags.c_contiguous
+
+def test_copy_modes():
+    """Test copy=None|False|True"""
+    x = np.random.rand(2, 3, 4)
+
+    # A transpose can be a view, merging the transposed axes cannot
+    assert np.shares_memory(rearrange(x, 'a b c -> c a b', copy=False), x)
+    with pytest.raises(ValueError, match="requires a copy"):
+        rearrange(x, 'a b c -> (c a) b', copy=False)
+    assert not np.shares_memory(rearrange(x, 'a b c -> (c a) b'), x)
+
+    result = rearrange(x, 'a b c -> c a b', copy=True)
+    assert result.flags.c_contiguous and not np.shares_memory(result, x)
+    np.testing.assert_array_equal(result, np.transpose(x, (2, 0, 1)))
+
+    # Strided inputs are taken into account
+    strided = np.random.rand(4, 3, 4)[::2]
+    with pytest.raises(ValueError, match="requires a copy"):
+        rearrange(strided, 'a b c -> (a b) c', copy=False)
+
+def test_copy_false_with_materialize():
+    x = np.random.rand(2, 3, 4)
+    assert np.shares_memory(rearrange(x, 'a b c -> a (b c)', copy=False, materialize=True), x)
+    with pytest.raises(ValueError):
+        rearrange(x, 'a b c -> c a b', copy=False, materialize=True)
+
+def test_option_names_are_reserved():
+    """Axis lengths passed under an option's name are rejected instead of taken as the option"""
+    x = np.arange(6)
+    with pytest.raises(ValueError, match="Axis 'out'.*Rename the axis"):
+        rearrange(x, '(out c) -> out c', out=2)
+    with pytest.raises(ValueError, match="Axis 'copy'"):
+        rearrange(x, '(copy c) -> c copy', copy=True)
+    with pytest.raises(ValueError, match="Axis 'threads'"):
+        rearrange([x, x], 'b (threads c) -> b threads c', threads=2)
+    # Axes with these names still work when their length is inferred
+    np.testing.assert_array_equal(rearrange(x.reshape(2, 3), 'out c -> c out', copy=True), x.reshape(2, 3).T)
+
+def test_out_parameter():
+    """Test writing the result into a preallocated array"""
+    x = np.random.rand(8, 16, 16, 3)
+    buf = np.empty((8, 4, 4, 48))
+    result = rearrange(x, 'b (h p1) (w p2) c -> b h w (p1 p2 c)', p1=4, p2=4, out=buf)
+    assert result is buf
+    np.testing.assert_array_equal(buf, rearrange(x, 'b (h p1) (w p2) c -> b h w (p1 p2 c)', p1=4, p2=4))
+
+    # Expansion and dtype conversion go through the same copy
+    y = np.arange(6).reshape(2, 1, 3)
+    buf = np.empty((2, 4, 3), dtype=np.float32)
+    rearrange(y, 'a 1 c -> a b c', b=4, out=buf)
+    np.testing.assert_array_equal(buf, np.repeat(y, 4, axis=1))
+
+    # Any memory layout of out works
+    z = np.random.rand(2, 3, 4, 5)
+    buf = np.empty((10, 12), order='F')
+    rearrange(z, 'a b c d -> (d a) (b c)', out=buf)
+    np.testing.assert_array_equal(buf, rearrange(z, 'a b c d -> (d a) (b c)'))
+
+def test_out_validation():
+    x = np.random.rand(2, 3, 4)
+    with pytest.raises(ValueError, match="expected"):
+        rearrange(x, 'a b c -> c (a b)', out=np.empty((4, 5)))
+    with pytest.raises(ValueError):
+        rearrange(x, 'a b c -> c (a b)', out=np.empty((4, 6)), copy=False)
+
+def test_memmap_out_of_core(tmp_path):
+    """Test chunked rearrange between memory-mapped files"""
+    source = np.memmap(tmp_path / 'in.dat', dtype=np.float32, mode='w+', shape=(6, 8, 10, 3))
+    source[:] = np.random.rand(6, 8, 10, 3)
+    target = np.memmap(tmp_path / 'out.dat', dtype=np.float32, mode='w+', shape=(6, 3, 80))
+
+    result = rearrange(source, 'b h w c -> b c (h w)', out=target, chunk_bytes=256)
+    assert result is target
+    np.testing.assert_array_equal(np.asarray(target), rearrange(np.asarray(source), 'b h w c -> b c (h w)'))
+
+    reopened = np.memmap(tmp_path / 'out.dat', dtype=np.float32, mode='r', shape=(6, 3, 80))
+    np.testing.assert_array_equal(reopened, target)
+
+def test_chunk_bytes_needs_out():
+    with pytest.raises(ValueError, match="out="):
+        rearrange(np.zeros((2, 3)), 'a b -> b a', chunk_bytes=16)
+
+def test_rearrange_many():
+    x = np.random.rand(2, 4, 6, 3)
+    patterns = ['b h (w p) c -> b c h w p', 'b h (w p) c -> b (h w) p c', 'b h (w p) c  -> (b h w p) c']
+    results = rearrange_many(x, patterns, p=2)
+    for pattern, result in zip(patterns, results):
+        np.testing.assert_array_equal(result, rearrange(x, pattern, p=2))
+    # Views stay views
+    assert np.shares_memory(results[1], x) and np.shares_memory(results[2], x)
+
+@pytest.mark.parametrize("options", [{'copy': True}, {'materialize': True}])
+def test_rearrange_many_single_pass(options):
+    # Tiny chunks force the shared pass to walk the input block by block
+    x = np.random.rand(3, 5, 7, 2)
+    patterns = ['a b c d -> d c b a', 'a b c d -> b (a c) d', 'a b c d -> (c a) (d b)']
+    results = rearrange_many(x, patterns, chunk_bytes=64, **options)
+    for pattern, result in zip(patterns, results):
+        np.testing.assert_array_equal(result, rearrange(x, pattern))
+        assert result.flags.c_contiguous and result.flags.writeable
+    if options.get('copy'):
+        assert not any(np.shares_memory(result, x) for result in results)
+
+def test_rearrange_many_errors():
+    x = np.random.rand(2, 3)
+    with pytest.raises(ValueError, match="share their input side"):
+        rearrange_many(x, ['a b -> b a', 'b a -> a b'])
+    with pytest.raises(ValueError, match="sequence of patterns"):
+        rearrange_many(x, 'a b -> b a')
+    with pytest.raises(ValueError, match="requires a copy"):
+        rearrange_many(x, ['a b -> b a', 'a b -> (b a)'], copy=False)
+
+@pytest.mark.parametrize("pattern,axis_lengths", [
+    ('b h w c -> b c h w', {}),
+    ('(b1 b2) h w c -> b2 (h w) (b1 c)', {'b1': 2}),
+    ('b ... c -> c b ...', {}),
+])
+def test_list_input(pattern, axis_lengths):
+    elements = [np.random.rand(4, 5, 3) for _ in range(6)]
+    expected = rearrange(np.stack(elements), pattern, **axis_lengths)
+    for threads in (1, 3):
+        result = rearrange(elements, pattern, threads=threads, **axis_lengths)
+        np.testing.assert_array_equal(result, expected)
+        assert result.flags.c_contiguous
+    out = np.empty_like(expected)
+    assert rearrange(tuple(elements), pattern, out=out, **axis_lengths) is out
+    np.testing.assert_array_equal(out, expected)
+
+def test_list_input_errors():
+    with pytest.raises(ValueError, match="empty list"):
+        rearrange([], 'b h -> h b')
+    with pytest.raises(ValueError, match="same shape and dtype"):
+        rearrange([np.zeros((2, 3)), np.zeros((3, 2))], 'b h w -> b w h')
+    with pytest.raises(ValueError, match="same shape and dtype"):
+        rearrange([np.zeros(3), np.zeros(3, dtype=np.int32)], 'b h -> h b')
+    with pytest.raises(ValueError, match="index 1"):
+        rearrange([np.zeros(3), [0, 0, 0]], 'b h -> h b')
+    with pytest.raises(ValueError, match="always copied"):
+        rearrange([np.zeros(3)], 'b h -> h b', copy=False)
+
+def test_list_input_options_match_arrays():
+    """Lists honour materialize and reject the same option combinations as arrays"""
+    elements = [np.random.rand(3, 4) for _ in range(2)]
+    result = rearrange(elements, 'b h w -> w (b h)', materialize=True)
+    assert result.flags.c_contiguous and result.flags.writeable
+    np.testing.assert_array_equal(result, rearrange(np.stack(elements), 'b h w -> w (b h)'))
+    for options in ({'order': 'F', 'materialize': True}, {'order': 'A'},
+                    {'order': 'C', 'out': np.empty((4, 6))}):
+        with pytest.raises(ValueError, match="order"):
+            rearrange(np.stack(elements), 'b h w -> w (b h)', **options)
+        with pytest.raises(ValueError, match="order"):
+            rearrange(elements, 'b h w -> w (b h)', **options)
+
+@pytest.mark.parametrize("order,flag", [('C', 'c_contiguous'), ('F', 'f_contiguous')])
+def test_order(order, flag):
+    x = np.random.rand(2, 3, 4, 5)
+    expected = rearrange(x, 'b h w c -> b c (h w)')
+    for tensor in (x, np.asfortranarray(x), x[:, ::-1]):
+        result = rearrange(tensor, 'b h w c -> b c (h w)', order=order)
+        np.testing.assert_array_equal(result, rearrange(tensor, 'b h w c -> b c (h w)'))
+        assert getattr(result.flags, flag)
+    assert getattr(rearrange(list(x), 'b h w c -> b c (h w)', order=order).flags, flag)
+    np.testing.assert_array_equal(rearrange(list(x), 'b h w c -> b c (h w)', order=order), expected)
+
+def test_order_any_and_k():
+    """'any' keeps a Fortran-contiguous transpose as a view; 'K' copies in the input's order"""
+    x = np.random.rand(6, 4)
+    result = rearrange(x, 'h w -> w h', order='any')
+    assert np.shares_memory(result, x) and result.flags.f_contiguous
+    assert not np.shares_memory(rearrange(x, 'h w -> w h', order='C'), x)
+
+    y = np.asfortranarray(np.random.rand(2, 3, 4, 5))
+    result = rearrange(y, 'b h w c -> b (h w) c', order='K')
+    np.testing.assert_array_equal(result, rearrange(y, 'b h w c -> b (h w) c'))
+    assert result.flags.f_contiguous
+    # Views are kept with 'K', whatever their strides
+    assert np.shares_memory(rearrange(x[::2], 'h w -> w h', order='K'), x)
+
+def test_order_errors():
+    x = np.zeros((2, 3))
+    with pytest.raises(ValueError, match="Unknown order"):
+        rearrange(x, 'a b -> b a', order='A')
+    with pytest.raises(ValueError, match="requires a copy"):
+        rearrange(x, 'a b -> b a', order='C', copy=False)
+    with pytest.raises(ValueError, match="out="):
+        rearrange(x, 'a b -> b a', order='F', out=np.empty((3, 2)))
+    with pytest.raises(ValueError, match="materialize"):
+        rearrange(x, 'a b -> b a', order='F', materialize=True)
+    # order= is an option, not the length of an axis named order
+    with pytest.raises(ValueError, match="Axis 'order'.*Rename the axis"):
+        rearrange(np.arange(6), '(order c) -> order c', order=2)
@@ -0,0 +1,67 @@
+import pickle
+import pytest
+import numpy as np
+from einops_impl.rearrange import rearrange
+from einops_impl.recipe import compile_rearrange
+
+
+def test_recipe_matches_rearrange():
+    """Test that a compiled recipe gives the same result as rearrange"""
+    recipe = compile_rearrange('b (h p1) (w p2) c -> b h w (p1 p2 c)', p1=4, p2=4)
+    for shape in [(8, 16, 16, 3), (2, 8, 4, 1)]:
+        x = np.random.rand(*shape)
+        np.testing.assert_array_equal(
+            recipe(x), rearrange(x, 'b (h p1) (w p2) c -> b h w (p1 p2 c)', p1=4, p2=4)
+        )
+
+def test_recipe_parses_once():
+    recipe = compile_rearrange('(h w) c -> h w c', h=5)
+    assert recipe.input_axes == ['group_0', 'c']
+    assert recipe.output_axes == ['h', 'w', 'c']
+    assert recipe.grouped_axes == {'group_0': ['h', 'w']}
+
+def test_output_shape_without_tensor():
+    recipe = compile_rearrange('... (h w) -> ... h w', w=4)
+    assert recipe.output_shape((2, 3, 12)) == (2, 3, 3, 4)
+    with pytest.raises(ValueError):
+        recipe.output_shape((2, 3, 10))
+
+def test_is_view():
+    """Test the view prediction against what NumPy actually does"""
+    cases = [
+        ('b h w c -> b (h w) c', (2, 3, 4, 5)),
+        ('b h w c -> b c h w', (2, 3, 4, 5)),
+        ('b h w c -> b (c h w)', (2, 3, 4, 5)),
+        ('b h w c -> (b h) w c', (2, 3, 4, 5)),
+        ('h w -> (w h)', (1, 7)),
+    ]
+    for pattern, shape in cases:
+        recipe = compile_rearrange(pattern)
+        x = np.random.rand(*shape)
+        assert recipe.is_view(shape) == np.shares_memory(recipe(x), x), pattern
+
+def test_recipe_is_picklable():
+    recipe = compile_rearrange('b (h p) c -> b h (p c)', p=2)
+    recipe(np.zeros((2, 4, 3)))
+    restored = pickle.loads(pickle.dumps(recipe))
+    x = np.random.rand(2, 6, 3)
+    np.testing.assert_array_equal(restored(x), recipe(x))
+    assert restored.axis_lengths == {'p': 2}
+
+def test_recipe_validation():
+    with pytest.raises(ValueError):
+        compile_rearrange('')
+    with pytest.raises(ValueError):
+        compile_rearrange('h w w h')
+    with pytest.raises(ValueError):
+        compile_rearrange('h w -> w h')([[1, 2]])
+
+def test_is_view_with_expansion():
+    recipe = compile_rearrange('a 1 c -> a b c', b=4)
+    assert recipe.is_view((2, 1, 3))
+    assert not compile_rearrange('a 1 c -> a (b c)', b=4).is_view((2, 1, 3))
+
+def test_is_view_with_strides():
+    recipe = compile_rearrange('a b c -> (a b) c')
+    assert recipe.is_view((2, 3, 4))
+    assert not recipe.is_view((2, 3, 4), strides=(192, 32, 8))
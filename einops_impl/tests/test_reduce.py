@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+from einops_impl.reduce import reduce, build_reduce_plan, coalesce_reduction
+
+
+def test_pooling_with_numeric_axes():
+    """Test 2x2 mean pooling written with anonymous axes"""
+    x = np.random.rand(2, 8, 6, 3)
+    result = reduce(x, 'b (h 2) (w 2) c -> b h w c', 'mean')
+    expected = x.reshape(2, 4, 2, 3, 2, 3).mean(axis=(2, 4))
+    np.testing.assert_allclose(result, expected)
+
+def test_reductions_and_reordering():
+    x = np.random.rand(2, 3, 4, 5)
+    for name, function in [('sum', np.sum), ('mean', np.mean), ('max', np.max),
+                           ('min', np.min), ('prod', np.prod)]:
+        np.testing.assert_allclose(reduce(x, 'b h w c -> c b', name), function(x, axis=(1, 2)).T)
+    np.testing.assert_allclose(reduce(x, 'b h w c -> b 1 1 c', 'sum'), x.sum(axis=(1, 2), keepdims=True))
+    np.testing.assert_allclose(reduce(x, 'b (h h2) w c -> (c b) h', 'max', h2=3),
+                               x.max(axis=(1, 2)).T.reshape(10, 1))
+
+def test_ufunc_and_callable_reductions():
+    x = np.random.rand(4, 6)
+    np.testing.assert_allclose(reduce(x, 'a b -> a', np.maximum), x.max(axis=1))
+    np.testing.assert_allclose(reduce(x, '... b -> b', lambda t, axes: np.median(t, axis=axes)),
+                               np.median(x, axis=0))
+    with pytest.raises(ValueError, match="returned shape"):
+        reduce(x, 'a b -> a', lambda t, axes: t)
+
+def test_reduce_strided_input():
+    x = np.random.rand(6, 8, 4)[:, ::2, :].transpose(2, 0, 1)
+    np.testing.assert_allclose(reduce(x, 'c a (b 2) -> c a', 'sum'), x.sum(axis=2))
+
+def test_reduce_plan():
+    plan = build_reduce_plan('b (h 2) (w 2) c -> b h w c', (8, 32, 32, 3), {})
+    assert plan.init_shape == (8, 16, 2, 16, 2, 3)
+    assert plan.reduced_axes == (2, 4)
+    assert plan.final_shape == (8, 16, 16, 3)
+    assert coalesce_reduction((8, 3, 32, 32), (2, 3), (0, 1)) == ((24, 1024), (1,), (0,))
+    assert coalesce_reduction((2, 3, 4), (1,), (1, 0)) == ((2, 3, 4), (1,), (1, 0))
+
+def test_reduce_errors():
+    x = np.zeros((4, 6))
+    with pytest.raises(ValueError, match="Unknown reduction"):
+        reduce(x, 'a b -> a', 'median')
+    with pytest.raises(ValueError):
+        reduce(x, 'a b -> a c', 'sum')
+    with pytest.raises(ValueError):
+        reduce(x, '(a 3) b -> a', 'sum')
+    with pytest.raises(ValueError):
+        reduce(x, 'a b -> a 2', 'sum')
+    with pytest.raises(ValueError):
+        reduce([1, 2], 'a -> ', 'sum')
+
+def test_reduce_conflicting_axis_length():
+    # Raised while planning, not as a reshape error from NumPy
+    with pytest.raises(ValueError, match="Axis 'a' has size 3, expected 5"):
+        reduce(np.zeros((3, 4)), 'a b -> a', 'sum', a=5)
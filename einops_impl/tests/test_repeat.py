@@ -0,0 +1,56 @@
+import pytest
+import numpy as np
+from einops_impl.repeat import repeat, build_repeat_plan
+
+
+def test_new_axis_is_broadcast_view():
+    x = np.random.rand(4, 5)
+    result = repeat(x, 'h w -> h w c', c=3)
+    assert result.shape == (4, 5, 3)
+    assert result.strides[-1] == 0 and np.shares_memory(result, x)
+    assert not result.flags.writeable
+    np.testing.assert_array_equal(result, np.repeat(x[:, :, None], 3, axis=2))
+
+    result = repeat(x, 'h w -> c w h', c=2)
+    assert np.shares_memory(result, x)
+    np.testing.assert_array_equal(result, np.stack([x.T, x.T]))
+
+def test_merged_new_axes_copy_once():
+    """Test upsampling with numeric axes, which has to materialize"""
+    x = np.random.rand(4, 5)
+    result = repeat(x, 'h w -> (h 2) (w 2)')
+    np.testing.assert_array_equal(result, np.repeat(np.repeat(x, 2, axis=0), 2, axis=1))
+    assert not np.shares_memory(result, x)
+    np.testing.assert_array_equal(repeat(x, 'h w -> (c h) w', c=3), np.tile(x, (3, 1)))
+
+def test_repeat_plan_predicts_views():
+    plan = build_repeat_plan('h w -> (h 2) w c', (4, 5), {'c': 3})
+    assert plan.view_shape == (4, 1, 5, 1)
+    assert plan.repeated_shape == (4, 2, 5, 3)
+    assert plan.final_shape == (8, 5, 3)
+    assert not plan.is_view()
+    assert build_repeat_plan('h w -> h w (c d)', (4, 5), {'c': 3, 'd': 2}).is_view()
+
+def test_repeat_options():
+    x = np.random.rand(3, 1)
+    result = repeat(x, 'h 1 -> h c', c=4, materialize=True)
+    assert result.flags.writeable and result.flags.c_contiguous
+    np.testing.assert_array_equal(result, np.broadcast_to(x, (3, 4)))
+    np.testing.assert_array_equal(repeat(np.arange(6).reshape(2, 3), '... w -> (r ...) w', r=2),
+                                  np.tile(np.arange(6).reshape(2, 3), (2, 1)))
+
+def test_repeat_errors():
+    x = np.zeros((4, 5))
+    with pytest.raises(ValueError, match="Missing size"):
+        repeat(x, 'h w -> h w c')
+    with pytest.raises(ValueError, match="missing from its output"):
+        repeat(x, 'h w -> h c', c=2)
+    with pytest.raises(ValueError):
+        repeat(x, 'h w -> h w c', c=0)
+    with pytest.raises(ValueError):
+        repeat(None, 'h -> h')
+
+def test_repeat_conflicting_axis_length():
+    # a=5 contradicts the input shape and must not be ignored
+    with pytest.raises(ValueError, match="Axis 'a' has size 3, expected 5"):
+        repeat(np.zeros((3, 4)), 'a b -> a b c', a=5, c=2)
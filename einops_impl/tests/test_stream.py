@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+from einops_impl.rearrange import rearrange
+from einops_impl.stream import rearrange_stream
+
+
+def test_stream_applies_pattern_per_batch():
+    """Test lazy per-batch rearrange, including a short final batch"""
+    batches = [np.random.rand(8, 4, 4, 3), np.random.rand(8, 4, 4, 3), np.random.rand(5, 4, 4, 3)]
+    stream = rearrange_stream(iter(batches), 'b h w c -> b c (h w)')
+    results = list(stream)
+    assert [r.shape for r in results] == [(8, 3, 16), (8, 3, 16), (5, 3, 16)]
+    for batch, result in zip(batches, results):
+        np.testing.assert_array_equal(result, rearrange(batch, 'b h w c -> b c (h w)'))
+
+def test_stream_is_lazy():
+    def batches():
+        yield np.zeros((2, 3))
+        raise RuntimeError("consumed too far")
+    stream = rearrange_stream(batches(), 'a b -> b a')
+    assert next(stream).shape == (3, 2)
+
+def test_stream_rechunks_leading_axis():
+    """Test '(n b) ... -> n b ...' across batch boundaries"""
+    data = np.arange(30 * 2).reshape(30, 2)
+    batches = [data[:7], data[7:9], data[9:22], data[22:]]
+    results = list(rearrange_stream(batches, '(n b) c -> n b c', b=5))
+    assert sum(r.shape[0] for r in results) == 6
+    np.testing.assert_array_equal(np.concatenate(results), rearrange(data, '(n b) c -> n b c', b=5))
+
+def test_stream_results_do_not_alias_carry_buffer():
+    batches = [np.full((3, 1), i) for i in range(4)]
+    results = list(rearrange_stream(batches, '(n b) c -> n (b c)', b=2))
+    np.testing.assert_array_equal(np.concatenate(results), [[0, 0], [0, 1], [1, 1], [2, 2], [2, 3], [3, 3]])
+
+def test_stream_remainder():
+    batches = [np.zeros((5, 2)), np.zeros((2, 2))]
+    with pytest.raises(ValueError, match="left over"):
+        list(rearrange_stream(batches, '(n b) c -> n b c', b=4))
+    results = list(rearrange_stream(batches, '(n b) c -> n b c', b=4, drop_remainder=True))
+    assert [r.shape for r in results] == [(1, 4, 2)]
+
+def test_stream_validation():
+    with pytest.raises(ValueError):
+        list(rearrange_stream([[1, 2]], 'a -> a'))
+    with pytest.raises(ValueError):
+        list(rearrange_stream([np.zeros((3, 2)), np.zeros((3, 4))], '(n b) c -> n b c', b=2))
+    # A carried-over row would be silently cast to the dtype of the first batch
+    with pytest.raises(ValueError, match="dtype"):
+        list(rearrange_stream([np.zeros((3, 2)), np.ones((3, 2), dtype=np.int32)], '(n b) c -> n b c', b=2))
@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+from einops_impl.rearrange import rearrange
+from einops_impl.unfold import unfold, window_view
+
+
+def reference_patches(x, kh, kw, stride):
+    oh = (x.shape[2] - kh) // stride + 1
+    ow = (x.shape[3] - kw) // stride + 1
+    return np.stack([x[:, :, i * stride:i * stride + kh, j * stride:j * stride + kw]
+                     for i in range(oh) for j in range(ow)], axis=1)
+
+def test_window_view():
+    view = window_view(np.arange(7), [(0, 3, 2)])
+    np.testing.assert_array_equal(view, [[0, 1, 2], [2, 3, 4], [4, 5, 6]])
+    assert not view.flags.writeable
+
+@pytest.mark.parametrize("stride", [1, 2, 3])
+def test_unfold_patches(stride):
+    x = np.random.rand(2, 3, 9, 8)
+    result = unfold(x, 'b c {oh kh} {ow kw} -> b (oh ow) (c kh kw)', kh=3, kw=2, stride=stride)
+    expected = reference_patches(x, 3, 2, stride)
+    np.testing.assert_array_equal(result, expected.reshape(expected.shape[0], expected.shape[1], -1))
+
+def test_unfold_is_view():
+    x = np.random.rand(2, 10, 4)
+    result = unfold(x, 'b {n k} c -> b n c k', k=4, stride={'k': 2})
+    assert result.shape == (2, 4, 4, 4)
+    assert np.shares_memory(result, x) and not result.flags.writeable
+    np.testing.assert_array_equal(result[:, 1], rearrange(x[:, 2:6], 'b k c -> b c k'))
+    materialized = unfold(x, 'b {n k} c -> b n c k', k=4, stride=2, materialize=True)
+    assert materialized.flags.writeable and not np.shares_memory(materialized, x)
+
+def test_unfold_count_and_ellipsis():
+    x = np.random.rand(3, 2, 8)
+    result = unfold(x, '... {n k} -> ... n k', n=3, stride=3)
+    np.testing.assert_array_equal(result, np.stack([x[..., i * 3:i * 3 + 2] for i in range(3)], axis=-2))
+
+def test_unfold_errors():
+    x = np.random.rand(4, 6)
+    with pytest.raises(ValueError, match="no windowed group"):
+        unfold(x, 'a b -> b a')
+    with pytest.raises(ValueError, match="Missing window size"):
+        unfold(x, 'a {n k} -> a n k')
+    with pytest.raises(ValueError, match="between 1 and"):
+        unfold(x, 'a {n k} -> a n k', k=7)
+    with pytest.raises(ValueError, match="positive integer"):
+        unfold(x, 'a {n k} -> a n k', k=2, stride=0)
+    with pytest.raises(ValueError, match="give 3 windows"):
+        unfold(x, 'a {n k} -> a n k', k=2, n=4, stride=2)
+    with pytest.raises(ValueError, match="only supported on the input side of unfold"):
+        rearrange(x, 'a {n k} -> a n k', k=2)
@@ -0,0 +1,152 @@
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from .parser import Parser, GroupNode
+from .cache import plan_cache
+from .plan import get_rearrange_plan
+
+
+class UnfoldSpec:
+    """
+    Shape-independent part of an unfold pattern for one input rank.
+
+    pattern is the rearrange pattern applied to the window view: every windowed
+    group '{n k}' is replaced by the two axes 'n k'. windows lists, in input
+    order, (dim, count axis, size axis) for each windowed group.
+
+    Example:
+        build_unfold_spec('b {oh kh} w -> b oh (kh w)', 3)
+        -> pattern 'b  oh kh  w -> b oh (kh w)', windows [(1, 'oh', 'kh')]
+    """
+    def __init__(self, pattern: str, windows: List[Tuple[int, str, str]]):
+        self.pattern = pattern
+        self.windows = windows
+
+    def __repr__(self):
+        return f"UnfoldSpec(pattern={self.pattern!r}, windows={self.windows})"
+
+
+def build_unfold_spec(pattern: str, ndim: int) -> UnfoldSpec:
+    """
+    Parse an unfold pattern and locate its windowed groups in an input of rank ndim.
+
+    Raises:
+        ValueError: If the pattern is invalid or has no windowed group
+    """
+    parser = Parser(pattern)
+    parser.parse(allow_windows=True)
+    if not parser.windows:
+        raise ValueError(f"Pattern '{pattern}' has no windowed group '{{count size}}'; use rearrange instead")
+    if len(parser.input_tree) - 1 > ndim or (not any(node.name == '...' for node in parser.input_tree)
+                                              and len(parser.input_tree) != ndim):
+        raise ValueError(f"Pattern '{pattern}' expects {len(parser.input_tree)} dimensions, got {ndim}")
+
+    windows = []
+    dim = 0
+    for node in parser.input_tree:
+        if node.name == '...':
+            dim += ndim - (len(parser.input_tree) - 1)
+            continue
+        if isinstance(node, GroupNode) and node.name in parser.windows:
+            count_axis, size_axis = parser.windows[node.name]
+            windows.append((dim, count_axis, size_axis))
+        dim += 1
+    input_pattern = parser.input_pattern.replace('{', ' ').replace('}', ' ')
+    return UnfoldSpec(f"{input_pattern}->{parser.output_pattern}", windows)
+
+
+def window_view(tensor: np.ndarray, windows: List[Tuple[int, int, int]]) -> np.ndarray:
+    """
+    Read-only view of tensor where each (dim, size, stride) window turns
+    dimension dim into two: the window start (every stride-th position) and
+    the offset within the window. No data is copied; windows share memory.
+
+    Example:
+        window_view(np.arange(5), [(0, 3, 2)])
+        -> [[0, 1, 2],
+            [2, 3, 4]]
+    """
+    dims = [dim for dim, _, _ in windows]
+    view = np.lib.stride_tricks.sliding_window_view(tensor, [size for _, size, _ in windows], axis=dims)
+    index = [slice(None)] * tensor.ndim
+    for dim, _, stride in windows:
+        index[dim] = slice(None, None, stride)
+    view = view[tuple(index)]
+    # sliding_window_view appends the window axes; put each one right after its dimension
+    order: List[int] = []
+    for dim in range(tensor.ndim):
+        order.append(dim)
+        if dim in dims:
+            order.append(tensor.ndim + dims.index(dim))
+    return view.transpose(order)
+
+
+def _window_sizes(tensor: np.ndarray, spec: UnfoldSpec, stride: Union[int, Dict[str, int]],
+                  axis_lengths: Dict[str, int]) -> List[Tuple[int, int, int]]:
+    windows = []
+    for dim, count_axis, size_axis in spec.windows:
+        step = stride.get(size_axis, 1) if isinstance(stride, dict) else stride
+        if not isinstance(step, int) or step < 1:
+            raise ValueError(f"Stride for window axis '{size_axis}' must be a positive integer, got {step!r}")
+        length = tensor.shape[dim]
+        if size_axis in axis_lengths:
+            size = axis_lengths[size_axis]
+        elif count_axis in axis_lengths:
+            size = length - (axis_lengths[count_axis] - 1) * step
+        else:
+            raise ValueError(f"Missing window size: pass '{size_axis}' (or '{count_axis}') in axis_lengths")
+        if not 1 <= size <= length:
+            raise ValueError(f"Window size {size} for axis '{size_axis}' must be between 1 and the "
+                             f"dimension size {length}")
+        count = (length - size) // step + 1
+        if count_axis in axis_lengths and axis_lengths[count_axis] != count:
+            raise ValueError(f"Windows of size {size} with stride {step} over {length} elements give "
+                             f"{count} windows, but {count_axis}={axis_lengths[count_axis]} was given")
+        windows.append((dim, size, step))
+    return windows
+
+
+def unfold(tensor: np.ndarray, pattern: str, stride: Union[int, Dict[str, int]] = 1,
+           materialize: bool = False, copy: Optional[bool] = None, **axis_lengths) -> np.ndarray:
+    """
+    Extract sliding windows (patches with overlap, as in convolutions) and rearrange them.
+
+    On the input side, a windowed group '{n k}' unfolds one dimension into n
+    windows of k elements, taken every stride elements. The size k (or the
+    count n) is given in axis_lengths. The rest of the pattern is an ordinary
+    rearrange of the window view.
+
+    The windows are a strided view of tensor, so nothing is duplicated: the
+    result is a read-only view whenever the output layout can be expressed with
+    strides, and data is only copied when the final reshape needs it, or with
+    materialize/copy as in rearrange.
+
+    Args:
+        tensor: Input numpy array
+        pattern: Pattern with windowed groups on its input side
+        stride: Window step, for all windows or per window size axis name
+        materialize, copy: As in rearrange
+        **axis_lengths: Window sizes or counts and other known axis lengths
+
+    Returns:
+        Rearranged windows
+
+    Example:
+        >>> x = np.random.rand(2, 3, 8, 8)
+        >>> patches = unfold(x, 'b c {oh kh} {ow kw} -> b (oh ow) (c kh kw)', kh=3, kw=3, stride=2)
+        >>> patches.shape
+        (2, 9, 27)
+
+    Raises:
+        ValueError: If the pattern, window sizes or strides are invalid
+    """
+    if tensor is None:
+        raise ValueError("Input tensor cannot be None")
+    if not isinstance(tensor, np.ndarray):
+        raise ValueError(f"Expected numpy array, got {type(tensor).__name__}")
+    if not pattern:
+        raise ValueError("Pattern string cannot be empty")
+
+    spec = plan_cache.get_or_build(('unfold', pattern, tensor.ndim), lambda: build_unfold_spec(pattern, tensor.ndim))
+    view = window_view(tensor, _window_sizes(tensor, spec, stride, axis_lengths))
+    plan = get_rearrange_plan(spec.pattern, view.shape, axis_lengths)
+    return plan.apply(view, materialize=materialize, copy=copy)
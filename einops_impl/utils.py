@@ -0,0 +1,96 @@
+from typing import Optional, Sequence, Tuple
+
+
+def prod(sizes: Sequence[int]) -> int:
+    """Product of a sequence of ints as a plain Python int"""
+    result = 1
+    for size in sizes:
+        result *= int(size)
+    return result
+
+
+def c_strides(shape: Sequence[int], itemsize: int = 1) -> Tuple[int, ...]:
+    """
+    Strides of a C-contiguous array of the given shape.
+
+    Example:
+        c_strides((2, 3, 4), itemsize=8) -> (96, 32, 8)
+    """
+    strides = []
+    stride = itemsize
+    for size in reversed(shape):
+        strides.append(stride)
+        stride *= max(int(size), 1)
+    return tuple(reversed(strides))
+
+
+
+def is_contiguous(shape: Sequence[int], strides: Sequence[int], itemsize: int, order: str = 'C') -> bool:
+    """
+    Whether an array with the given shape and strides is contiguous in C or F
+    order. As in NumPy's flags, size-1 axes are ignored and empty arrays are
+    contiguous.
+
+    Example:
+        is_contiguous((3, 4), (8, 24), 8, 'F')  -> True
+    """
+    if prod(shape) == 0:
+        return True
+    axes = range(len(shape) - 1, -1, -1) if order == 'C' else range(len(shape))
+    expected = itemsize
+    for axis in axes:
+        if shape[axis] != 1:
+            if strides[axis] != expected:
+                return False
+            expected *= int(shape[axis])
+    return True
+
+def reshape_strides(shape: Sequence[int], strides: Sequence[int],
+                    new_shape: Sequence[int], itemsize: int = 1) -> Optional[Tuple[int, ...]]:
+    """
+    Strides that reshaping an array with the given shape and strides to new_shape
+    would produce, or None if the reshape needs a copy. Mirrors NumPy's C-order
+    no-copy reshape rule, so it can be evaluated without touching any data.
+
+    Example:
+        reshape_strides((3, 4), (32, 8), (12,), 8)  -> (8,)
+        reshape_strides((4, 3), (8, 32), (12,), 8)  -> None  (transposed input)
+    """
+    if prod(shape) != prod(new_shape):
+        raise ValueError(f"Cannot reshape {tuple(shape)} into {tuple(new_shape)}")
+    if prod(shape) == 0:
+        return c_strides(new_shape, itemsize)
+
+    # Size-1 axes never constrain the layout
+    old_dims = [int(size) for size in shape if size != 1]
+    old_strides = [int(stride) for size, stride in zip(shape, strides) if size != 1]
+    new_dims = [int(size) for size in new_shape]
+    new_strides = [0] * len(new_dims)
+
+    oi, oj, ni, nj = 0, 1, 0, 1
+    while ni < len(new_dims) and oi < len(old_dims):
+        new_product = new_dims[ni]
+        old_product = old_dims[oi]
+        while new_product != old_product:
+            if new_product < old_product:
+                new_product *= new_dims[nj]
+                nj += 1
+            else:
+                old_product *= old_dims[oj]
+                oj += 1
+
+        # The old axes merged into this block must be contiguous with each other
+        for ok in range(oi, oj - 1):
+            if old_strides[ok] != old_dims[ok + 1] * old_strides[ok + 1]:
+                return None
+
+        new_strides[nj - 1] = old_strides[oj - 1]
+        for nk in range(nj - 1, ni, -1):
+            new_strides[nk - 1] = new_strides[nk] * new_dims[nk]
+        ni, nj = nj, nj + 1
+        oi, oj = oj, oj + 1
+
+    last_stride = new_strides[ni - 1] if ni >= 1 else itemsize
+    for nk in range(ni, len(new_dims)):
+        new_strides[nk] = last_stride
+    return tuple(new_strides)